@@ -17,6 +17,118 @@ REDIS_URL = config("REDIS_URL", default=f"redis://{REDIS_HOST}:{REDIS_PORT}/{RED
 
 #YOLO models path
 YOLO_MODELS_PATH = config("YOLO_MODELS_PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models/yolo_models'))    
+# Runtime de inferencia: "auto" (OpenVINO > ONNX Runtime > PyTorch según lo exportado/instalado),
+# "openvino", "onnx" o "torch"
+YOLO_RUNTIME = config("YOLO_RUNTIME", default="auto")
+# Detector rápido (ej. YOLOv8n) por tipo de documento para la cascada; se escala al modelo completo
+# solo si faltan campos obligatorios o tienen baja confianza. Formato: "INVOICE_A:invoices_nano/weights/best.pt,..."
+YOLO_FAST_MODELS = config("YOLO_FAST_MODELS", default="", cast=lambda v: dict(item.split(":", 1) for item in v.split(",") if ":" in item))
+# Tipos de documento que pueden usar el detector cuantizado INT8 (scripts/quantize_models.py)
+YOLO_INT8_DOCUMENT_TYPES = config("YOLO_INT8_DOCUMENT_TYPES", default="", cast=lambda v: [t.strip() for t in v.split(",") if t.strip()])
+# Caída máxima de mAP50-95 (absoluta, 0-1) aceptada para servir INT8 en lugar de FP32
+YOLO_INT8_MAX_MAP_DROP = config("YOLO_INT8_MAX_MAP_DROP", default=0.01, cast=float)
+
+# Tesseract OCR
+# "auto": usa la API en proceso (tesserocr) si está instalada, sino pytesseract
+# "api": exige tesserocr | "cli": fuerza pytesseract
+TESSERACT_ENGINE = config("TESSERACT_ENGINE", default="auto")
+TESSERACT_PRELOAD_LANGS = config("TESSERACT_PRELOAD_LANGS", default="spa", cast=lambda v: [lang.strip() for lang in v.split(",") if lang.strip()])
+TESSDATA_PATH = config("TESSDATA_PATH", default="")
+
+# Paralelismo del OCR por campo dentro de un documento
+# "serial" | "thread" | "process" (process no funciona dentro de hijos prefork de Celery, que son daemon)
+OCR_EXECUTOR = config("OCR_EXECUTOR", default="thread")
+# Pool de Celery: "prefork" (un hijo por tarea, reciclado cada worker_max_tasks_per_child tareas y con
+# límite duro de tiempo) o "threads" (un proceso con todas las tareas, habilita el batching de YOLO entre
+# tareas; pierde el reciclado de procesos y el límite duro de tiempo, solo queda el blando)
+CELERY_WORKER_POOL = config("CELERY_WORKER_POOL", default="prefork")
+# Tareas simultáneas de Celery por nodo (hilos o procesos hijos según el pool)
+CELERY_WORKER_CONCURRENCY = config("CELERY_WORKER_CONCURRENCY", default=os.cpu_count() or 1, cast=int)
+# Máximo de recortes en paralelo por proceso worker
+# (0 = núcleos, o núcleos / CELERY_WORKER_CONCURRENCY con el pool prefork)
+OCR_MAX_WORKERS = config("OCR_MAX_WORKERS", default=0, cast=int)
+# Documentos de varias páginas (PDF): páginas procesadas en paralelo por proceso worker
+# (0 = igual que OCR_MAX_WORKERS) y páginas rasterizadas en memoria a la vez (0 = PAGE_MAX_WORKERS)
+PAGE_MAX_WORKERS = config("PAGE_MAX_WORKERS", default=0, cast=int)
+PAGE_MAX_IN_FLIGHT = config("PAGE_MAX_IN_FLIGHT", default=0, cast=int)
+
+# Normalización de recortes antes del OCR: se reescala cada campo para que su línea de texto
+# mida ~OCR_TARGET_TEXT_HEIGHT px y se agrega un margen blanco
+OCR_NORMALIZE_CROPS = config("OCR_NORMALIZE_CROPS", default=True, cast=bool)
+OCR_TARGET_TEXT_HEIGHT = config("OCR_TARGET_TEXT_HEIGHT", default=32, cast=int)
+OCR_CROP_PADDING = config("OCR_CROP_PADDING", default=10, cast=int)
+OCR_MIN_CROP_SCALE = config("OCR_MIN_CROP_SCALE", default=0.25, cast=float)
+OCR_MAX_CROP_SCALE = config("OCR_MAX_CROP_SCALE", default=4.0, cast=float)
+
+# Estrategia de OCR por tipo de documento: "crop" (un OCR por caja YOLO) o "page" (un OCR de página completa)
+# Formato: "INVOICE_A:page,INVOICE_B:page"; los tipos no listados usan la estrategia por defecto del servicio
+OCR_STRATEGY_BY_TYPE = config("OCR_STRATEGY_BY_TYPE", default="", cast=lambda v: dict(item.split(":", 1) for item in v.split(",") if ":" in item))
+
+# Batching de inferencia YOLO entre tareas concurrentes del mismo proceso; solo se usa con
+# CELERY_WORKER_POOL=threads (con prefork cada proceso tiene una tarea y el lote solo agrega espera)
+YOLO_BATCH_SIZE = config("YOLO_BATCH_SIZE", default=1, cast=int)
+YOLO_BATCH_MAX_WAIT_MS = config("YOLO_BATCH_MAX_WAIT_MS", default=20, cast=float)
+
+# Preprocesamiento: la geometría (inclinación, cuadrilátero de la página) se estima sobre un nivel
+# de pirámide cuyo lado mayor no supera este valor y se aplica una sola vez a resolución completa
+PREPROCESSING_ANALYSIS_MAX_SIDE = config("PREPROCESSING_ANALYSIS_MAX_SIDE", default=1024, cast=int)
+
+# Confianza mínima del OSD de Tesseract para rotar la página por múltiplos de 90° (etapa "orientation")
+ORIENTATION_MIN_CONFIDENCE = config("ORIENTATION_MIN_CONFIDENCE", default=2.0, cast=float)
+
+# Etapas de preprocesamiento por tipo de documento (grayscale, denoise, orientation, deskew, perspective, binarize)
+# Formato: "INVOICE_A:grayscale+binarize,DNI_FRONT:grayscale+denoise+deskew+binarize"
+PREPROCESSING_PIPELINE_BY_TYPE = config("PREPROCESSING_PIPELINE_BY_TYPE", default="", cast=lambda v: {doc_type: stages.split("+") for doc_type, stages in (item.split(":", 1) for item in v.split(",") if ":" in item)})
+
+# Doble resolución: YOLO corre sobre la página alineada reducida (lado mayor <= YOLO_DETECTION_MAX_SIDE,
+# el imgsz con que se entrenaron los detectores) y solo los recortes detectados se binarizan para el OCR
+OCR_DUAL_RESOLUTION = config("OCR_DUAL_RESOLUTION", default=True, cast=bool)
+YOLO_DETECTION_MAX_SIDE = config("YOLO_DETECTION_MAX_SIDE", default=640, cast=int)
+
+# Cache en disco de páginas preprocesadas (clave: sha256 del archivo + versión del pipeline).
+# Reprocesar el archivo solo con un modelo nuevo no vuelve a decodificar ni preprocesar
+PREPROCESSING_CACHE_ENABLED = config("PREPROCESSING_CACHE_ENABLED", default=True, cast=bool)
+PREPROCESSING_CACHE_DIR = config("PREPROCESSING_CACHE_DIR", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "preprocessing_cache"))
+PREPROCESSING_CACHE_MAX_MB = config("PREPROCESSING_CACHE_MAX_MB", default=2048, cast=int)
+
+# Decodificación de imágenes: JPEG se decodifica reducido (1/2, 1/4, 1/8) hasta DECODE_TARGET_DPI y
+# ninguna página supera DECODE_MAX_MEGAPIXELS; archivos de más de DECODE_MAX_SOURCE_MEGAPIXELS se rechazan
+DECODE_TARGET_DPI = config("DECODE_TARGET_DPI", default=300, cast=float)
+DECODE_MAX_MEGAPIXELS = config("DECODE_MAX_MEGAPIXELS", default=16, cast=float)
+DECODE_MAX_SOURCE_MEGAPIXELS = config("DECODE_MAX_SOURCE_MEGAPIXELS", default=150, cast=float)
+
+# Control de calidad sobre una miniatura antes del pipeline: "flag" solo marca en processing_metadata
+# los documentos que probablemente fallen, "reject" los rechaza (processing_error con el motivo) una vez
+# calibrados los umbrales con documentos reales, "off" lo desactiva
+QUALITY_GATE_MODE = config("QUALITY_GATE_MODE", default="flag").lower()
+QUALITY_THUMBNAIL_SIDE = config("QUALITY_THUMBNAIL_SIDE", default=512, cast=int)
+QUALITY_MIN_SHARPNESS = config("QUALITY_MIN_SHARPNESS", default=20.0, cast=float)      # varianza del Laplaciano
+QUALITY_MIN_DPI = config("QUALITY_MIN_DPI", default=100.0, cast=float)                  # resolución efectiva del documento
+QUALITY_MIN_CONTRAST = config("QUALITY_MIN_CONTRAST", default=12.0, cast=float)         # desvío estándar de grises
+QUALITY_MIN_PAGE_COVERAGE = config("QUALITY_MIN_PAGE_COVERAGE", default=0.15, cast=float)  # fracción del cuadro
+
+# PDF (requiere PyMuPDF): las páginas se rasterizan de a una a PDF_RENDER_DPI; las que ya tienen
+# capa de texto (al menos PDF_TEXT_LAYER_MIN_WORDS palabras) se leen sin OCR
+PDF_RENDER_DPI = config("PDF_RENDER_DPI", default=300, cast=float)
+PDF_TEXT_LAYER_MIN_WORDS = config("PDF_TEXT_LAYER_MIN_WORDS", default=10, cast=int)
+PDF_MAX_PAGES = config("PDF_MAX_PAGES", default=50, cast=int)
+# TIFF de varias páginas (lotes del escáner): se decodifica una página a la vez
+TIFF_MAX_PAGES = config("TIFF_MAX_PAGES", default=100, cast=int)
+# Camino rápido por códigos: el QR de AFIP de las facturas electrónicas y el PDF417 del DNI (requiere
+# zxing-cpp) se ubican sobre la página reducida (lado mayor <= BARCODE_DETECTION_MAX_SIDE) y sus datos
+# reemplazan el OCR de esos campos
+BARCODE_FAST_PATH = config("BARCODE_FAST_PATH", default=True, cast=bool)
+BARCODE_DETECTION_MAX_SIDE = config("BARCODE_DETECTION_MAX_SIDE", default=1600, cast=int)
+# Plantillas de documentos de diseño fijo (DNI): la página reducida se alinea (ORB + homografía) con la
+# imagen de referencia de DOCUMENT_TEMPLATES_PATH y los campos se recortan de coordenadas conocidas;
+# YOLO corre solo si la alineación no alcanza TEMPLATE_MIN_INLIERS / TEMPLATE_MIN_INLIER_RATIO.
+# Deshabilitado por defecto: el repositorio no incluye las imágenes de referencia (dni_front.png,
+# dni_back.png) y las coordenadas de los campos son aproximadas; sin referencias el camino no hace nada
+TEMPLATE_ALIGNMENT_ENABLED = config("TEMPLATE_ALIGNMENT_ENABLED", default=False, cast=bool)
+DOCUMENT_TEMPLATES_PATH = config("DOCUMENT_TEMPLATES_PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models/templates'))
+TEMPLATE_ALIGNMENT_MAX_SIDE = config("TEMPLATE_ALIGNMENT_MAX_SIDE", default=800, cast=int)
+TEMPLATE_MIN_INLIERS = config("TEMPLATE_MIN_INLIERS", default=25, cast=int)
+TEMPLATE_MIN_INLIER_RATIO = config("TEMPLATE_MIN_INLIER_RATIO", default=0.35, cast=float)
 
 # Project Root
 PROJECT_ROOT= config("PROJECT_ROOT", default=os.path.join(os.path.dirname(os.path.abspath(__file__))))
@@ -105,6 +105,7 @@ class ExtractedDniData(BaseModel):
     apellido: Optional[ExtractedTextField] = None
     nombre: Optional[ExtractedTextField] = None
     numero_dni: Optional[ExtractedNumberField] = None
+    sexo: Optional[ExtractedTextField] = None  # M, F o X
     fecha_nacimiento: Optional[ExtractedDateField] = None
     fecha_emision: Optional[ExtractedDateField] = None
     fecha_vencimiento: Optional[ExtractedDateField] = None
@@ -137,6 +138,7 @@ class ExtractedInvoiceData(BaseModel):
     tipo_factura: Optional[ExtractedTextField] = None  # A, B, C
     fecha_emision: Optional[ExtractedDateField] = None
     fecha_vencimiento: Optional[ExtractedDateField] = None
+    cae: Optional[ExtractedTextField] = None  # Código de autorización (CAE/CAEA) del QR de AFIP
     
     # Emisor
     cuit_emisor: Optional[ExtractedNumberField] = None
@@ -172,6 +174,7 @@ class ExtractedInvoiceData(BaseModel):
             "fecha": self.fecha_emision.parsed_date if self.fecha_emision else None,
             "emisor": self.razon_social_emisor.value if self.razon_social_emisor else None,
             "cuit_emisor": self.cuit_emisor.parsed_number if self.cuit_emisor and self.cuit_emisor.is_valid else None,
+            "cae": self.cae.value if self.cae else None,
             "total": float(self.total.parsed_amount) if self.total and self.total.parsed_amount else None,
             "moneda": self.total.currency if self.total else None,
             "calidad_extraccion": self.processing_quality
@@ -198,6 +201,7 @@ def raw_ocr_to_dni_data(document_id: uuid.UUID, raw_data: Dict[str, Any]) -> Ext
         'dni_apellido': 'apellido',
         'dni_nombre': 'nombre', 
         'dni_numero': 'numero_dni',
+        'dni_sexo': 'sexo',
         'dni_fecha_nacimiento': 'fecha_nacimiento',
         'dni_fecha_emision': 'fecha_emision',
         'dni_fecha_vencimiento': 'fecha_vencimiento',
@@ -237,7 +241,8 @@ def raw_ocr_to_invoice_data(document_id: uuid.UUID, raw_data: Dict[str, Any]) ->
         'subtotal': 'subtotal',
         'iva_21': 'iva_21',
         'iva_105': 'iva_105',
-        'total': 'total'
+        'total': 'total',
+        'cae': 'cae'
     }
     
     for yolo_field, model_field in field_mapping.items():
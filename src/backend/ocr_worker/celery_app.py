@@ -2,6 +2,8 @@
 import os
 from celery import Celery
 
+from config import CELERY_WORKER_POOL, CELERY_WORKER_CONCURRENCY
+
 # Configuración de Redis como broker
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 print(f"Celery worker conectándose a Redis en: {REDIS_URL}")
@@ -22,9 +24,16 @@ celery_app.conf.update(
     timezone='America/Argentina/Buenos_Aires',
     enable_utc=True,
     task_track_started=True,
+    # El límite duro solo se aplica con prefork: con threads Celery no puede matar una tarea colgada
     task_time_limit=30 * 60,  # 30 minutos
     task_soft_time_limit=25 * 60,  # 25 minutos
     worker_prefetch_multiplier=1,
+    # prefork por defecto; threads (opcional) pone todas las tareas en un proceso para que el batching
+    # de YOLO agrupe páginas de varias tareas (services/batch_inference.py)
+    worker_pool=CELERY_WORKER_POOL,
+    # El mismo valor se usa para repartir núcleos entre el OCR por campo (services/ocr_executor.py)
+    worker_concurrency=CELERY_WORKER_CONCURRENCY,
+    # Recicla los hijos prefork (acota la memoria de buffers y modelos); no aplica con threads
     worker_max_tasks_per_child=1000,
     # Configuración simplificada para evitar errores de backend
     result_backend_transport_options={
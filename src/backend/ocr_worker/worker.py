@@ -3,10 +3,9 @@ import os
 import sys
 import logging
 import uuid
-import numpy as np
-import cv2
 from datetime import datetime
 from typing import Dict, Any
+from celery.signals import worker_process_init, worker_ready
 
 # Agregar el directorio padre al path para importaciones
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,13 +14,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from .celery_app import celery_app
 
 # Importar servicios del backend
-from services.preprocessing_service import preprocess_image_for_ocr
+from services.preprocessing_service import get_preprocessing_context
+from services.preprocessing_cache import get_preprocessed_page
+from services.quality_service import format_quality_issues
+from services.document_pipeline import is_multipage_document, process_multipage_document, build_ocr_result
 from services.ocr_service import perform_yolo_ocr
+from services.ocr_executor import warmup_ocr_executor
 from services.document_service import update_document_status, get_document_by_id_and_data_for_ocr
 from services.storage.local_storage import download_file_local
 from database import SessionLocal
-from models.extracted_data import raw_ocr_to_dni_data, raw_ocr_to_invoice_data
-from models.enums import DocumentType
+from config import CELERY_WORKER_POOL
 
 # Configurar logging
 logging.basicConfig(
@@ -30,6 +32,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Pool prefork: arranca en cada hijo el executor de OCR, cuyos hilos son los que usan los
+    handles de Tesseract, antes de la primera tarea.
+    """
+    warmup_ocr_executor()
+    logger.info("[Celery] Executor OCR inicializado en el proceso worker")
+
+@worker_ready.connect
+def init_worker(**kwargs):
+    """Pools threads/solo: no hay hijos, las tareas comparten el executor del proceso principal."""
+    if CELERY_WORKER_POOL == "prefork":
+        return
+    warmup_ocr_executor()
+    logger.info("[Celery] Executor OCR inicializado en el worker")
+
 @celery_app.task(bind=True, name='ocr_tasks.process_document_task')
 def process_document_task(self, document_id: str) -> Dict[str, Any]:
     """
@@ -74,43 +93,51 @@ def process_document_task(self, document_id: str) -> Dict[str, Any]:
         # 1. Descargar la imagen
         logger.info(f"[Celery] Descargando archivo: {db_document_entry.storage_path}")
         image_bytes = download_file_local(db_document_entry.storage_path)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        original_image_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if original_image_cv is None:
-            raise ValueError("No se pudo decodificar la imagen")
-        
-        # Asegurar que la imagen tenga 3 canales (BGR)
-        if len(original_image_cv.shape) == 2:
-            # Si es escala de grises, convertir a BGR
-            original_image_cv = cv2.cvtColor(original_image_cv, cv2.COLOR_GRAY2BGR)
-            logger.info("[Celery] Imagen convertida de escala de grises a BGR")
-        elif len(original_image_cv.shape) == 3 and original_image_cv.shape[2] == 4:
-            # Si tiene canal alpha, convertir a BGR
-            original_image_cv = cv2.cvtColor(original_image_cv, cv2.COLOR_BGRA2BGR)
-            logger.info("[Celery] Imagen convertida de BGRA a BGR")
-        
-        logger.info(f"[Celery] Imagen cargada: {original_image_cv.shape}")
-        
+
         # Actualizar progreso
         self.update_state(
             state='PROCESSING',
             meta={'document_id': document_id, 'stage': 'preprocessing'}
         )
-        
-        # 2. Preprocesar la imagen
-        logger.info("[Celery] Preprocesando imagen para OCR")
-        preprocessed_image = preprocess_image_for_ocr(original_image_cv)
-        
-        # Actualizar progreso
-        self.update_state(
-            state='PROCESSING',
-            meta={'document_id': document_id, 'stage': 'ocr_processing'}
-        )
-        
-        # 3. Realizar YOLO + Tesseract OCR
-        logger.info(f"[Celery] Ejecutando YOLO + OCR para tipo: {db_document_entry.document_type}")
-        raw_extracted_data = perform_yolo_ocr(preprocessed_image, db_document_entry.document_type)
+
+        # Información del pipeline (etapas de preprocesamiento, cache, nivel de la cascada de detectores)
+        # para processing_metadata
+        pipeline_metadata = {}
+
+        page_results = None
+        if is_multipage_document(image_bytes):
+            # 2-3. PDF o TIFF multipágina: páginas decodificadas/rasterizadas de a una y procesadas
+            # en paralelo; las páginas de PDF con capa de texto no pasan por OCR
+            logger.info("[Celery] Procesando documento página por página")
+            self.update_state(
+                state='PROCESSING',
+                meta={'document_id': document_id, 'stage': 'ocr_processing'}
+            )
+            document_result = process_multipage_document(image_bytes, db_document_entry.document_type,
+                                                         metadata=pipeline_metadata)
+            raw_extracted_data = document_result['fields']
+            page_results = document_result['pages']
+        else:
+            # 2. Decodificar y preprocesar la imagen (o recuperarla del cache de preprocesamiento)
+            logger.info("[Celery] Preprocesando imagen para OCR")
+            prepared_page = get_preprocessed_page(image_bytes, db_document_entry.document_type,
+                                                  metadata=pipeline_metadata, context=get_preprocessing_context())
+            if pipeline_metadata.get('preprocessing_cache', {}).get('hit'):
+                logger.info("[Celery] Página preprocesada recuperada del cache")
+
+            # Actualizar progreso
+            self.update_state(
+                state='PROCESSING',
+                meta={'document_id': document_id, 'stage': 'ocr_processing'}
+            )
+
+            # 3. Realizar YOLO + Tesseract OCR
+            logger.info(f"[Celery] Ejecutando YOLO + OCR para tipo: {db_document_entry.document_type}")
+            raw_extracted_data = perform_yolo_ocr(prepared_page.ocr_image, db_document_entry.document_type,
+                                                  metadata=pipeline_metadata,
+                                                  detection_image=prepared_page.detection_image,
+                                                  binarize_crops=prepared_page.binarize,
+                                                  barcode_fields=prepared_page.barcode_fields)
         
         # Actualizar progreso
         self.update_state(
@@ -118,51 +145,31 @@ def process_document_task(self, document_id: str) -> Dict[str, Any]:
             meta={'document_id': document_id, 'stage': 'data_structuring'}
         )
         
-        # 4. Estructurar datos según el tipo de documento
-        structured_data = None
-        processing_quality = determine_processing_quality(raw_extracted_data)
-        
-        if db_document_entry.document_type in [DocumentType.DNI_FRONT, DocumentType.DNI_BACK]:
-            structured_data = raw_ocr_to_dni_data(doc_uuid, raw_extracted_data)
-            structured_data.processing_quality = processing_quality
-        elif db_document_entry.document_type in [DocumentType.INVOICE_A, DocumentType.INVOICE_B, DocumentType.INVOICE_C]:
-            structured_data = raw_ocr_to_invoice_data(doc_uuid, raw_extracted_data)
-            structured_data.processing_quality = processing_quality
-        
         # Actualizar progreso
         self.update_state(
             state='PROCESSING',
             meta={'document_id': document_id, 'stage': 'saving_results'}
         )
         
-        # 5. Guardar resultados
+        # 4-5. Estructurar datos según el tipo de documento (services/document_pipeline.build_ocr_result,
+        # mismo formato que el worker de RQ) y guardar resultados
         logger.info("[Celery] Guardando resultados del OCR")
-        
-        # Preparar datos para guardar (convertir UUIDs a strings para JSON)
-        structured_data_dict = None
-        if structured_data:
-            structured_data_dict = structured_data.dict()
-            # Convertir UUID a string para serialización JSON
-            if 'document_id' in structured_data_dict:
-                structured_data_dict['document_id'] = str(structured_data_dict['document_id'])
-        
-        save_data = {
-            'raw_ocr_output': raw_extracted_data,
-            'structured_data': structured_data_dict,
-            'processing_quality': processing_quality,
-            'processing_metadata': {
-                'celery_task_id': self.request.id,
-                'processing_time': datetime.now().isoformat(),
-                'image_dimensions': original_image_cv.shape[:2] if original_image_cv is not None else None,
-                'document_id': str(doc_uuid)  # Convertir UUID a string
-            }
-        }
-        
+        save_data = build_ocr_result(doc_uuid, db_document_entry.document_type, raw_extracted_data,
+                                     page_results=page_results,
+                                     processing_metadata={'celery_task_id': self.request.id, **pipeline_metadata})
+        
+        # Problemas de calidad que no impidieron el OCR (modo "flag" o advertencias) quedan en processing_error
+        quality = pipeline_metadata.get('quality')
+        quality_warning = None
+        if quality and quality['issues']:
+            quality_warning = f"Advertencia de calidad de imagen: {format_quality_issues(quality)}"
+
         update_document_status(
             db,
             doc_uuid,
             'COMPLETED',
             processed_at=datetime.now(),
+            error_message=quality_warning,
             raw_ocr_output=save_data
         )
         
@@ -172,8 +179,8 @@ def process_document_task(self, document_id: str) -> Dict[str, Any]:
             "status": "success",
             "document_id": document_id,
             "extracted_data": raw_extracted_data,
-            "structured_data": structured_data.dict() if structured_data else None,
-            "processing_quality": processing_quality,
+            "structured_data": save_data['structured_data'],
+            "processing_quality": save_data['processing_quality'],
             "celery_task_id": self.request.id
         }
         
@@ -205,46 +212,6 @@ def process_document_task(self, document_id: str) -> Dict[str, Any]:
         if db:
             db.close()
 
-def determine_processing_quality(raw_data: Dict[str, Any]) -> str:
-    """
-    Determina la calidad del procesamiento basado en los datos extraídos.
-    
-    Args:
-        raw_data: Datos raw del OCR
-        
-    Returns:
-        'high', 'medium', o 'low'
-    """
-    if not raw_data:
-        return 'low'
-    
-    # Contar campos detectados y sus confianzas
-    total_fields = len(raw_data)
-    high_confidence_fields = 0
-    medium_confidence_fields = 0
-    
-    for field_name, field_data in raw_data.items():
-        if isinstance(field_data, dict) and 'confidence' in field_data:
-            confidence = field_data['confidence']
-            if confidence >= 0.8:
-                high_confidence_fields += 1
-            elif confidence >= 0.5:
-                medium_confidence_fields += 1
-    
-    # Determinar calidad
-    if total_fields == 0:
-        return 'low'
-    
-    high_confidence_ratio = high_confidence_fields / total_fields
-    medium_confidence_ratio = (high_confidence_fields + medium_confidence_fields) / total_fields
-    
-    if high_confidence_ratio >= 0.7:
-        return 'high'
-    elif medium_confidence_ratio >= 0.5:
-        return 'medium'
-    else:
-        return 'low'
-
 @celery_app.task(name='ocr_tasks.health_check')
 def health_check() -> Dict[str, Any]:
     """Tarea de verificación de salud del worker"""
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Mide el efecto de normalizar la altura del texto de los recortes antes del OCR.
+
+Genera recortes sintéticos con texto conocido a distintas alturas (campos diminutos y
+enormes) y compara precisión (similitud de caracteres) y tiempo de Tesseract con y sin
+`normalize_crop_for_ocr`.
+
+Uso:
+    python scripts/benchmark_crop_normalization.py
+    python scripts/benchmark_crop_normalization.py --heights 8 12 20 32 64 128 --target 32
+"""
+
+import argparse
+import difflib
+
+import cv2
+import numpy as np
+
+from benchmark_utils import time_call, summarize_timings, save_report
+
+from config import OCR_TARGET_TEXT_HEIGHT
+from services.ocr_service import perform_ocr_with_tesseract, normalize_crop_for_ocr, estimate_text_height
+
+# Textos con el formato de los campos reales
+SAMPLE_TEXTS = [
+    ("dni_numero", "30.123.456", "0123456789."),
+    ("emisor_cuit", "20-12345678-9", "0123456789-"),
+    ("factura_fecha_emision", "15/03/2024", "0123456789/-."),
+    ("total", "$12.345,67", "0123456789.,$"),
+]
+
+
+def render_text_crop(text: str, text_height: int) -> np.ndarray:
+    """Recorte binarizado (texto negro sobre blanco) con una línea de ~`text_height` px de alto."""
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    (_, base_height), _ = cv2.getTextSize(text, font, 1.0, 2)
+    font_scale = text_height / base_height
+    thickness = max(1, int(round(font_scale * 2)))
+    (width, height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    margin = max(2, text_height // 8)
+    crop = np.full((height + baseline + 2 * margin, width + 2 * margin), 255, dtype=np.uint8)
+    cv2.putText(crop, text, (margin, margin + height), font, font_scale, 0, thickness, cv2.LINE_AA)
+    _, crop = cv2.threshold(crop, 127, 255, cv2.THRESH_BINARY)
+    return crop
+
+
+def similarity(expected: str, actual: str) -> float:
+    return difflib.SequenceMatcher(None, expected, actual.replace(" ", "")).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de normalización de recortes para OCR')
+    parser.add_argument('--heights', nargs='*', type=int, default=[8, 12, 16, 24, 32, 48, 96, 160])
+    parser.add_argument('--target', type=int, default=OCR_TARGET_TEXT_HEIGHT)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results/crop_normalization.json')
+    args = parser.parse_args()
+
+    print("🔠 BENCHMARK: NORMALIZACIÓN DE ALTURA DE TEXTO")
+    print("=" * 50)
+
+    report = {'target_height': args.target, 'heights': {}}
+    for text_height in args.heights:
+        entry = {}
+        for mode in ("raw", "normalized"):
+            timings = []
+            scores = []
+            for _, text, whitelist in SAMPLE_TEXTS:
+                crop = render_text_crop(text, text_height)
+
+                def run(image=crop, normalize=(mode == "normalized")):
+                    if normalize:
+                        image = normalize_crop_for_ocr(image, args.target)
+                    return perform_ocr_with_tesseract(image, lang='spa', psm=7, whitelist=whitelist)
+
+                crop_timings, output = time_call(run, repeat=args.repeat)
+                timings.extend(crop_timings)
+                scores.append(similarity(text, output))
+            entry[mode] = {'accuracy': sum(scores) / len(scores), 'latency': summarize_timings(timings)}
+
+        entry['estimated_height'] = estimate_text_height(render_text_crop(SAMPLE_TEXTS[0][1], text_height))
+        report['heights'][text_height] = entry
+        print(f"📏 {text_height:4d} px (estimado {entry['estimated_height']}) | "
+              f"sin normalizar {entry['raw']['accuracy']:.0%} en {entry['raw']['latency']['p50_ms']:.1f} ms | "
+              f"normalizado {entry['normalized']['accuracy']:.0%} en {entry['normalized']['latency']['p50_ms']:.1f} ms")
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compara la decodificación completa (cv2.imdecode con IMREAD_COLOR) contra
+`decode_document_image` (decodificación JPEG reducida + presupuesto de píxeles)
+en fotos sintéticas de celular de 12, 24 y 48 MP: tiempo y memoria pico de numpy.
+
+Uso:
+    python scripts/benchmark_decoding.py
+    python scripts/benchmark_decoding.py --images tests/ --megapixels 12 48
+"""
+
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmark_utils import load_corpus_images, time_call, summarize_timings, save_report
+
+from services.image_decoding import decode_document_image
+
+
+def make_phone_jpeg(image, megapixels: float, quality: int = 92) -> bytes:
+    """Escala la imagen a `megapixels` (relación 4:3) y la codifica como JPEG, como una foto de celular."""
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = int(height * 4 / 3)
+    photo = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("No se pudo codificar el JPEG")
+    return encoded.tobytes()
+
+
+def full_decode(image_bytes: bytes):
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def peak_memory_mb(func, *args) -> float:
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de decodificación reducida de imágenes')
+    parser.add_argument('--images', nargs='*', help='Imágenes o directorios (default: tests/test_invoice.jpg)')
+    parser.add_argument('--megapixels', nargs='*', type=float, default=[12, 24, 48])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='benchmark_results/decoding.json')
+    args = parser.parse_args()
+
+    print("🖼️  BENCHMARK: DECODIFICACIÓN DE IMÁGENES")
+    print("=" * 50)
+
+    images = load_corpus_images(args.images)
+    if not images:
+        raise SystemExit("❌ No hay imágenes para el benchmark")
+
+    report = {'sizes': {}}
+    for megapixels in args.megapixels:
+        samples = [make_phone_jpeg(img, megapixels) for _, img in images]
+        entry = {}
+        for name, decoder in (("full", full_decode), ("reduced", decode_document_image)):
+            timings, memory = [], []
+            for image_bytes in samples:
+                sample_timings, decoded = time_call(decoder, image_bytes, repeat=args.repeat)
+                timings.extend(sample_timings)
+                memory.append(peak_memory_mb(decoder, image_bytes))
+            entry[name] = {
+                'latency': summarize_timings(timings),
+                'peak_numpy_mb': max(memory),
+                'decoded_shape': list(decoded.shape),
+            }
+        entry['speedup'] = entry['full']['latency']['p50_ms'] / entry['reduced']['latency']['p50_ms']
+        entry['memory_ratio'] = entry['full']['peak_numpy_mb'] / max(entry['reduced']['peak_numpy_mb'], 1e-6)
+        report['sizes'][megapixels] = entry
+        print(f"📷 {megapixels:4.0f} MP | completa {entry['full']['latency']['p50_ms']:.0f} ms, "
+              f"{entry['full']['peak_numpy_mb']:.0f} MB | reducida {entry['reduced']['latency']['p50_ms']:.0f} ms, "
+              f"{entry['reduced']['peak_numpy_mb']:.0f} MB {entry['reduced']['decoded_shape']} | "
+              f"x{entry['speedup']:.1f} tiempo, x{entry['memory_ratio']:.1f} memoria")
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compara memoria pico (RSS) y tiempo del estimador de inclinación original
+(np.column_stack(np.where(...)) sobre todos los píxeles de primer plano) contra el
+estimador por franjas de `estimate_skew_angle`, en escaneos sintéticos con ruido.
+
+Cada medición corre en un proceso nuevo para que el RSS pico no se contamine.
+
+Uso:
+    python scripts/benchmark_deskew.py
+    python scripts/benchmark_deskew.py --megapixels 4 25 50 --noise 0.3
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+
+from benchmark_utils import save_report
+
+
+def legacy_skew_angle(image):
+    """Estimador original: un punto int64 por píxel de primer plano."""
+    import cv2
+    import numpy as np
+
+    img = cv2.bitwise_not(image)
+    coords = np.column_stack(np.where(img > 0))
+    if len(coords) < 10:
+        return None
+    angle = cv2.minAreaRect(coords)[-1]
+    return -(90 + angle) if angle < -45 else -angle
+
+
+def make_noisy_scan(megapixels: float, noise: float, skew: float, seed: int = 0):
+    """Página A4 sintética con líneas de texto, inclinada y con ruido sal y pimienta."""
+    import cv2
+    import numpy as np
+
+    height = int((megapixels * 1e6 * 2 ** 0.5) ** 0.5)
+    width = int(height / 2 ** 0.5)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    line_height = max(12, height // 80)
+    for y in range(line_height * 4, height - line_height * 4, line_height * 2):
+        cv2.putText(page, "FACTURA 0001-00012345 CUIT 20-12345678-9 TOTAL $ 12.345,67", (width // 10, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, line_height / 30, 0, max(1, line_height // 12))
+    M = cv2.getRotationMatrix2D((width // 2, height // 2), skew, 1.0)
+    page = cv2.warpAffine(page, M, (width, height), borderValue=255)
+    if noise:
+        rng = np.random.default_rng(seed)
+        page[rng.random(page.shape, dtype=np.float32) < noise] = 128
+    return page
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _measure(method: str, megapixels: float, noise: float, skew: float) -> dict:
+    from services.preprocessing_service import estimate_skew_angle
+
+    page = make_noisy_scan(megapixels, noise, skew)
+    baseline = _max_rss_mb()
+    estimator = legacy_skew_angle if method == "legacy" else estimate_skew_angle
+    start = time.perf_counter()
+    angle = estimator(page)
+    seconds = time.perf_counter() - start
+    return {
+        'angle': angle,
+        'ms': seconds * 1000,
+        'peak_rss_mb': _max_rss_mb(),
+        'peak_rss_delta_mb': _max_rss_mb() - baseline,
+    }
+
+
+def measure_in_subprocess(method: str, megapixels: float, noise: float, skew: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (method, megapixels, noise, skew))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de memoria y tiempo del estimador de inclinación')
+    parser.add_argument('--megapixels', nargs='*', type=float, default=[2, 8, 25, 50])
+    parser.add_argument('--noise', type=float, default=0.2, help='Fracción de píxeles con ruido')
+    parser.add_argument('--skew', type=float, default=3.0)
+    parser.add_argument('--methods', nargs='*', default=['legacy', 'strips'])
+    parser.add_argument('--output', default='benchmark_results/deskew.json')
+    args = parser.parse_args()
+
+    print("📐 BENCHMARK: ESTIMADOR DE INCLINACIÓN")
+    print("=" * 50)
+
+    report = {'noise': args.noise, 'skew_degrees': args.skew, 'sizes': {}}
+    for megapixels in args.megapixels:
+        entry = {}
+        for method in args.methods:
+            try:
+                entry[method] = measure_in_subprocess(method, megapixels, args.noise, args.skew)
+            except Exception as e:  # p. ej. el proceso hijo muere por falta de memoria
+                entry[method] = {'error': str(e)}
+                print(f"❌ {megapixels} MP {method}: {e}")
+                continue
+            result = entry[method]
+            print(f"🖼️  {megapixels:5.1f} MP {method:7s} | {result['ms']:8.1f} ms | "
+                  f"RSS pico +{result['peak_rss_delta_mb']:.0f} MB | ángulo {result['angle']}")
+        report['sizes'][megapixels] = entry
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark y comparación de precisión entre las estrategias de OCR:
+- crop: un reconocimiento de Tesseract por caja YOLO
+- page: un reconocimiento de la página completa con asignación de palabras a cajas
+
+Uso:
+    python scripts/benchmark_ocr_strategies.py --images tests/ --type INVOICE_A
+    python scripts/benchmark_ocr_strategies.py --images facturas/ --ground-truth facturas/gt.json
+
+El archivo de ground truth (opcional) tiene la forma {"imagen.jpg": {"campo": "texto esperado"}}.
+Sin ground truth se reporta la concordancia entre ambas estrategias.
+"""
+
+import argparse
+import json
+import difflib
+
+from benchmark_utils import load_corpus_images, time_call, summarize_timings, save_report
+
+from services.preprocessing_service import preprocess_image_for_ocr
+from services.ocr_service import perform_yolo_ocr, OCR_STRATEGY_CROP, OCR_STRATEGY_PAGE
+from models.enums import DocumentType
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Similitud de caracteres (0-1) normalizando espacios y mayúsculas."""
+    a = " ".join(a.split()).upper()
+    b = " ".join(b.split()).upper()
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def field_scores(result: dict, expected: dict) -> dict:
+    return {field: text_similarity(result.get(field, {}).get('value', ''), text) for field, text in expected.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar estrategias de OCR crop vs page')
+    parser.add_argument('--images', nargs='*', help='Imágenes o directorios (default: tests/test_invoice.jpg)')
+    parser.add_argument('--type', default='INVOICE_A', choices=[t.value for t in DocumentType])
+    parser.add_argument('--ground-truth', help='JSON con los valores esperados por imagen')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results/ocr_strategies.json')
+    args = parser.parse_args()
+
+    document_type = DocumentType(args.type)
+    ground_truth = {}
+    if args.ground_truth:
+        with open(args.ground_truth, encoding='utf-8') as f:
+            ground_truth = json.load(f)
+
+    print("⏱️  BENCHMARK: ESTRATEGIAS DE OCR (crop vs page)")
+    print("=" * 50)
+
+    images = load_corpus_images(args.images)
+    if not images:
+        raise SystemExit("❌ No hay imágenes para el benchmark")
+
+    report = {'document_type': document_type.value, 'images': {}}
+    totals = {OCR_STRATEGY_CROP: [], OCR_STRATEGY_PAGE: []}
+
+    for name, img in images:
+        page = preprocess_image_for_ocr(img)
+        entry = {}
+        outputs = {}
+        for strategy in (OCR_STRATEGY_CROP, OCR_STRATEGY_PAGE):
+            timings, result = time_call(perform_yolo_ocr, page, document_type, strategy=strategy, repeat=args.repeat)
+            outputs[strategy] = result
+            totals[strategy].extend(timings)
+            entry[strategy] = {'timing': summarize_timings(timings), 'fields': len(result)}
+            if name in ground_truth:
+                scores = field_scores(result, ground_truth[name])
+                entry[strategy]['field_accuracy'] = scores
+                entry[strategy]['mean_accuracy'] = sum(scores.values()) / max(1, len(scores))
+
+        # Concordancia campo a campo entre estrategias
+        common = set(outputs[OCR_STRATEGY_CROP]) & set(outputs[OCR_STRATEGY_PAGE])
+        entry['agreement'] = {
+            field: text_similarity(outputs[OCR_STRATEGY_CROP][field]['value'], outputs[OCR_STRATEGY_PAGE][field]['value'])
+            for field in sorted(common)
+        }
+        report['images'][name] = entry
+
+        crop_ms = entry[OCR_STRATEGY_CROP]['timing']['p50_ms']
+        page_ms = entry[OCR_STRATEGY_PAGE]['timing']['p50_ms']
+        print(f"📸 {name}: {entry[OCR_STRATEGY_CROP]['fields']} campos | crop {crop_ms:.0f} ms | page {page_ms:.0f} ms")
+        if 'mean_accuracy' in entry[OCR_STRATEGY_CROP]:
+            print(f"   🎯 precisión crop {entry[OCR_STRATEGY_CROP]['mean_accuracy']:.2%} | "
+                  f"page {entry[OCR_STRATEGY_PAGE]['mean_accuracy']:.2%}")
+        if entry['agreement']:
+            mean_agreement = sum(entry['agreement'].values()) / len(entry['agreement'])
+            print(f"   🔁 concordancia entre estrategias: {mean_agreement:.2%}")
+
+    report['summary'] = {strategy: summarize_timings(timings) for strategy, timings in totals.items() if timings}
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
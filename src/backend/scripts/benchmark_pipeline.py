@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Suite de micro-benchmarks del pipeline de OCR, etapa por etapa:
+decodificación, control de calidad, cada etapa del preprocesamiento, inferencia YOLO,
+binarización y OCR de cada recorte, y raw_ocr_to_invoice_data / raw_ocr_to_dni_data.
+
+Corre sobre un corpus fijo (facturas y DNI sintéticos generados con semilla fija, más las
+imágenes de muestra) a varias resoluciones y reporta percentiles de latencia y memoria pico
+(tracemalloc) por etapa. El JSON resultante se puede comparar contra el de otra corrida.
+
+Uso:
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --sides 1754 3508 --repeat 10 --output benchmark_results/pipeline.json
+    python scripts/benchmark_pipeline.py --baseline benchmark_results/pipeline_main.json
+    python scripts/benchmark_pipeline.py --compare benchmark_results/pipeline_main.json benchmark_results/pipeline.json
+"""
+
+import argparse
+import json
+import platform
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from benchmark_utils import load_corpus_images, time_call, summarize_timings, traced_peak_mb, save_report
+
+from models.enums import DocumentType
+from models.extracted_data import raw_ocr_to_dni_data, raw_ocr_to_invoice_data
+from services.image_decoding import decode_document_image
+from services.quality_service import assess_image_quality
+from services.preprocessing_service import (
+    PREPROCESSING_PIPELINE_VERSION, PREPROCESSING_STAGES, prepare_page_for_detection, binarize_region,
+)
+from services.ocr_profiles import get_ocr_profile
+from services.ocr_service import (
+    detect_fields, get_yolo_model_name, get_yolo_precision, ocr_field_crop, scale_detections,
+)
+
+INVOICE_FIELDS = [
+    ('factura_numero', "0001-00012345"),
+    ('factura_fecha_emision', "15/03/2024"),
+    ('emisor_cuit', "20-12345678-9"),
+    ('emisor_razon_social', "DISTRIBUIDORA SUR S.A."),
+    ('receptor_cuit', "30-87654321-0"),
+    ('subtotal', "$ 10.000,00"),
+    ('iva_21', "$ 2.100,00"),
+    ('total', "$ 12.100,00"),
+]
+DNI_FIELDS = [
+    ('dni_apellido', "GONZALEZ"),
+    ('dni_nombre', "MARIA LAURA"),
+    ('dni_numero', "30.123.456"),
+    ('dni_fecha_nacimiento', "01/02/1985"),
+    ('dni_fecha_emision', "10/05/2020"),
+    ('dni_fecha_vencimiento', "10/05/2035"),
+]
+FILLER_WORDS = ["CANTIDAD", "DESCRIPCION", "PRECIO", "UNITARIO", "IMPORTE", "SERVICIO", "PRODUCTO",
+                "BONIFICACION", "CONDICION", "IVA", "RESPONSABLE", "INSCRIPTO", "CONTADO", "PERIODO"]
+
+
+def _draw_fields(page, fields, x, y, line_step, font_scale, thickness):
+    """Escribe `etiqueta: valor` por campo y retorna el bbox del valor de cada uno."""
+    boxes = {}
+    for field, value in fields:
+        label = field.split("_", 1)[-1].upper() + ": "
+        cv2.putText(page, label, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness)
+        (label_w, _), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        (value_w, value_h), baseline = cv2.getTextSize(value, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        cv2.putText(page, value, (x + label_w, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness)
+        pad = max(2, value_h // 3)
+        boxes[field] = [x + label_w - pad, y - value_h - pad, x + label_w + value_w + pad, y + baseline + pad]
+        y += line_step
+    return boxes, y
+
+
+def make_synthetic_invoice(long_side: int, seed: int = 0):
+    """Factura A4 sintética con `long_side` px de alto: campos conocidos + renglones de relleno."""
+    rng = np.random.default_rng(seed)
+    scale = long_side / 3508  # 1.0 = A4 a 300 DPI
+    page = np.full((long_side, int(long_side / 2 ** 0.5), 3), 255, dtype=np.uint8)
+    font_scale, thickness = 1.6 * scale, max(1, int(3 * scale))
+    boxes, y = _draw_fields(page, INVOICE_FIELDS, int(200 * scale), int(350 * scale), int(110 * scale),
+                            font_scale, thickness)
+    while y < long_side - int(300 * scale):
+        line = " ".join(rng.choice(FILLER_WORDS, size=6))
+        cv2.putText(page, line, (int(200 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, font_scale * 0.8, (0, 0, 0),
+                    thickness)
+        y += int(80 * scale)
+    return page, boxes
+
+
+def make_synthetic_dni(long_side: int, seed: int = 0):
+    """DNI (formato ID-1, 85,6 x 54 mm) sintético con `long_side` px de ancho sobre fondo de color."""
+    rng = np.random.default_rng(seed)
+    scale = long_side / 1011  # 1.0 = ID-1 a 300 DPI
+    card = np.empty((int(long_side * 54 / 85.6), long_side, 3), dtype=np.uint8)
+    card[:] = (235, 225, 210)
+    # Textura de fondo suave, como la trama de seguridad de la tarjeta
+    card = cv2.add(card, rng.integers(0, 12, card.shape, dtype=np.uint8))
+    boxes, _ = _draw_fields(card, DNI_FIELDS, int(330 * scale), int(150 * scale), int(65 * scale),
+                            0.9 * scale, max(1, int(2 * scale)))
+    cv2.rectangle(card, (int(40 * scale), int(110 * scale)), (int(290 * scale), int(440 * scale)), (120, 110, 100), -1)
+    return card, boxes
+
+
+def build_corpus(sample_paths, sides: list, seed: int):
+    """
+    Corpus fijo: (nombre, tipo de documento, lado mayor, bytes JPEG, cajas de los campos o None).
+    Las muestras reales se tratan como facturas y no tienen cajas conocidas.
+    """
+    corpus = []
+    samples = load_corpus_images(sample_paths)
+    for side in sides:
+        pages = [
+            ("factura_sintetica", DocumentType.INVOICE_A, *make_synthetic_invoice(side, seed)),
+            ("dni_sintetico", DocumentType.DNI_FRONT, *make_synthetic_dni(side, seed)),
+        ]
+        for name, image in samples:
+            h, w = image.shape[:2]
+            factor = side / max(h, w)
+            resized = cv2.resize(image, (int(w * factor), int(h * factor)), interpolation=cv2.INTER_AREA
+                                 if factor < 1 else cv2.INTER_CUBIC)
+            pages.append((name, DocumentType.INVOICE_A, resized, None))
+
+        for name, document_type, image, boxes in pages:
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+            if not ok:
+                raise RuntimeError(f"No se pudo codificar {name}")
+            corpus.append((name, document_type, side, encoded.tobytes(), image.shape[:2], boxes))
+    return corpus
+
+
+def raw_ocr_sample(boxes: dict, fields: list) -> dict:
+    return {field: {'value': value, 'confidence': 0.9, 'bbox': boxes[field]} for field, value in fields}
+
+
+class StageRecorder:
+    """Acumula latencias (segundos) y memoria pico (MB) por etapa."""
+
+    def __init__(self):
+        self.timings = {}
+        self.peaks = {}
+        self.skipped = {}
+
+    def add(self, stage: str, timings, peak_mb: float = None):
+        if timings:
+            self.timings.setdefault(stage, []).extend(timings)
+        if peak_mb is not None:
+            self.peaks[stage] = max(self.peaks.get(stage, 0.0), peak_mb)
+
+    def skip(self, stage: str, reason: str):
+        if stage not in self.skipped:
+            self.skipped[stage] = reason
+            print(f"   ⏭️  {stage} omitido: {reason}")
+
+    def report(self) -> dict:
+        stages = {}
+        for stage, timings in self.timings.items():
+            stages[stage] = {'latency': summarize_timings(timings), 'peak_memory_mb': self.peaks.get(stage)}
+        return {'stages': stages, 'skipped': self.skipped}
+
+
+@contextmanager
+def trace_preprocessing_stages(recorder: StageRecorder):
+    """Mide la memoria pico de cada etapa del preprocesamiento envolviendo PREPROCESSING_STAGES."""
+    originals = dict(PREPROCESSING_STAGES)
+
+    def traced(name, stage_func):
+        def run(state):
+            result, peak_mb = traced_peak_mb(stage_func, state)
+            recorder.add(f"preprocessing.{name}", [], peak_mb)
+            return result
+        return run
+
+    PREPROCESSING_STAGES.update({name: traced(name, func) for name, func in originals.items()})
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+        PREPROCESSING_STAGES.update(originals)
+
+
+def benchmark_document(recorder: StageRecorder, document_type, image_bytes: bytes, source_shape, boxes, repeat: int):
+    # Decodificación
+    timings, decoded = time_call(decode_document_image, image_bytes, repeat=repeat)
+    _, peak = traced_peak_mb(decode_document_image, image_bytes)
+    recorder.add("decode", timings, peak)
+
+    # Control de calidad sobre la miniatura
+    timings, _ = time_call(assess_image_quality, decoded, document_type, repeat=repeat)
+    _, peak = traced_peak_mb(assess_image_quality, decoded, document_type)
+    recorder.add("quality", timings, peak)
+
+    # Preprocesamiento: latencia de cada etapa desde metadata['preprocessing']
+    prepared = None
+    for _ in range(repeat):
+        metadata = {}
+        prepared = prepare_page_for_detection(decoded, document_type, metadata=metadata)
+        for entry in metadata['preprocessing']['stages']:
+            recorder.add(f"preprocessing.{entry['stage']}", [entry['ms'] / 1000])
+        recorder.add("preprocessing.total", [metadata['preprocessing']['total_ms'] / 1000])
+    # Memoria: una corrida con cada etapa instrumentada y otra para el pico del pipeline completo
+    with trace_preprocessing_stages(recorder):
+        prepare_page_for_detection(decoded, document_type)
+    _, peak = traced_peak_mb(prepare_page_for_detection, decoded, document_type)
+    recorder.add("preprocessing.total", [], peak)
+
+    # Inferencia YOLO sobre la página reducida
+    detections = None
+    try:
+        model_name = get_yolo_model_name(document_type)
+        precision = get_yolo_precision(document_type)
+        timings, detections = time_call(detect_fields, prepared.detection_image, model_name, precision,
+                                        repeat=repeat)
+        _, peak = traced_peak_mb(detect_fields, prepared.detection_image, model_name, precision)
+        recorder.add("yolo", timings, peak)
+        detections = scale_detections(detections, prepared.detection_image.shape, prepared.ocr_image.shape)
+    except Exception as e:  # modelo no entrenado/exportado en esta máquina
+        recorder.skip("yolo", str(e))
+
+    # Recortes: las cajas conocidas del documento sintético, o las detectadas por YOLO
+    if boxes:
+        detections = scale_detections([(field, 1.0, bbox) for field, bbox in boxes.items()], source_shape,
+                                      prepared.ocr_image.shape)
+    for field, _, bbox in detections or []:
+        timings, crop = time_call(binarize_region, prepared.ocr_image, bbox, repeat=repeat)
+        recorder.add("crop_binarize", timings)
+        try:
+            timings, _ = time_call(ocr_field_crop, crop, get_ocr_profile(field), repeat=repeat)
+            _, peak = traced_peak_mb(ocr_field_crop, crop, get_ocr_profile(field))
+            recorder.add("crop_ocr", timings, peak)
+        except Exception as e:  # Tesseract no instalado
+            recorder.skip("crop_ocr", str(e))
+            break
+
+
+def benchmark_structuring(recorder: StageRecorder, repeat: int):
+    """raw_ocr_to_*: independiente de la resolución, se mide con más repeticiones."""
+    _, invoice_boxes = make_synthetic_invoice(1754)
+    _, dni_boxes = make_synthetic_dni(1011)
+    document_id = uuid.uuid4()
+    for stage, func, raw in (
+        ("raw_ocr_to_invoice_data", raw_ocr_to_invoice_data, raw_ocr_sample(invoice_boxes, INVOICE_FIELDS)),
+        ("raw_ocr_to_dni_data", raw_ocr_to_dni_data, raw_ocr_sample(dni_boxes, DNI_FIELDS)),
+    ):
+        timings, _ = time_call(func, document_id, raw, repeat=repeat * 50, warmup=5)
+        _, peak = traced_peak_mb(func, document_id, raw)
+        recorder.add(stage, timings, peak)
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> list:
+    """Imprime la diferencia de p50/p95 y memoria por etapa; retorna las regresiones (> threshold)."""
+    regressions = []
+    for group, entry in current['results'].items():
+        base_group = baseline.get('results', {}).get(group)
+        if not base_group:
+            print(f"🆕 {group}: sin datos en la línea base")
+            continue
+        print(f"\n📊 {group}")
+        print(f"   {'etapa':32s} {'p50 base':>10s} {'p50':>10s} {'Δ p50':>8s} {'Δ p95':>8s} {'Δ MB':>8s}")
+        for stage, result in entry['stages'].items():
+            base = base_group['stages'].get(stage)
+            if base is None:
+                print(f"   {stage:32s} {'-':>10s} {result['latency']['p50_ms']:10.2f}   (nueva)")
+                continue
+            deltas = {pct: (result['latency'][f'{pct}_ms'] / max(base['latency'][f'{pct}_ms'], 1e-9)) - 1
+                      for pct in ('p50', 'p95')}
+            memory_delta = (result['peak_memory_mb'] or 0) - (base['peak_memory_mb'] or 0)
+            flag = ""
+            if deltas['p50'] > threshold:
+                flag = " ⚠️"
+                regressions.append({'group': group, 'stage': stage, 'p50_delta': deltas['p50']})
+            print(f"   {stage:32s} {base['latency']['p50_ms']:10.2f} {result['latency']['p50_ms']:10.2f} "
+                  f"{deltas['p50']:+8.1%} {deltas['p95']:+8.1%} {memory_delta:+8.1f}{flag}")
+    return regressions
+
+
+def run_suite(args) -> dict:
+    corpus = build_corpus(args.images, args.sides, args.seed)
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'preprocessing_pipeline_version': PREPROCESSING_PIPELINE_VERSION,
+        },
+        'parameters': {'sides': args.sides, 'repeat': args.repeat, 'seed': args.seed,
+                       'corpus': sorted({name for name, *_ in corpus})},
+        'results': {},
+    }
+
+    recorders = {}
+    for name, document_type, side, image_bytes, source_shape, boxes in corpus:
+        print(f"📄 {name} ({document_type.value}) a {side} px")
+        recorder = recorders.setdefault(f"{side}px", StageRecorder())
+        benchmark_document(recorder, document_type, image_bytes, source_shape, boxes, args.repeat)
+
+    structuring = recorders["structuring"] = StageRecorder()
+    benchmark_structuring(structuring, args.repeat)
+
+    for group, recorder in recorders.items():
+        report['results'][group] = recorder.report()
+        print(f"\n⏱️  {group}")
+        for stage, result in report['results'][group]['stages'].items():
+            peak = result['peak_memory_mb']
+            print(f"   {stage:32s} p50 {result['latency']['p50_ms']:9.2f} ms | p95 {result['latency']['p95_ms']:9.2f} ms"
+                  f" | pico {peak if peak is not None else float('nan'):7.1f} MB")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suite de micro-benchmarks del pipeline de OCR por etapa')
+    parser.add_argument('--images', nargs='*', help='Imágenes de muestra (default: tests/test_invoice.jpg)')
+    parser.add_argument('--sides', nargs='*', type=int, default=[1011, 1754, 3508],
+                        help='Lado mayor en px de cada documento del corpus')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los documentos sintéticos')
+    parser.add_argument('--output', default='benchmark_results/pipeline.json')
+    parser.add_argument('--baseline', help='Reporte previo contra el cual comparar esta corrida')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'ACTUAL'),
+                        help='Solo compara dos reportes guardados, sin correr el benchmark')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Aumento relativo del p50 considerado regresión (default: 10%%)')
+    args = parser.parse_args()
+
+    print("🧪 BENCHMARK: PIPELINE DE OCR POR ETAPA")
+    print("=" * 50)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args)
+        save_report(current, args.output)
+        if not args.baseline:
+            return
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = compare_reports(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} etapas más lentas que la línea base (> {args.threshold:.0%} en p50)")
+        raise SystemExit(1)
+    print("\n✅ Sin regresiones respecto de la línea base")
+
+
+if __name__ == "__main__":
+    main()
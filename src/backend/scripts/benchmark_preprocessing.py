@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Compara el preprocesamiento a resolución completa (cadena original: deskew y perspectiva
+sobre la página entera) con la estimación de geometría sobre la pirámide de
+`preprocess_image_for_ocr`, en escaneos grandes (A4 a 150/300/400 DPI).
+
+Uso:
+    python scripts/benchmark_preprocessing.py
+    python scripts/benchmark_preprocessing.py --images tests/ --sides 3508 4678 --skew 3
+"""
+
+import argparse
+
+import cv2
+
+from benchmark_utils import load_corpus_images, time_call, summarize_timings, save_report
+
+from services.preprocessing_service import (
+    preprocess_image_for_ocr, deskew_image, correct_perspective,
+    estimate_skew_angle, build_pyramid_level,
+)
+
+
+def legacy_preprocess(np_image):
+    """Cadena original: todas las etapas a resolución completa."""
+    gray = cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    processed = correct_perspective(deskew_image(blurred))
+    return cv2.adaptiveThreshold(processed, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+
+def make_scan(image, long_side: int, skew: float):
+    """Escala la imagen a `long_side` px de lado mayor y la inclina `skew` grados."""
+    h, w = image.shape[:2]
+    factor = long_side / max(h, w)
+    scan = cv2.resize(image, (int(w * factor), int(h * factor)), interpolation=cv2.INTER_CUBIC)
+    if skew:
+        h, w = scan.shape[:2]
+        M = cv2.getRotationMatrix2D((w // 2, h // 2), skew, 1.0)
+        scan = cv2.warpAffine(scan, M, (w, h), borderValue=(255, 255, 255))
+    return scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de preprocesamiento con pirámide de imágenes')
+    parser.add_argument('--images', nargs='*', help='Imágenes o directorios (default: tests/test_invoice.jpg)')
+    parser.add_argument('--sides', nargs='*', type=int, default=[1754, 3508, 4678],
+                        help='Lado mayor en px (A4: 1754 = 150 DPI, 3508 = 300 DPI, 4678 = 400 DPI)')
+    parser.add_argument('--skew', type=float, default=2.0, help='Inclinación sintética en grados')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results/preprocessing.json')
+    args = parser.parse_args()
+
+    print("🗻 BENCHMARK: PREPROCESAMIENTO CON PIRÁMIDE")
+    print("=" * 50)
+
+    images = load_corpus_images(args.images)
+    if not images:
+        raise SystemExit("❌ No hay imágenes para el benchmark")
+
+    report = {'skew_degrees': args.skew, 'sides': {}}
+    for side in args.sides:
+        legacy_timings, pyramid_timings = [], []
+        angles = []
+        for _, image in images:
+            scan = make_scan(image, side, args.skew)
+            timings, _ = time_call(legacy_preprocess, scan, repeat=args.repeat)
+            legacy_timings.extend(timings)
+            timings, _ = time_call(preprocess_image_for_ocr, scan, repeat=args.repeat)
+            pyramid_timings.extend(timings)
+
+            # Ángulo estimado a resolución completa vs sobre el nivel de la pirámide
+            blurred = cv2.GaussianBlur(cv2.cvtColor(scan, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+            angles.append({'full': estimate_skew_angle(blurred),
+                           'pyramid': estimate_skew_angle(build_pyramid_level(blurred))})
+
+        entry = {
+            'megapixels': round(side * side / 2 ** 0.5 / 1e6, 1),
+            'legacy': summarize_timings(legacy_timings),
+            'pyramid': summarize_timings(pyramid_timings),
+            'skew_estimates': angles,
+        }
+        entry['speedup'] = entry['legacy']['p50_ms'] / entry['pyramid']['p50_ms']
+        report['sides'][side] = entry
+        print(f"📄 {side} px (~{entry['megapixels']} MP) | resolución completa {entry['legacy']['p50_ms']:.0f} ms | "
+              f"pirámide {entry['pyramid']['p50_ms']:.0f} ms (x{entry['speedup']:.1f})")
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de OCR por recorte: pytesseract (un proceso por llamada) vs
+handle persistente de Tesseract en proceso (tesserocr).
+
+Uso:
+    python scripts/benchmark_tesseract_pool.py [--images tests/] [--crops 200]
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_utils import load_corpus_images, save_report
+
+import pytesseract
+from PIL import Image
+
+from services.preprocessing_service import preprocess_image_for_ocr
+from services.tesseract_pool import tesserocr, recognize_array, warmup_tesseract_pool
+
+
+def sample_crops(images, count: int, seed: int = 0):
+    """Genera recortes tipo "campo" (una línea de texto) a partir de las páginas preprocesadas."""
+    rng = random.Random(seed)
+    pages = [preprocess_image_for_ocr(img) for _, img in images]
+    crops = []
+    while len(crops) < count:
+        page = rng.choice(pages)
+        h, w = page.shape[:2]
+        crop_h = rng.randint(20, max(21, min(60, h // 4)))
+        crop_w = rng.randint(80, max(81, min(600, w // 2)))
+        y = rng.randint(0, max(0, h - crop_h))
+        x = rng.randint(0, max(0, w - crop_w))
+        crops.append(page[y:y + crop_h, x:x + crop_w])
+    return crops
+
+
+def run_pytesseract(crops, lang: str, psm: int):
+    config = f'--oem 3 --psm {psm}'
+    return [pytesseract.image_to_string(Image.fromarray(c), lang=lang, config=config).strip() for c in crops]
+
+
+def run_api(crops, lang: str, psm: int):
+    return [recognize_array(c, lang=lang, psm=psm).strip() for c in crops]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pytesseract vs pool de handles Tesseract')
+    parser.add_argument('--images', nargs='*', help='Imágenes o directorios de prueba (default: tests/test_invoice.jpg)')
+    parser.add_argument('--crops', type=int, default=100, help='Cantidad de recortes a reconocer')
+    parser.add_argument('--lang', default='spa')
+    parser.add_argument('--psm', type=int, default=7)
+    parser.add_argument('--output', default='benchmark_results/tesseract_pool.json')
+    args = parser.parse_args()
+
+    print("⏱️  BENCHMARK: OCR POR RECORTE")
+    print("=" * 50)
+
+    images = load_corpus_images(args.images)
+    if not images:
+        raise SystemExit("❌ No hay imágenes para el benchmark")
+    crops = sample_crops(images, args.crops)
+    print(f"📦 {len(crops)} recortes generados desde {len(images)} imágenes")
+
+    report = {'crops': len(crops), 'lang': args.lang, 'psm': args.psm, 'results': {}}
+
+    start = time.perf_counter()
+    cli_texts = run_pytesseract(crops, args.lang, args.psm)
+    elapsed = time.perf_counter() - start
+    report['results']['pytesseract'] = {'seconds': elapsed, 'crops_per_sec': len(crops) / elapsed}
+    print(f"🐢 pytesseract: {len(crops) / elapsed:.1f} recortes/s ({elapsed:.2f}s)")
+
+    if tesserocr is None:
+        print("⚠️  tesserocr no está instalado: se omite la medición del pool")
+    else:
+        # La carga del traineddata ocurre al iniciar el worker, no en la medición
+        warmup_tesseract_pool([args.lang])
+        start = time.perf_counter()
+        api_texts = run_api(crops, args.lang, args.psm)
+        elapsed = time.perf_counter() - start
+        matches = sum(1 for a, b in zip(cli_texts, api_texts) if a == b)
+        report['results']['tesseract_api'] = {
+            'seconds': elapsed,
+            'crops_per_sec': len(crops) / elapsed,
+            'identical_outputs': matches,
+        }
+        speedup = report['results']['pytesseract']['seconds'] / elapsed
+        report['speedup'] = speedup
+        print(f"🚀 tesserocr:   {len(crops) / elapsed:.1f} recortes/s ({elapsed:.2f}s) - speedup x{speedup:.1f}")
+        print(f"🔍 Salidas idénticas: {matches}/{len(crops)}")
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
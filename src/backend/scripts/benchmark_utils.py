@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas por los scripts de benchmark
+"""
+
+import os
+import sys
+import time
+import json
+import statistics
+import tracemalloc
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar los servicios del backend
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+# Imagen de muestra incluida en el repositorio
+SAMPLE_INVOICE = BACKEND_DIR / "tests" / "test_invoice.jpg"
+
+
+def time_call(func, *args, repeat: int = 5, warmup: int = 1, **kwargs):
+    """
+    Ejecuta `func` varias veces y retorna (lista de tiempos en segundos, último resultado).
+    Las primeras `warmup` ejecuciones no se miden.
+    """
+    result = None
+    for _ in range(warmup):
+        result = func(*args, **kwargs)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def summarize_timings(timings):
+    """Resume una lista de tiempos (segundos) en milisegundos."""
+    ordered = sorted(timings)
+    return {
+        'runs': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'min_ms': ordered[0] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def traced_peak_mb(func, *args, **kwargs):
+    """
+    Ejecuta `func` una vez y retorna (resultado, memoria pico en MB asignada durante la llamada).
+    Mide con tracemalloc (incluye los arrays de numpy; no la memoria interna de OpenCV ni de Tesseract).
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return result, max(0, peak - current) / (1024 * 1024)
+
+
+def percentile(ordered_values, pct: float) -> float:
+    """Percentil con interpolación lineal sobre una lista ya ordenada."""
+    if not ordered_values:
+        return 0.0
+    k = (len(ordered_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered_values) - 1)
+    return ordered_values[lower] + (ordered_values[upper] - ordered_values[lower]) * (k - lower)
+
+
+def load_corpus_images(paths):
+    """Carga imágenes (BGR) desde archivos o directorios. Usa la factura de prueba si no se indica nada."""
+    import cv2
+
+    files = []
+    for path in (paths or [SAMPLE_INVOICE]):
+        path = Path(path)
+        if path.is_dir():
+            for ext in ('*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tif', '*.tiff'):
+                files.extend(sorted(path.glob(ext)))
+        else:
+            files.append(path)
+
+    images = []
+    for file_path in files:
+        img = cv2.imread(str(file_path))
+        if img is None:
+            print(f"⚠️  No se pudo leer: {file_path}")
+            continue
+        images.append((file_path.name, img))
+    return images
+
+
+def save_report(report: dict, output_path):
+    """Guarda un reporte de benchmark en JSON."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"💾 Reporte guardado en: {output_path}")
+
+
+def cpu_count() -> int:
+    return os.cpu_count() or 1
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compara latencia y throughput de los runtimes YOLO en CPU (PyTorch, ONNX Runtime, OpenVINO)
+y la concordancia de sus detecciones contra PyTorch.
+
+Uso:
+    python scripts/benchmark_yolo_runtimes.py --model invoices_cpu_abs/weights/best.pt --images tests/
+"""
+
+import argparse
+import time
+
+from benchmark_utils import load_corpus_images, time_call, summarize_timings, save_report
+
+from services.model_loader import load_yolo_model, RUNTIME_PREFERENCE, RUNTIME_TORCH
+
+
+def detections_of(result):
+    """Lista de (clase, conf, xyxy) de un resultado, independiente del runtime."""
+    boxes = result.boxes
+    detections = []
+    for box in boxes:
+        xyxy = [float(v) for v in box.xyxy[0]]
+        detections.append((int(box.cls[0]), float(box.conf[0]), xyxy))
+    return detections
+
+
+def iou(a, b) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def matched_ratio(reference, candidate, iou_threshold: float = 0.5) -> float:
+    """Fracción de detecciones de referencia con una detección de la misma clase e IoU >= umbral."""
+    if not reference:
+        return 1.0 if not candidate else 0.0
+    matched = 0
+    for cls, _, box in reference:
+        if any(c == cls and iou(box, b) >= iou_threshold for c, _, b in candidate):
+            matched += 1
+    return matched / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de runtimes YOLO en CPU')
+    parser.add_argument('--model', default='invoices_cpu_abs/weights/best.pt')
+    parser.add_argument('--images', nargs='*', help='Imágenes o directorios (default: tests/test_invoice.jpg)')
+    parser.add_argument('--runtimes', nargs='*', default=RUNTIME_PREFERENCE)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=8, help='Tamaño de lote para medir throughput')
+    parser.add_argument('--output', default='benchmark_results/yolo_runtimes.json')
+    args = parser.parse_args()
+
+    print("⏱️  BENCHMARK: RUNTIMES YOLO EN CPU")
+    print("=" * 50)
+
+    images = [img for _, img in load_corpus_images(args.images)]
+    if not images:
+        raise SystemExit("❌ No hay imágenes para el benchmark")
+
+    report = {'model': args.model, 'images': len(images), 'runtimes': {}}
+    reference = None
+
+    # PyTorch primero: es la referencia para medir la concordancia de los demás runtimes
+    runtimes = sorted(args.runtimes, key=lambda r: r != RUNTIME_TORCH)
+    for runtime in runtimes:
+        try:
+            start = time.perf_counter()
+            model = load_yolo_model(args.model, runtime=runtime)
+            load_seconds = time.perf_counter() - start
+        except (FileNotFoundError, ImportError) as e:
+            print(f"⚠️  {runtime}: no disponible ({e})")
+            continue
+
+        # Latencia: una imagen por llamada
+        timings = []
+        outputs = []
+        for image in images:
+            image_timings, results = time_call(model, image, repeat=args.repeat)
+            timings.extend(image_timings)
+            outputs.append(detections_of(results[0]))
+
+        # Throughput: lotes de `batch` imágenes
+        batch = (images * args.batch)[:args.batch]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            model(batch)
+        throughput = args.batch * args.repeat / (time.perf_counter() - start)
+
+        entry = {
+            'load_seconds': load_seconds,
+            'latency': summarize_timings(timings),
+            'throughput_images_per_sec': throughput,
+        }
+        if runtime == RUNTIME_TORCH:
+            reference = outputs
+        elif reference is not None:
+            entry['agreement_vs_torch'] = sum(matched_ratio(r, c) for r, c in zip(reference, outputs)) / len(outputs)
+
+        report['runtimes'][runtime] = entry
+        print(f"🤖 {runtime:9s} p50 {entry['latency']['p50_ms']:.1f} ms | p95 {entry['latency']['p95_ms']:.1f} ms | "
+              f"{throughput:.1f} img/s (lote {args.batch})"
+              + (f" | concordancia {entry['agreement_vs_torch']:.0%}" if 'agreement_vs_torch' in entry else ""))
+
+    save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Exporta los detectores YOLO (.pt) a ONNX y/o OpenVINO IR para inferencia en CPU sin PyTorch.
+
+Los archivos se guardan junto al .pt con la convención de ultralytics
+(best.pt -> best.onnx, best_openvino_model/), que es donde los busca services/model_loader.py.
+
+Uso:
+    python scripts/export_yolo_models.py                       # facturas y DNI, ONNX + OpenVINO
+    python scripts/export_yolo_models.py --formats onnx --batch 8
+"""
+
+import argparse
+from pathlib import Path
+
+from benchmark_utils import BACKEND_DIR  # noqa: F401 - agrega el backend al sys.path
+
+from config import YOLO_MODELS_PATH
+
+# Detectores usados en producción por perform_yolo_ocr
+DEFAULT_MODELS = [
+    "invoices_cpu_abs/weights/best.pt",
+    "dni_yolov8.pt",
+]
+
+
+def export_model(model_name: str, formats, imgsz: int, dynamic: bool, batch: int):
+    from ultralytics import YOLO
+
+    model_path = Path(YOLO_MODELS_PATH) / model_name
+    if not model_path.exists():
+        print(f"⚠️  Modelo no encontrado, se omite: {model_path}")
+        return {}
+
+    print(f"📦 Exportando {model_name}")
+    model = YOLO(str(model_path))
+    exported = {}
+    for fmt in formats:
+        kwargs = {"format": fmt, "imgsz": imgsz}
+        if fmt == "onnx":
+            # Batch dinámico para aprovechar el batching de services/batch_inference.py
+            kwargs.update({"dynamic": dynamic, "simplify": True})
+        elif dynamic:
+            kwargs["dynamic"] = True
+        if not dynamic and batch > 1:
+            kwargs["batch"] = batch
+        output = model.export(**kwargs)
+        exported[fmt] = str(output)
+        print(f"   ✅ {fmt}: {output}")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar modelos YOLO a ONNX/OpenVINO')
+    parser.add_argument('--models', nargs='*', default=DEFAULT_MODELS, help='Modelos relativos a YOLO_MODELS_PATH')
+    parser.add_argument('--formats', nargs='*', default=['onnx', 'openvino'], choices=['onnx', 'openvino'])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--static', action='store_true', help='Exportar con batch fijo en lugar de dinámico')
+    parser.add_argument('--batch', type=int, default=1, help='Tamaño de batch fijo (solo con --static)')
+    args = parser.parse_args()
+
+    print("🔄 EXPORTACIÓN DE MODELOS YOLO")
+    print("=" * 40)
+    for model_name in args.models:
+        export_model(model_name, args.formats, args.imgsz, not args.static, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Cuantización INT8 post-entrenamiento de los detectores de facturas y DNI.
+
+- Calibra con imágenes de los splits de `datasets/` que arman los scripts de entrenamiento.
+- Genera best_int8.onnx (ONNX Runtime, QDQ estático) y/o best_int8_openvino_model/ (OpenVINO + NNCF).
+- Evalúa mAP50-95 / mAP50 y latencia de FP32 vs INT8 y escribe <modelo>_quantization.json,
+  que services/model_loader.py usa para decidir si sirve la variante INT8 (YOLO_INT8_MAX_MAP_DROP).
+
+Uso:
+    python scripts/quantize_models.py
+    python scripts/quantize_models.py --models dni_yolov8.pt --data datasets/dni_robust/dataset.yaml --runtime onnx
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import yaml
+
+from benchmark_utils import summarize_timings
+
+from config import YOLO_MODELS_PATH
+from services import yolo_runtime
+from services.model_loader import (
+    get_exported_model_path, get_quantization_report_path,
+    RUNTIME_ONNX, RUNTIME_OPENVINO, PRECISION_FP32, PRECISION_INT8,
+)
+
+# Dataset de calibración/validación por defecto para cada detector
+DEFAULT_DATASETS = {
+    "invoices_cpu_abs/weights/best.pt": "yolo/dataset.yaml",
+    "dni_yolov8.pt": "datasets/dni_robust/dataset.yaml",
+}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def dataset_images(data_yaml: Path, split: str, limit: int) -> list:
+    """Rutas de imágenes de un split (train/val/test) según el dataset.yaml de YOLO."""
+    with open(data_yaml, encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path', data_yaml.parent))
+    if not root.is_absolute():
+        root = (data_yaml.parent / root).resolve()
+    split_dir = Path(data[split])
+    if not split_dir.is_absolute():
+        split_dir = root / split_dir
+    images = sorted(p for p in split_dir.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return images[:limit]
+
+
+class YoloCalibrationReader:
+    """CalibrationDataReader de ONNX Runtime con el mismo preprocesamiento que producción."""
+
+    def __init__(self, image_paths, input_name: str, imgsz: int):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.image_paths):
+            image = cv2.imread(str(self.image_paths[self._index]))
+            self._index += 1
+            if image is not None:
+                tensor, _ = yolo_runtime._to_input_tensor([image], self.imgsz)
+                return {self.input_name: tensor}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def quantize_onnx(model_name: str, calibration_paths, imgsz: int) -> Path:
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = Path(get_exported_model_path(model_name, RUNTIME_ONNX, PRECISION_FP32))
+    int8_path = Path(get_exported_model_path(model_name, RUNTIME_ONNX, PRECISION_INT8))
+
+    prepared_path = fp32_path.with_name(f"{fp32_path.stem}_prep.onnx")
+    quant_pre_process(str(fp32_path), str(prepared_path))
+
+    session = yolo_runtime.OnnxYoloModel(str(fp32_path)).session
+    reader = YoloCalibrationReader(calibration_paths, session.get_inputs()[0].name, imgsz)
+    quantize_static(
+        str(prepared_path), str(int8_path), reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    prepared_path.unlink(missing_ok=True)
+    return int8_path
+
+
+def quantize_openvino(model_name: str, data_yaml: Path, imgsz: int) -> Path:
+    from ultralytics import YOLO
+
+    # ultralytics calibra con NNCF usando el split de validación de `data`
+    model = YOLO(str(Path(YOLO_MODELS_PATH) / model_name))
+    output = model.export(format='openvino', int8=True, data=str(data_yaml), imgsz=imgsz)
+    return Path(output)
+
+
+def evaluate_map(model_path: Path, data_yaml: Path, imgsz: int) -> dict:
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task='detect').val(data=str(data_yaml), imgsz=imgsz, batch=1,
+                                                       split='val', plots=False, verbose=False)
+    return {'map50_95': float(metrics.box.map), 'map50': float(metrics.box.map50)}
+
+
+def measure_latency(model, image_paths, repeat: int) -> dict:
+    images = [img for img in (cv2.imread(str(p)) for p in image_paths) if img is not None]
+    model(images[0])  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        for image in images:
+            start = time.perf_counter()
+            model(image)
+            timings.append(time.perf_counter() - start)
+    return summarize_timings(timings)
+
+
+def load_runtime_model(runtime: str, path: Path):
+    if runtime == RUNTIME_OPENVINO:
+        return yolo_runtime.OpenVinoYoloModel(str(path))
+    return yolo_runtime.OnnxYoloModel(str(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cuantización INT8 de los detectores YOLO')
+    parser.add_argument('--models', nargs='*', default=list(DEFAULT_DATASETS))
+    parser.add_argument('--data', help='dataset.yaml (default: el de cada modelo en DEFAULT_DATASETS)')
+    parser.add_argument('--runtime', default=RUNTIME_OPENVINO, choices=[RUNTIME_OPENVINO, RUNTIME_ONNX])
+    parser.add_argument('--calibration-split', default='train')
+    parser.add_argument('--calibration-images', type=int, default=300)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--latency-images', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("🧮 CUANTIZACIÓN INT8 DE DETECTORES")
+    print("=" * 40)
+
+    for model_name in args.models:
+        data_yaml = Path(args.data or DEFAULT_DATASETS.get(model_name, '')).resolve()
+        if not data_yaml.is_file():
+            print(f"⚠️  Sin dataset.yaml para {model_name} ({data_yaml}); se omite")
+            continue
+
+        calibration = dataset_images(data_yaml, args.calibration_split, args.calibration_images)
+        latency_images = dataset_images(data_yaml, 'val', args.latency_images)
+        print(f"📦 {model_name}: {len(calibration)} imágenes de calibración ({args.calibration_split})")
+
+        fp32_path = Path(get_exported_model_path(model_name, args.runtime, PRECISION_FP32))
+        if not fp32_path.exists():
+            raise SystemExit(f"❌ Falta {fp32_path}: ejecutar primero scripts/export_yolo_models.py --formats {args.runtime}")
+
+        if args.runtime == RUNTIME_ONNX:
+            int8_path = quantize_onnx(model_name, calibration, args.imgsz)
+        else:
+            int8_path = quantize_openvino(model_name, data_yaml, args.imgsz)
+        print(f"   ✅ INT8: {int8_path}")
+
+        report = {'model': model_name, 'runtime': args.runtime, 'dataset': str(data_yaml)}
+        for precision, path in ((PRECISION_FP32, fp32_path), (PRECISION_INT8, int8_path)):
+            entry = evaluate_map(path, data_yaml, args.imgsz)
+            entry['latency'] = measure_latency(load_runtime_model(args.runtime, path), latency_images, args.repeat)
+            report[precision] = entry
+
+        report['map_delta'] = report[PRECISION_INT8]['map50_95'] - report[PRECISION_FP32]['map50_95']
+        report['latency_speedup'] = report[PRECISION_FP32]['latency']['p50_ms'] / report[PRECISION_INT8]['latency']['p50_ms']
+
+        report_path = Path(get_quantization_report_path(model_name))
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"   📊 mAP50-95 FP32 {report['fp32']['map50_95']:.4f} → INT8 {report['int8']['map50_95']:.4f} "
+              f"(Δ {report['map_delta']:+.4f})")
+        print(f"   ⏱️  p50 FP32 {report['fp32']['latency']['p50_ms']:.1f} ms → INT8 "
+              f"{report['int8']['latency']['p50_ms']:.1f} ms (x{report['latency_speedup']:.2f})")
+        print(f"   💾 Reporte: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# ocr_api/services/barcode_service.py
+
+import re
+import json
+import time
+import base64
+import logging
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+
+from models.enums import DocumentType
+from config import BARCODE_FAST_PATH, BARCODE_DETECTION_MAX_SIDE
+
+logger = logging.getLogger(__name__)
+
+# zxing-cpp es opcional: sin él no se lee el PDF417 del DNI y se usa YOLO + OCR
+try:
+    import zxingcpp
+except ImportError:  # pragma: no cover - depende del entorno
+    zxingcpp = None
+
+# Los campos leídos de un código tienen el valor exacto emitido: confianza máxima
+BARCODE_CONFIDENCE = 1.0
+BARCODE_FORMAT_AFIP_QR = "afip_qr"
+BARCODE_FORMAT_DNI_PDF417 = "dni_pdf417"
+
+# Margen alrededor del código al recortarlo de la página completa (fracción de su lado)
+_CROP_MARGIN = 0.25
+
+# Campos obligatorios del JSON del QR de AFIP (RG 4892); sin ellos el código no se usa
+_AFIP_QR_REQUIRED_KEYS = ('fecha', 'cuit', 'ptoVta', 'tipoCmp', 'nroCmp', 'importe', 'codAut')
+# tipoDocRec = 80: el receptor se identifica con CUIT
+_AFIP_DOC_TYPE_CUIT = 80
+# Moneda del QR (códigos de AFIP) -> prefijo que entiende ExtractedAmountField
+_AFIP_CURRENCY_PREFIXES = {'PES': "$ ", 'DOL': "USD "}
+
+# Letra del comprobante según el código de tipo de AFIP (facturas, notas de débito/crédito,
+# recibos y facturas de crédito electrónica MiPyMEs)
+AFIP_INVOICE_LETTERS = {
+    **{code: 'A' for code in (1, 2, 3, 4, 5, 201, 202, 203)},
+    **{code: 'B' for code in (6, 7, 8, 9, 10, 206, 207, 208)},
+    **{code: 'C' for code in (11, 12, 13, 15, 211, 212, 213)},
+    **{code: 'E' for code in (19, 20, 21)},
+    **{code: 'M' for code in (51, 52, 53, 54)},
+}
+
+_INVOICE_TYPES = (DocumentType.INVOICE_A, DocumentType.INVOICE_B, DocumentType.INVOICE_C)
+
+# PDF417 del DNI tarjeta, campos separados por '@'. Formato actual (2012+, en el frente):
+#   tramite@APELLIDO@NOMBRES@sexo@numero@ejemplar@nacimiento@emision@...
+# Formato anterior (2009-2012, en el dorso), comienza con '@':
+#   @numero@ejemplar@..@APELLIDO@NOMBRES@nacionalidad@nacimiento@sexo@emision@tramite@..@vencimiento@...
+_DNI_FIELDS_CURRENT = {'dni_apellido': 1, 'dni_nombre': 2, 'dni_sexo': 3, 'dni_numero': 4,
+                       'dni_fecha_nacimiento': 6, 'dni_fecha_emision': 7}
+_DNI_FIELDS_PREVIOUS = {'dni_numero': 1, 'dni_apellido': 4, 'dni_nombre': 5, 'dni_fecha_nacimiento': 7,
+                        'dni_sexo': 8, 'dni_fecha_emision': 9, 'dni_fecha_vencimiento': 12}
+_DNI_DATE_FIELDS = ('dni_fecha_nacimiento', 'dni_fecha_emision', 'dni_fecha_vencimiento')
+_DNI_SEX_VALUES = ('M', 'F', 'X')
+
+
+def format_cuit(cuit) -> str:
+    """20123456789 -> '20-12345678-9' (mismo formato que el patrón de los campos CUIT)."""
+    digits = re.sub(r"\D", "", str(cuit))
+    if len(digits) != 11:
+        raise ValueError(f"CUIT inválido: {cuit}")
+    return f"{digits[:2]}-{digits[2:10]}-{digits[10]}"
+
+
+def format_amount(amount, currency: str = None) -> str:
+    """1234.5 -> '$ 1.234,50': formato argentino, el que parsea ExtractedAmountField."""
+    value = f"{Decimal(str(amount)):,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    prefix = _AFIP_CURRENCY_PREFIXES.get(currency, f"{currency} " if currency else "")
+    return f"{prefix}{value}"
+
+
+def decode_afip_qr_payload(qr_text: str) -> dict:
+    """
+    Extrae el JSON del QR de AFIP: la URL (https://www.afip.gob.ar/fe/qr/?p=...) lleva en `p`
+    el JSON en base64. Lanza ValueError si el texto no es un QR de AFIP válido.
+    """
+    values = parse_qs(urlparse(qr_text.strip()).query).get('p')
+    if not values:
+        raise ValueError("El QR no contiene el parámetro 'p' de AFIP")
+    # parse_qs convierte los '+' sin escapar en espacios; se aceptan también base64 url-safe y sin relleno
+    encoded = values[0].replace(" ", "+").replace("-", "+").replace("_", "/")
+    try:
+        payload = json.loads(base64.b64decode(encoded + "=" * (-len(encoded) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Contenido del QR de AFIP ilegible: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("El QR de AFIP no contiene un objeto JSON")
+    missing = [key for key in _AFIP_QR_REQUIRED_KEYS if key not in payload]
+    if missing:
+        raise ValueError(f"Faltan datos en el QR de AFIP: {', '.join(missing)}")
+    return payload
+
+
+def afip_payload_to_fields(payload: dict, bbox: list) -> dict:
+    """
+    Convierte el JSON del QR en campos con el formato de perform_yolo_ocr ({'value', 'confidence',
+    'bbox'}) y los nombres de clase de YOLO; `bbox` es la ubicación del QR en la página.
+    Lanza ValueError si algún valor no tiene el formato esperado.
+    """
+    try:
+        values = {
+            'factura_numero': f"{int(payload['ptoVta']):05d}-{int(payload['nroCmp']):08d}",
+            'factura_fecha_emision': datetime.strptime(str(payload['fecha']), "%Y-%m-%d").strftime("%d/%m/%Y"),
+            'emisor_cuit': format_cuit(payload['cuit']),
+            'total': format_amount(payload['importe'], payload.get('moneda')),
+            'cae': str(payload['codAut']),
+        }
+        letter = AFIP_INVOICE_LETTERS.get(int(payload['tipoCmp']))
+        if letter:
+            values['factura_tipo'] = letter
+        if payload.get('tipoDocRec') == _AFIP_DOC_TYPE_CUIT and payload.get('nroDocRec'):
+            values['receptor_cuit'] = format_cuit(payload['nroDocRec'])
+    except (TypeError, InvalidOperation) as e:
+        raise ValueError(f"Valor inválido en el QR de AFIP: {e}")
+
+    return {field_name: {'value': value, 'confidence': BARCODE_CONFIDENCE, 'bbox': list(bbox),
+                         'source': BARCODE_FORMAT_AFIP_QR}
+            for field_name, value in values.items()}
+
+
+def _downscale(np_image: np.ndarray, max_side: int):
+    """Reduce la página a `max_side` de lado mayor; retorna (imagen, escala aplicada)."""
+    scale = min(1.0, max_side / max(np_image.shape[:2]))
+    if scale == 1.0:
+        return np_image, 1.0
+    size = (max(1, int(round(np_image.shape[1] * scale))), max(1, int(round(np_image.shape[0] * scale))))
+    return cv2.resize(np_image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def read_qr_code(np_image: np.ndarray, max_side: int = BARCODE_DETECTION_MAX_SIDE):
+    """
+    Ubica un QR sobre la página reducida y lo decodifica recortándolo de la página completa
+    (en la reducida los módulos de un QR de factura quedan de 1-2 px). Retorna (texto, bbox en
+    coordenadas de `np_image`) o (None, None) si no hay QR legible.
+    """
+    detector = cv2.QRCodeDetector()
+    small, scale = _downscale(np_image, max_side)
+    found, points = detector.detect(small)
+    if not found or points is None:
+        return None, None
+
+    points = points.reshape(-1, 2) / scale
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    margin = _CROP_MARGIN * max(x2 - x1, y2 - y1)
+    h, w = np_image.shape[:2]
+    bbox = [max(0, int(x1 - margin)), max(0, int(y1 - margin)), min(w, int(np.ceil(x2 + margin))),
+            min(h, int(np.ceil(y2 + margin)))]
+    crop = np_image[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+
+    text, _, _ = detector.detectAndDecode(crop)
+    if not text and scale < 1.0:
+        # El recorte a resolución completa no decodificó (ej. QR muy grande): probar en la reducida
+        text, _, _ = detector.detectAndDecode(small)
+    if not text:
+        return None, None
+    return text, [max(0, int(x1)), max(0, int(y1)), min(w, int(np.ceil(x2))), min(h, int(np.ceil(y2)))]
+
+
+def read_afip_qr(np_image: np.ndarray, max_side: int = BARCODE_DETECTION_MAX_SIDE) -> dict:
+    """Campos de la factura leídos del QR de AFIP; {} si no hay QR o no es de AFIP."""
+    text, bbox = read_qr_code(np_image, max_side)
+    if text is None:
+        return {}
+    try:
+        return afip_payload_to_fields(decode_afip_qr_payload(text), bbox)
+    except ValueError as e:
+        logger.info(f"QR ignorado: {e}")
+        return {}
+
+
+def parse_dni_pdf417(text: str) -> dict:
+    """
+    Interpreta el texto del PDF417 del DNI (formato actual o anterior) y retorna los valores por
+    clase de YOLO (número con puntos y fechas dd/mm/aaaa, como los imprime el documento).
+    Lanza ValueError si el texto no tiene la estructura de un DNI.
+    """
+    parts = [part.strip() for part in text.split('@')]
+    layout = _DNI_FIELDS_PREVIOUS if text.startswith('@') else _DNI_FIELDS_CURRENT
+    if len(parts) <= max(layout.values()):
+        raise ValueError(f"El código no tiene los campos de un DNI ({len(parts)} campos)")
+
+    values = {field_name: parts[index] for field_name, index in layout.items() if parts[index]}
+    number = values.get('dni_numero', '')
+    if not number.isdigit() or not 7 <= len(number) <= 8:
+        raise ValueError(f"Número de DNI inválido en el código: {number!r}")
+    values['dni_numero'] = f"{int(number):,}".replace(",", ".")
+    if values.get('dni_sexo') not in _DNI_SEX_VALUES:
+        raise ValueError(f"Sexo inválido en el código: {values.get('dni_sexo')!r}")
+    for field_name in _DNI_DATE_FIELDS:
+        if field_name in values:
+            datetime.strptime(values[field_name], "%d/%m/%Y")
+    return values
+
+
+def read_pdf417(np_image: np.ndarray, max_side: int = BARCODE_DETECTION_MAX_SIDE):
+    """
+    Decodifica un PDF417 sobre la página reducida (zxing-cpp). Retorna (texto, bbox en
+    coordenadas de `np_image`) o (None, None) si no hay código legible o falta zxing-cpp.
+    """
+    if zxingcpp is None:
+        return None, None
+    small, scale = _downscale(np_image, max_side)
+    for result in zxingcpp.read_barcodes(small, formats=zxingcpp.BarcodeFormat.PDF417, try_rotate=True):
+        if not getattr(result, 'valid', True) or not result.text:
+            continue
+        position = result.position
+        corners = [position.top_left, position.top_right, position.bottom_right, position.bottom_left]
+        xs = [corner.x / scale for corner in corners]
+        ys = [corner.y / scale for corner in corners]
+        h, w = np_image.shape[:2]
+        bbox = [max(0, int(min(xs))), max(0, int(min(ys))), min(w, int(np.ceil(max(xs)))),
+                min(h, int(np.ceil(max(ys))))]
+        return result.text, bbox
+    return None, None
+
+
+def read_dni_pdf417(np_image: np.ndarray, max_side: int = BARCODE_DETECTION_MAX_SIDE) -> dict:
+    """Campos del DNI leídos del PDF417; {} si no hay código o no es de un DNI."""
+    text, bbox = read_pdf417(np_image, max_side)
+    if text is None:
+        return {}
+    try:
+        values = parse_dni_pdf417(text)
+    except ValueError as e:
+        logger.info(f"PDF417 ignorado: {e}")
+        return {}
+    return {field_name: {'value': value, 'confidence': BARCODE_CONFIDENCE, 'bbox': list(bbox),
+                         'source': BARCODE_FORMAT_DNI_PDF417}
+            for field_name, value in values.items()}
+
+
+# Lectores de códigos por tipo de documento: (formato, función que retorna los campos leídos)
+BARCODE_READERS = {
+    **{document_type: (BARCODE_FORMAT_AFIP_QR, read_afip_qr) for document_type in _INVOICE_TYPES},
+    DocumentType.DNI_FRONT: (BARCODE_FORMAT_DNI_PDF417, read_dni_pdf417),
+    DocumentType.DNI_BACK: (BARCODE_FORMAT_DNI_PDF417, read_dni_pdf417),
+}
+
+# Campos que, leídos del código, hacen innecesario YOLO para el tipo: son todos los campos del frente
+# del DNI. El PDF417 del formato anterior los trae todos; el actual no trae el vencimiento, así que
+# YOLO (o la plantilla) corre igual, solo para ese campo. En el dorso falta el domicilio y en las
+# facturas la razón social y los importes parciales.
+BARCODE_SUFFICIENT_FIELDS = {
+    DocumentType.DNI_FRONT: ('dni_apellido', 'dni_nombre', 'dni_numero', 'dni_sexo',
+                             'dni_fecha_nacimiento', 'dni_fecha_emision', 'dni_fecha_vencimiento'),
+}
+
+
+def barcode_covers_document(fields: dict, document_type: DocumentType) -> bool:
+    """True si los campos leídos del código alcanzan para omitir YOLO y el OCR."""
+    required = BARCODE_SUFFICIENT_FIELDS.get(document_type)
+    return bool(required) and all(field_name in fields for field_name in required)
+
+
+def read_document_barcode(np_image: np.ndarray, document_type: DocumentType, metadata: dict = None,
+                          enabled: bool = BARCODE_FAST_PATH) -> dict:
+    """
+    Camino rápido previo a YOLO: si el tipo de documento trae un código con sus datos
+    (QR de AFIP en facturas electrónicas, PDF417 en el DNI) se decodifica y se retornan sus campos con
+    confianza 1.0; solo los campos que el código no trae necesitan OCR. Retorna {} si no hay
+    lector para el tipo, el código no se encuentra o no se puede interpretar.
+    """
+    reader = BARCODE_READERS.get(document_type)
+    if not enabled or reader is None:
+        return {}
+
+    barcode_format, read = reader
+    start = time.perf_counter()
+    try:
+        fields = read(np_image)
+    except cv2.error as e:
+        logger.warning(f"Error al leer el código {barcode_format}: {e}")
+        fields = {}
+    if metadata is not None:
+        metadata['barcode'] = {'format': barcode_format, 'found': bool(fields), 'fields': sorted(fields),
+                               'ms': (time.perf_counter() - start) * 1000}
+    return fields
@@ -0,0 +1,127 @@
+# ocr_api/services/batch_inference.py
+
+import os
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+from config import YOLO_BATCH_SIZE, YOLO_BATCH_MAX_WAIT_MS, CELERY_WORKER_POOL
+from services.model_loader import load_yolo_model, load_yolo_model_for_inference, PRECISION_FP32
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingDetector:
+    """
+    Agrupa las páginas que llegan desde varias tareas concurrentes del mismo proceso y
+    ejecuta una sola pasada de YOLO por modelo con hasta `max_batch_size` imágenes,
+    esperando como máximo `max_wait_ms` a que se complete el lote.
+
+    Solo agrupa tareas que corren en paralelo dentro del proceso, por lo que se usa únicamente
+    con CELERY_WORKER_POOL=threads: con prefork cada hijo tiene una sola tarea en curso y cada
+    imagen esperaría el plazo completo para inferirse sola.
+    Toda la inferencia pasa por un único hilo, por lo que el modelo nunca se usa
+    concurrentemente desde varios hilos.
+    """
+
+    def __init__(self, max_batch_size: int = YOLO_BATCH_SIZE, max_wait_ms: float = YOLO_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, model_name: str, image, precision: str = PRECISION_FP32) -> Future:
+        """Encola una imagen para `model_name` y retorna un Future con su resultado de YOLO."""
+        future = Future()
+        self._requests.put(((model_name, precision), image, future))
+        return future
+
+    def detect(self, model_name: str, image, precision: str = PRECISION_FP32):
+        """Versión bloqueante de `submit`: retorna el resultado de YOLO para una imagen."""
+        return self.submit(model_name, image, precision).result()
+
+    def _collect_batch(self) -> list:
+        # Espera la primera solicitud sin límite y luego completa el lote hasta el plazo
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Una pasada por modelo (facturas y DNI pueden llegar mezclados)
+            by_model = defaultdict(list)
+            for model_key, image, future in batch:
+                if future.set_running_or_notify_cancel():
+                    by_model[model_key].append((image, future))
+
+            for (model_name, precision), items in by_model.items():
+                try:
+                    model = load_yolo_model(model_name, precision=precision)
+                    results = model([image for image, _ in items])
+                    for (_, future), result in zip(items, results):
+                        future.set_result(result)
+                    logger.debug(f"Lote YOLO '{model_name}': {len(items)} imágenes")
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+
+
+# Instancia del proceso actual (se crea bajo demanda en cada proceso hijo)
+_batching_detector = None
+_batching_lock = threading.Lock()
+
+
+def get_batching_detector():
+    """
+    Retorna el detector por lotes del proceso, o None si el batching está deshabilitado
+    (YOLO_BATCH_SIZE <= 1 o un pool de Celery distinto de threads).
+    """
+    global _batching_detector
+    if YOLO_BATCH_SIZE <= 1 or CELERY_WORKER_POOL != "threads":
+        return None
+    if _batching_detector is None:
+        with _batching_lock:
+            if _batching_detector is None:
+                _batching_detector = BatchingDetector()
+                logger.info(f"Batching YOLO habilitado (lote={YOLO_BATCH_SIZE}, espera={YOLO_BATCH_MAX_WAIT_MS} ms)")
+    return _batching_detector
+
+
+def run_yolo_detection(model_name: str, image, precision: str = PRECISION_FP32):
+    """
+    Ejecuta YOLO sobre una imagen y retorna el objeto de resultados de esa imagen.
+    Si el batching está habilitado la imagen se agrupa con las de otras tareas (un único hilo
+    infiere); si no, la inferencia se serializa con el lock del modelo, porque varias páginas
+    de un documento (services/ocr_executor.map_pages) detectan a la vez sobre la misma instancia.
+    """
+    detector = get_batching_detector()
+    if detector is not None:
+        return detector.detect(model_name, image, precision)
+    model, inference_lock = load_yolo_model_for_inference(model_name, precision=precision)
+    with inference_lock:
+        return model(image)[0]
+
+
+def _reset_after_fork():
+    # El hilo despachador del padre no existe en el hijo
+    global _batching_detector, _batching_lock
+    _batching_detector = None
+    _batching_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,207 @@
+# ocr_api/services/document_pipeline.py
+
+import json
+import time
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from models.enums import DocumentType
+from models.extracted_data import raw_ocr_to_dni_data, raw_ocr_to_invoice_data
+from services.ocr_executor import map_pages
+from services.ocr_service import perform_yolo_ocr, perform_yolo_text_layer
+from services.image_decoding import is_tiff, count_tiff_pages, iter_tiff_pages
+from services.pdf_ingestion import PdfPageContent, is_pdf, iter_pdf_pages
+from services.preprocessing_cache import prepare_decoded_page
+from services.preprocessing_service import get_preprocessing_context
+
+logger = logging.getLogger(__name__)
+
+PAGE_SOURCE_OCR = "ocr"
+PAGE_SOURCE_TEXT_LAYER = "text_layer"
+
+
+def process_page_image(np_image: np.ndarray, document_type: DocumentType, metadata: dict = None) -> dict:
+    """
+    Cadena completa para una página ya decodificada: control de calidad, preprocesamiento,
+    YOLO y OCR. Usa el contexto de buffers del hilo actual (las páginas corren en paralelo).
+    """
+    page = prepare_decoded_page(np_image, document_type, metadata=metadata, context=get_preprocessing_context())
+    return perform_yolo_ocr(page.ocr_image, document_type, metadata=metadata, detection_image=page.detection_image,
+                            binarize_crops=page.binarize, barcode_fields=page.barcode_fields)
+
+
+def merge_page_results(pages: list) -> dict:
+    """
+    Une los campos de todas las páginas: de cada campo se conserva la detección de mayor
+    confianza (a igual confianza, la de la página anterior) y se anota su página.
+    """
+    merged = {}
+    for page in pages:
+        for field_name, field_data in page['fields'].items():
+            if not isinstance(field_data, dict):
+                continue
+            previous = merged.get(field_name)
+            if previous is None or field_data.get('confidence', 0) > previous.get('confidence', 0):
+                merged[field_name] = {**field_data, 'page': page['page']}
+    return merged
+
+
+def _run_page(index: int, source: str, metadata: dict, process) -> dict:
+    """Ejecuta `process()` para una página; un error queda registrado en la página sin propagarse."""
+    result = {'page': index + 1, 'source': source, 'fields': {}, 'metadata': metadata}
+    try:
+        result['fields'] = process()
+    except Exception as e:
+        logger.warning(f"Página {index + 1} no procesada: {e}")
+        result['error'] = str(e)
+    return result
+
+
+def _collect_pages(pages: list, kind: str, start: float, metadata: dict = None) -> dict:
+    """Une los resultados por página; si fallaron todas se lanza ValueError con el primer error."""
+    failed = [page for page in pages if 'error' in page]
+    if len(failed) == len(pages):
+        raise ValueError(f"Ninguna página del documento pudo procesarse: {failed[0]['error']}")
+
+    if metadata is not None:
+        metadata[kind] = {
+            'pages': len(pages),
+            'text_layer_pages': sum(page['source'] == PAGE_SOURCE_TEXT_LAYER for page in pages),
+            'failed_pages': [page['page'] for page in failed],
+            'ms': (time.perf_counter() - start) * 1000,
+        }
+    return {'fields': merge_page_results(pages), 'pages': pages}
+
+
+def process_pdf_document(pdf_bytes: bytes, document_type: DocumentType, metadata: dict = None) -> dict:
+    """
+    Procesa un PDF página por página: las páginas se rasterizan de forma perezosa y se procesan
+    en paralelo (services/ocr_executor.map_pages); las que tienen capa de texto no pasan por OCR.
+    Retorna {'fields': campos unidos de todas las páginas, 'pages': [resultado por página]}.
+    Una página que falla (ej. control de calidad) queda con 'error' sin hacer fallar al resto;
+    si fallan todas se lanza ValueError.
+    """
+    start = time.perf_counter()
+
+    def process_page(content: PdfPageContent) -> dict:
+        if content.has_text_layer:
+            return _run_page(content.index, PAGE_SOURCE_TEXT_LAYER, content.metadata,
+                             lambda: perform_yolo_text_layer(content.words, content.page_shape,
+                                                             content.detection_image, document_type,
+                                                             metadata=content.metadata))
+        return _run_page(content.index, PAGE_SOURCE_OCR, content.metadata,
+                         lambda: process_page_image(content.image, document_type, metadata=content.metadata))
+
+    pages = map_pages(process_page, iter_pdf_pages(pdf_bytes))
+    return _collect_pages(pages, "pdf", start, metadata)
+
+
+def process_tiff_document(tiff_bytes: bytes, document_type: DocumentType, metadata: dict = None) -> dict:
+    """
+    Procesa un TIFF de varias páginas (lotes del escáner): cada página se decodifica recién
+    cuando hay lugar en el executor de páginas y pasa por preprocesamiento -> YOLO -> OCR.
+    Las páginas comparten el modelo YOLO: run_yolo_detection serializa su inferencia entre hilos.
+    Mismo resultado que process_pdf_document.
+    """
+    start = time.perf_counter()
+
+    def process_page(page) -> dict:
+        index, image, page_metadata = page
+        return _run_page(index, PAGE_SOURCE_OCR, page_metadata,
+                         lambda: process_page_image(image, document_type, metadata=page_metadata))
+
+    pages = map_pages(process_page, iter_tiff_pages(tiff_bytes))
+    return _collect_pages(pages, "tiff", start, metadata)
+
+
+def is_multipage_document(file_bytes: bytes) -> bool:
+    """PDF o TIFF de más de una página: se procesan página por página (process_multipage_document)."""
+    return is_pdf(file_bytes) or (is_tiff(file_bytes) and count_tiff_pages(file_bytes) > 1)
+
+
+def process_multipage_document(file_bytes: bytes, document_type: DocumentType, metadata: dict = None) -> dict:
+    """Procesa un PDF o TIFF multipágina; retorna {'fields', 'pages'}."""
+    if is_pdf(file_bytes):
+        return process_pdf_document(file_bytes, document_type, metadata)
+    return process_tiff_document(file_bytes, document_type, metadata)
+
+
+def determine_processing_quality(raw_data: dict) -> str:
+    """
+    Determina la calidad del procesamiento basado en los datos extraídos.
+
+    Args:
+        raw_data: Datos raw del OCR
+
+    Returns:
+        'high', 'medium', o 'low'
+    """
+    if not raw_data:
+        return 'low'
+
+    # Contar campos detectados y sus confianzas
+    total_fields = len(raw_data)
+    high_confidence_fields = 0
+    medium_confidence_fields = 0
+
+    for field_name, field_data in raw_data.items():
+        if isinstance(field_data, dict) and 'confidence' in field_data:
+            confidence = field_data['confidence']
+            if confidence >= 0.8:
+                high_confidence_fields += 1
+            elif confidence >= 0.5:
+                medium_confidence_fields += 1
+
+    # Determinar calidad
+    if total_fields == 0:
+        return 'low'
+
+    high_confidence_ratio = high_confidence_fields / total_fields
+    medium_confidence_ratio = (high_confidence_fields + medium_confidence_fields) / total_fields
+
+    if high_confidence_ratio >= 0.7:
+        return 'high'
+    elif medium_confidence_ratio >= 0.5:
+        return 'medium'
+    else:
+        return 'low'
+
+
+def build_ocr_result(doc_uuid, document_type: DocumentType, raw_extracted_data: dict, page_results: list = None,
+                     processing_metadata: dict = None) -> dict:
+    """
+    Registro que se guarda en raw_ocr_output, con el mismo formato en los workers de Celery y RQ:
+    campos raw, datos estructurados según el tipo de documento (JSON serializable), calidad,
+    processing_metadata (hora, documento y lo que agregue el worker/pipeline) y, en documentos
+    multipágina, el resultado de cada página en 'pages'.
+    """
+    processing_quality = determine_processing_quality(raw_extracted_data)
+
+    structured_data = None
+    if document_type in [DocumentType.DNI_FRONT, DocumentType.DNI_BACK]:
+        structured_data = raw_ocr_to_dni_data(doc_uuid, raw_extracted_data)
+    elif document_type in [DocumentType.INVOICE_A, DocumentType.INVOICE_B, DocumentType.INVOICE_C]:
+        structured_data = raw_ocr_to_invoice_data(doc_uuid, raw_extracted_data)
+
+    # Preparar datos para guardar: UUID, fechas y Decimal convertidos a tipos JSON (columna JSON)
+    structured_data_dict = None
+    if structured_data:
+        structured_data.processing_quality = processing_quality
+        structured_data_dict = json.loads(structured_data.json())
+
+    result = {
+        'raw_ocr_output': raw_extracted_data,
+        'structured_data': structured_data_dict,
+        'processing_quality': processing_quality,
+        'processing_metadata': {
+            'processing_time': datetime.now().isoformat(),
+            'document_id': str(doc_uuid),
+            **(processing_metadata or {})
+        }
+    }
+    if page_results is not None:
+        # Resultado de cada página (campos, origen ocr/text_layer, metadata o error)
+        result['pages'] = page_results
+    return result
@@ -0,0 +1,215 @@
+# ocr_api/services/image_decoding.py
+
+import io
+import time
+import logging
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import DECODE_TARGET_DPI, DECODE_MAX_MEGAPIXELS, DECODE_MAX_SOURCE_MEGAPIXELS, TIFF_MAX_PAGES
+
+logger = logging.getLogger(__name__)
+
+# Lado mayor de una hoja A4 en pulgadas: sin DPI confiable en el encabezado (fotos de celular)
+# se supone que el documento ocupa todo el cuadro, la estimación más conservadora
+A4_LONG_SIDE_INCHES = 11.69
+# DPI por debajo de este valor son valores por defecto de cámaras/pantallas, no de un escáner
+MIN_RELIABLE_DPI = 100
+
+# Decodificación reducida en el dominio DCT (libjpeg escala al decodificar; solo JPEG)
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Firmas de TIFF (little y big endian)
+TIFF_MAGICS = (b"II*\x00", b"MM\x00*")
+
+
+def read_image_header(image_bytes: bytes) -> dict:
+    """Formato, tamaño, DPI y orientación EXIF leyendo solo el encabezado (no decodifica píxeles)."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            dpi = img.info.get("dpi")
+            try:
+                orientation = int(img.getexif().get(EXIF_ORIENTATION_TAG, 1))
+            except Exception:  # EXIF corrupto: se ignora la orientación
+                orientation = 1
+            return {
+                'format': img.format,
+                'width': img.size[0],
+                'height': img.size[1],
+                'dpi': float(max(dpi)) if dpi else None,
+                'orientation': orientation if 1 <= orientation <= 8 else 1,
+            }
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"Imagen demasiado grande para procesar: {e}")
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el encabezado de la imagen: {e}")
+
+
+def estimate_source_dpi(header: dict) -> float:
+    """DPI del encabezado si es confiable (escáner); si no, el de una A4 que ocupa todo el cuadro."""
+    if header.get('dpi') and header['dpi'] >= MIN_RELIABLE_DPI:
+        return header['dpi']
+    return max(header['width'], header['height']) / A4_LONG_SIDE_INCHES
+
+
+def choose_reduction(header: dict, target_dpi: float = DECODE_TARGET_DPI,
+                     max_pixels: float = DECODE_MAX_MEGAPIXELS * 1e6) -> int:
+    """
+    Factor de reducción (1, 2, 4 u 8) para decodificar: el mayor que mantiene el DPI objetivo,
+    o el menor que respeta el presupuesto de píxeles si este exige reducir más.
+    """
+    source_dpi = estimate_source_dpi(header)
+    pixels = header['width'] * header['height']
+
+    by_dpi = 1
+    for factor in (2, 4, 8):
+        if source_dpi / factor >= target_dpi:
+            by_dpi = factor
+
+    by_budget = 8
+    for factor in (1, 2, 4, 8):
+        if pixels / (factor * factor) <= max_pixels:
+            by_budget = factor
+            break
+    return max(by_dpi, by_budget)
+
+
+def apply_exif_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Lleva la imagen a su orientación de visualización según el tag EXIF Orientation (1-8)."""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def decode_document_image(image_bytes: bytes, metadata: dict = None, target_dpi: float = DECODE_TARGET_DPI,
+                          max_megapixels: float = DECODE_MAX_MEGAPIXELS) -> np.ndarray:
+    """
+    Decodifica el archivo a una imagen BGR de 3 canales con el tamaño que necesita el OCR:
+    - lee el encabezado y rechaza imágenes por encima de DECODE_MAX_SOURCE_MEGAPIXELS
+    - en JPEG decodifica directamente reducido (IMREAD_REDUCED_COLOR_2/4/8) hasta el DPI objetivo
+    - si aún supera el presupuesto de píxeles, reduce con INTER_AREA
+    - aplica la orientación EXIF de forma explícita
+    Si se pasa `metadata` (dict), se registran los tamaños, el factor y el tiempo en metadata['decoding'].
+    """
+    start = time.perf_counter()
+    header = read_image_header(image_bytes)
+    source_megapixels = header['width'] * header['height'] / 1e6
+    if source_megapixels > DECODE_MAX_SOURCE_MEGAPIXELS:
+        raise ValueError(f"Imagen demasiado grande ({source_megapixels:.0f} MP, máximo "
+                         f"{DECODE_MAX_SOURCE_MEGAPIXELS} MP)")
+
+    max_pixels = max_megapixels * 1e6
+    reduction = choose_reduction(header, target_dpi, max_pixels) if header['format'] == "JPEG" else 1
+    flags = REDUCED_DECODE_FLAGS[reduction] | cv2.IMREAD_IGNORE_ORIENTATION
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+    if image is None:
+        raise ValueError("No se pudo decodificar la imagen")
+
+    # Formatos sin decodificación reducida (PNG, TIFF...) o presupuesto aún excedido
+    h, w = image.shape[:2]
+    if h * w > max_pixels:
+        factor = (max_pixels / (h * w)) ** 0.5
+        image = cv2.resize(image, (max(1, int(w * factor)), max(1, int(h * factor))), interpolation=cv2.INTER_AREA)
+
+    image = apply_exif_orientation(image, header['orientation'])
+
+    if metadata is not None:
+        metadata['decoding'] = {
+            'format': header['format'],
+            'source_size': [header['height'], header['width']],
+            'decoded_size': list(image.shape[:2]),
+            'reduction': reduction,
+            'exif_orientation': header['orientation'],
+            'ms': (time.perf_counter() - start) * 1000,
+        }
+    logger.info(f"Imagen decodificada: {header['format']} {header['width']}x{header['height']} -> "
+                f"{image.shape[1]}x{image.shape[0]} (reducción 1/{reduction})")
+    return image
+
+
+def is_tiff(image_bytes: bytes) -> bool:
+    return image_bytes[:4] in TIFF_MAGICS
+
+
+def count_tiff_pages(image_bytes: bytes) -> int:
+    """Cantidad de páginas del TIFF (recorre los directorios sin decodificar píxeles)."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return getattr(img, "n_frames", 1)
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el TIFF: {e}")
+
+
+def _frame_to_array(frame: Image.Image) -> np.ndarray:
+    # Los escaneos bitonales o en gris se mantienen en un canal (1/3 de la memoria); el resto pasa a BGR
+    if frame.mode in ("1", "L"):
+        return np.asarray(frame.convert("L"))
+    return cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def iter_tiff_pages(image_bytes: bytes, max_megapixels: float = DECODE_MAX_MEGAPIXELS,
+                    max_pages: int = TIFF_MAX_PAGES):
+    """
+    Recorre un TIFF de varias páginas decodificando una sola página por vez (generador).
+    Retorna (índice, imagen, metadata) por página: la imagen es gris si la página es bitonal o
+    en gris y BGR si no, reducida con INTER_AREA al presupuesto de píxeles y con la orientación
+    del tag Orientation aplicada. La memoria depende de cuántas páginas retiene el llamador.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el TIFF: {e}")
+
+    with img:
+        page_count = getattr(img, "n_frames", 1)
+        if page_count > max_pages:
+            raise ValueError(f"El TIFF tiene {page_count} páginas (máximo {max_pages})")
+
+        max_pixels = max_megapixels * 1e6
+        for index in range(page_count):
+            start = time.perf_counter()
+            img.seek(index)
+            width, height = img.size
+            if width * height / 1e6 > DECODE_MAX_SOURCE_MEGAPIXELS:
+                raise ValueError(f"Página {index + 1} demasiado grande ({width * height / 1e6:.0f} MP, máximo "
+                                 f"{DECODE_MAX_SOURCE_MEGAPIXELS} MP)")
+
+            page = _frame_to_array(img)
+            if width * height > max_pixels:
+                factor = (max_pixels / (width * height)) ** 0.5
+                page = cv2.resize(page, (max(1, int(width * factor)), max(1, int(height * factor))),
+                                  interpolation=cv2.INTER_AREA)
+            orientation = int(img.getexif().get(EXIF_ORIENTATION_TAG, 1))
+            page = apply_exif_orientation(page, orientation if 1 <= orientation <= 8 else 1)
+
+            metadata = {'decoding': {
+                'format': "TIFF",
+                'page': index + 1,
+                'pages': page_count,
+                'source_size': [height, width],
+                'decoded_size': list(page.shape[:2]),
+                'mode': img.mode,
+                'ms': (time.perf_counter() - start) * 1000,
+            }}
+            yield index, page, metadata
@@ -1,26 +1,167 @@
-from ultralytics import YOLO
 import os
-from config import YOLO_MODELS_PATH
+import json
+import logging
+import threading
+from config import YOLO_MODELS_PATH, YOLO_RUNTIME, YOLO_INT8_MAX_MAP_DROP
+from services import yolo_runtime
+
+logger = logging.getLogger(__name__)
 
 # Ruta base donde se almacenan los modelos YOLO
 # Usar ruta absoluta desde config.py
 YOLO_MODELS = YOLO_MODELS_PATH
 
+# Runtimes soportados, en orden de preferencia para YOLO_RUNTIME=auto (más rápido primero en CPU)
+RUNTIME_OPENVINO = "openvino"
+RUNTIME_ONNX = "onnx"
+RUNTIME_TORCH = "torch"
+RUNTIME_PREFERENCE = [RUNTIME_OPENVINO, RUNTIME_ONNX, RUNTIME_TORCH]
+
+# Precisión de los pesos: FP32 (original) o INT8 (scripts/quantize_models.py, solo ONNX/OpenVINO)
+PRECISION_FP32 = "fp32"
+PRECISION_INT8 = "int8"
+
 # Cache para modelos cargados
 _yolo_model_cache = {}
+# Cache de la variante (runtime, precisión) resuelta para cada solicitud
+_resolved_variants = {}
+# Protege ambos caches: las páginas de un documento cargan modelos desde varios hilos a la vez
+_cache_lock = threading.Lock()
+# Un lock de inferencia por modelo cargado: las instancias de ultralytics no son thread-safe
+_inference_locks = {}
 
-def load_yolo_model(model_name: str) -> YOLO:
+def get_exported_model_path(model_name: str, runtime: str, precision: str = PRECISION_FP32) -> str:
     """
-    Carga un modelo YOLOv8 desde el disco y lo cachea.
-    `model_name` debe ser el nombre del archivo del modelo (ej. 'yolov8n.pt').
+    Ruta del modelo exportado para `runtime`, siguiendo la convención de `YOLO.export()`:
+    'x/best.pt' -> 'x/best.onnx' (ONNX) y 'x/best_openvino_model/' (OpenVINO IR).
+    Las variantes INT8 son 'x/best_int8.onnx' y 'x/best_int8_openvino_model/'.
+    """
+    model_path = os.path.join(YOLO_MODELS, model_name)
+    stem, _ = os.path.splitext(model_path)
+    if precision == PRECISION_INT8:
+        stem = f"{stem}_int8"
+    if runtime == RUNTIME_ONNX:
+        return f"{stem}.onnx"
+    if runtime == RUNTIME_OPENVINO:
+        return f"{stem}_openvino_model"
+    return model_path
+
+def get_quantization_report_path(model_name: str) -> str:
+    """Reporte de mAP/latencia FP32 vs INT8 escrito por scripts/quantize_models.py."""
+    stem, _ = os.path.splitext(os.path.join(YOLO_MODELS, model_name))
+    return f"{stem}_quantization.json"
+
+def is_int8_within_budget(model_name: str, max_map_drop: float = YOLO_INT8_MAX_MAP_DROP) -> bool:
+    """
+    Indica si la variante INT8 de `model_name` fue evaluada y su caída de mAP50-95
+    respecto de FP32 está dentro del presupuesto configurado.
+    """
+    report_path = get_quantization_report_path(model_name)
+    if not os.path.exists(report_path):
+        return False
+    with open(report_path, encoding="utf-8") as f:
+        report = json.load(f)
+    map_drop = report.get("fp32", {}).get("map50_95", 0.0) - report.get("int8", {}).get("map50_95", 0.0)
+    return map_drop <= max_map_drop
+
+def _is_runtime_available(model_name: str, runtime: str, precision: str = PRECISION_FP32) -> bool:
+    if runtime == RUNTIME_OPENVINO and yolo_runtime.openvino is None:
+        return False
+    if runtime == RUNTIME_ONNX and yolo_runtime.onnxruntime is None:
+        return False
+    if runtime == RUNTIME_TORCH and precision == PRECISION_INT8:
+        return False
+    return os.path.exists(get_exported_model_path(model_name, runtime, precision))
+
+def resolve_runtime(model_name: str, runtime: str = None, precision: str = PRECISION_FP32) -> str:
+    """
+    Decide con qué runtime cargar `model_name`.
+    En modo "auto" elige el runtime de CPU más rápido que esté instalado y cuyo modelo exportado exista.
+    """
+    runtime = runtime or YOLO_RUNTIME
+    if runtime != "auto":
+        return runtime
+    for candidate in RUNTIME_PREFERENCE:
+        if _is_runtime_available(model_name, candidate, precision):
+            return candidate
+    return RUNTIME_TORCH
+
+def resolve_precision(model_name: str, precision: str = PRECISION_FP32, runtime: str = None) -> str:
     """
-    if model_name not in _yolo_model_cache:
-        model_path = os.path.join(YOLO_MODELS, model_name)
+    Retorna INT8 solo si se pidió, el modelo cuantizado existe para algún runtime disponible
+    y su pérdida de mAP está dentro de YOLO_INT8_MAX_MAP_DROP; en otro caso FP32.
+    """
+    if precision != PRECISION_INT8:
+        return PRECISION_FP32
+    runtime = resolve_runtime(model_name, runtime, PRECISION_INT8)
+    if not _is_runtime_available(model_name, runtime, PRECISION_INT8):
+        return PRECISION_FP32
+    if not is_int8_within_budget(model_name):
+        logger.warning(f"INT8 de '{model_name}' fuera del presupuesto de mAP o sin evaluar; se usa FP32")
+        return PRECISION_FP32
+    return PRECISION_INT8
+
+def _load_yolo_model_locked(model_name: str, runtime: str = None, precision: str = PRECISION_FP32) -> tuple:
+    """Carga (si hace falta) y retorna la clave de cache del modelo; se llama con `_cache_lock` tomado."""
+    request_key = (model_name, runtime, precision)
+    if request_key not in _resolved_variants:
+        resolved_precision = resolve_precision(model_name, precision, runtime)
+        _resolved_variants[request_key] = (resolve_runtime(model_name, runtime, resolved_precision), resolved_precision)
+    runtime, precision = _resolved_variants[request_key]
+
+    cache_key = (model_name, runtime, precision)
+    if cache_key not in _yolo_model_cache:
+        model_path = get_exported_model_path(model_name, runtime, precision)
         if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Modelo YOLO '{model_name}' no encontrado en {YOLO_MODELS}")
-        _yolo_model_cache[model_name] = YOLO(model_path)
-    return _yolo_model_cache[model_name]
+            raise FileNotFoundError(f"Modelo YOLO '{model_name}' ({runtime}) no encontrado en {YOLO_MODELS}")
+
+        if runtime == RUNTIME_OPENVINO:
+            model = yolo_runtime.OpenVinoYoloModel(model_path)
+        elif runtime == RUNTIME_ONNX:
+            model = yolo_runtime.OnnxYoloModel(model_path)
+        elif runtime == RUNTIME_TORCH:
+            # Importación diferida: ultralytics arrastra torch, que no hace falta con ONNX/OpenVINO
+            from ultralytics import YOLO
+            model = YOLO(model_path)
+        else:
+            raise ValueError(f"Runtime YOLO desconocido: {runtime}")
+
+        logger.info(f"Modelo YOLO '{model_name}' cargado con runtime {runtime} ({precision})")
+        _yolo_model_cache[cache_key] = model
+        _inference_locks[cache_key] = threading.Lock()
+    return cache_key
+
+def load_yolo_model(model_name: str, runtime: str = None, precision: str = PRECISION_FP32):
+    """
+    Carga un modelo YOLOv8 desde el disco y lo cachea.
+    `model_name` debe ser el nombre del archivo del modelo (ej. 'yolov8n.pt'); si existe
+    una exportación ONNX/OpenVINO (scripts/export_yolo_models.py) se usa según YOLO_RUNTIME.
+    Con `precision="int8"` se sirve la variante cuantizada si está dentro del presupuesto de mAP.
+    Todos los runtimes retornan resultados con la interfaz de ultralytics (r.boxes, r.names).
+    Es seguro llamarla desde varios hilos (cada modelo se carga una sola vez), pero el modelo
+    retornado no: para inferir desde varios hilos usar load_yolo_model_for_inference.
+    """
+    with _cache_lock:
+        return _yolo_model_cache[_load_yolo_model_locked(model_name, runtime, precision)]
+
+def load_yolo_model_for_inference(model_name: str, runtime: str = None, precision: str = PRECISION_FP32) -> tuple:
+    """
+    Como load_yolo_model pero retorna (modelo, lock): el lock es único por modelo cargado
+    (aunque dos solicitudes resuelvan a la misma variante) y debe tomarse durante la inferencia.
+    """
+    with _cache_lock:
+        cache_key = _load_yolo_model_locked(model_name, runtime, precision)
+        return _yolo_model_cache[cache_key], _inference_locks[cache_key]
+
+def _reset_after_fork():
+    # Un lock tomado por otro hilo del padre quedaría tomado para siempre en el hijo
+    global _cache_lock
+    _cache_lock = threading.Lock()
+    for cache_key in _inference_locks:
+        _inference_locks[cache_key] = threading.Lock()
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 # Por ejemplo, al importar este módulo en ocr_worker.py:
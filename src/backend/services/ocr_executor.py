@@ -0,0 +1,187 @@
+# ocr_api/services/ocr_executor.py
+
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config import (OCR_EXECUTOR, OCR_MAX_WORKERS, CELERY_WORKER_POOL, CELERY_WORKER_CONCURRENCY, PAGE_MAX_WORKERS,
+                    PAGE_MAX_IN_FLIGHT)
+from services.tesseract_pool import warmup_tesseract_pool
+
+logger = logging.getLogger(__name__)
+
+# Executor del proceso actual (se crea de forma perezosa en cada proceso hijo)
+_executor = None
+# Executor de páginas: separado del de recortes, porque cada página encola sus recortes en el
+# executor de OCR y esperarlos desde un hilo del mismo pool podría bloquearlo
+_page_executor = None
+# Con el pool threads varias tareas piden los executors a la vez: se crean una sola vez bajo este lock
+_executor_lock = threading.Lock()
+
+
+def get_ocr_max_workers() -> int:
+    """
+    Cantidad máxima de recortes que un proceso worker OCRea en paralelo.
+    Con el pool prefork reparte los núcleos del nodo entre los hijos de Celery para no
+    sobresuscribirlos; con threads/solo hay un único proceso y todas sus tareas comparten el executor.
+    """
+    if OCR_MAX_WORKERS > 0:
+        return OCR_MAX_WORKERS
+    if CELERY_WORKER_POOL != "prefork":
+        return os.cpu_count() or 1
+    return max(1, (os.cpu_count() or 1) // max(1, CELERY_WORKER_CONCURRENCY))
+
+
+def get_ocr_executor():
+    """
+    Retorna el executor compartido para el OCR por campo, o None si el modo es serial
+    o el tope de concurrencia es 1.
+    """
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    max_workers = get_ocr_max_workers()
+    if OCR_EXECUTOR == "serial" or max_workers <= 1:
+        return None
+
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        if OCR_EXECUTOR == "process":
+            # Cada proceso del pool crea sus handles de Tesseract al arrancar
+            _executor = ProcessPoolExecutor(max_workers=max_workers, initializer=warmup_tesseract_pool)
+        elif OCR_EXECUTOR == "thread":
+            # tesserocr libera el GIL durante el reconocimiento; cada hilo usa su propio handle
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr",
+                                           initializer=warmup_tesseract_pool)
+        else:
+            raise ValueError(f"OCR_EXECUTOR inválido: {OCR_EXECUTOR}")
+
+    logger.info(f"Executor OCR '{OCR_EXECUTOR}' creado con {max_workers} workers")
+    return _executor
+
+
+def _start_workers(executor, max_workers: int, timeout: float):
+    """
+    Arranca todos los workers del executor. Los hilos de ThreadPoolExecutor se crean de a uno por
+    tarea encolada, así que se encola una espera por worker y todas se liberan juntas.
+    """
+    if isinstance(executor, ThreadPoolExecutor):
+        barrier = threading.Barrier(max_workers)
+        futures = [executor.submit(barrier.wait, timeout) for _ in range(max_workers)]
+    else:
+        futures = [executor.submit(int) for _ in range(max_workers)]
+    for future in futures:
+        future.result()
+
+
+def warmup_ocr_executor(timeout: float = 60.0):
+    """
+    Arranca los workers de los executors de OCR y de páginas antes de la primera tarea, para que
+    cada worker de OCR cree sus handles de Tesseract (initializer) sin cobrárselo al primer
+    documento. En modo serial el OCR corre en el hilo que ejecuta la tarea y se precalienta el
+    hilo actual.
+    """
+    executor = get_ocr_executor()
+    if executor is None:
+        warmup_tesseract_pool()
+    else:
+        max_workers = get_ocr_max_workers()
+        _start_workers(executor, max_workers, timeout)
+        logger.info(f"Executor OCR precalentado ({max_workers} workers)")
+
+    page_executor = get_page_executor()
+    if page_executor is not None:
+        page_workers = get_page_max_workers()
+        _start_workers(page_executor, page_workers, timeout)
+        logger.info(f"Executor de páginas precalentado ({page_workers} workers)")
+
+
+def map_ocr(func, *iterables) -> list:
+    """
+    Aplica `func` a los elementos en paralelo y retorna los resultados en el orden de entrada.
+    Sin executor (modo serial) se ejecuta en el hilo actual.
+    """
+    executor = get_ocr_executor()
+    if executor is None:
+        return list(map(func, *iterables))
+    return list(executor.map(func, *iterables))
+
+
+def get_page_max_workers() -> int:
+    """Páginas de un documento que se procesan en paralelo por proceso worker."""
+    return PAGE_MAX_WORKERS if PAGE_MAX_WORKERS > 0 else get_ocr_max_workers()
+
+
+def get_page_executor():
+    """Executor de hilos para las páginas de un documento, o None si se procesan de a una."""
+    global _page_executor
+    if _page_executor is not None:
+        return _page_executor
+
+    max_workers = get_page_max_workers()
+    if max_workers <= 1:
+        return None
+    with _executor_lock:
+        if _page_executor is not None:
+            return _page_executor
+        # Hilos: OpenCV y Tesseract liberan el GIL. YOLO no es thread-safe: run_yolo_detection
+        # serializa la inferencia con el lock del modelo (o la agrupa en el hilo del batching)
+        _page_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page")
+    logger.info(f"Executor de páginas creado con {max_workers} workers")
+    return _page_executor
+
+
+def map_pages(func, pages) -> list:
+    """
+    Aplica `func` a cada página en paralelo y retorna los resultados en orden.
+    `pages` se consume de forma perezosa en el hilo actual (ej. un generador que rasteriza
+    o decodifica cada página) y nunca hay más de PAGE_MAX_IN_FLIGHT páginas pendientes,
+    de modo que la memoria no crece con la cantidad de páginas del documento.
+    """
+    executor = get_page_executor()
+    if executor is None:
+        return [func(page) for page in pages]
+
+    max_in_flight = PAGE_MAX_IN_FLIGHT if PAGE_MAX_IN_FLIGHT > 0 else get_page_max_workers()
+    results = []
+    pending = deque()
+    pages = iter(pages)
+    while True:
+        # Se espera a la página más antigua antes de producir la siguiente
+        if len(pending) >= max_in_flight:
+            results.append(pending.popleft().result())
+        page = next(pages, None)
+        if page is None:
+            break
+        pending.append(executor.submit(func, page))
+    results.extend(future.result() for future in pending)
+    return results
+
+
+def shutdown_ocr_executor():
+    """Cierra los executors del proceso actual."""
+    global _executor, _page_executor
+    # Primero las páginas, que encolan recortes en el executor de OCR. Se cierran fuera del lock:
+    # una página en curso puede estar pidiendo el executor de OCR
+    with _executor_lock:
+        executors = (_page_executor, _executor)
+        _executor = _page_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _reset_after_fork():
+    # Los hilos/procesos del padre no existen en el hijo: se recrean los executors bajo demanda
+    global _executor, _page_executor, _executor_lock
+    _executor = None
+    _page_executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,101 @@
+# ocr_api/services/ocr_profiles.py
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# Alfabetos restringidos (sin espacios: pytesseract separa el config por espacios)
+DIGITS = "0123456789"
+DATE_CHARS = DIGITS + "/-."
+AMOUNT_CHARS = DIGITS + ".,$"
+
+
+@dataclass(frozen=True)
+class OcrProfile:
+    """
+    Parámetros de OCR para una clase de YOLO.
+    - psm: modo de segmentación de Tesseract (7 = una línea, 8 = una palabra, 10 = un carácter)
+    - whitelist: caracteres permitidos (None = sin restricción)
+    - pattern: regex que debe cumplir el valor; si coincide se conserva solo la coincidencia
+    - text_height: altura de línea objetivo (px) al normalizar el recorte (None = OCR_TARGET_TEXT_HEIGHT)
+    - min_confidence: las cajas de YOLO por debajo de esta confianza no se OCRean
+    - multi_instance: si es False se conserva solo la mejor caja de la clase
+    """
+    psm: int = 7
+    lang: str = 'spa'
+    whitelist: Optional[str] = None
+    pattern: Optional[str] = None
+    text_height: Optional[int] = None
+    min_confidence: float = 0.3
+    multi_instance: bool = False
+
+
+DEFAULT_PROFILE = OcrProfile()
+
+_CUIT_PROFILE = OcrProfile(psm=7, whitelist=DIGITS + "-", pattern=r"\d{2}-?\d{8}-?\d")
+_DATE_PROFILE = OcrProfile(psm=7, whitelist=DATE_CHARS, pattern=r"\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}")
+_AMOUNT_PROFILE = OcrProfile(psm=7, whitelist=AMOUNT_CHARS, pattern=r"\$?\d[\d.,]*")
+
+# Perfiles por clase de YOLO; las clases no listadas usan DEFAULT_PROFILE
+OCR_PROFILES = {
+    # DNI
+    'dni_numero': OcrProfile(psm=7, whitelist=DIGITS + ".", pattern=r"\d{1,2}\.?\d{3}\.?\d{3}", text_height=40),
+    'dni_fecha_nacimiento': _DATE_PROFILE,
+    'dni_fecha_emision': _DATE_PROFILE,
+    'dni_fecha_vencimiento': _DATE_PROFILE,
+    'dni_sexo': OcrProfile(psm=10, whitelist="MFX", pattern=r"[MFX]"),
+    # Facturas
+    'factura_numero': OcrProfile(psm=7, whitelist=DIGITS + "-", pattern=r"\d{4,5}-?\d{8}"),
+    'factura_tipo': OcrProfile(psm=10, whitelist="ABCEM", pattern=r"[ABCEM]"),
+    'factura_fecha_emision': _DATE_PROFILE,
+    'factura_fecha_vencimiento': _DATE_PROFILE,
+    'emisor_cuit': _CUIT_PROFILE,
+    'receptor_cuit': _CUIT_PROFILE,
+    'subtotal': _AMOUNT_PROFILE,
+    'iva_21': _AMOUNT_PROFILE,
+    'iva_105': _AMOUNT_PROFILE,
+    'total': _AMOUNT_PROFILE,
+}
+
+
+def get_ocr_profile(field_name: str) -> OcrProfile:
+    """Retorna el perfil de OCR de una clase de YOLO."""
+    return OCR_PROFILES.get(field_name, DEFAULT_PROFILE)
+
+
+def select_detections(detections: list) -> list:
+    """
+    Filtra las detecciones (field_name, confidence, bbox) antes del OCR:
+    descarta las cajas bajo el piso de confianza de su clase y, para campos de una sola
+    instancia, conserva solo la de mayor confianza (en empate, la más arriba/izquierda).
+    Los campos multi-instancia conservan todas sus cajas ordenadas de arriba hacia abajo.
+    El resultado es determinístico; las clases quedan en el orden de su primera aparición en YOLO.
+    """
+    groups = {}
+    for index, (field_name, confidence, bbox) in enumerate(detections):
+        if confidence < get_ocr_profile(field_name).min_confidence:
+            continue
+        groups.setdefault(field_name, []).append((index, field_name, confidence, bbox))
+
+    selected = []
+    for field_name, group in groups.items():
+        if get_ocr_profile(field_name).multi_instance:
+            selected.extend(sorted(group, key=lambda d: (d[3][1], d[3][0])))
+        else:
+            selected.append(max(group, key=lambda d: (d[2], -d[3][1], -d[3][0])))
+
+    return [(field_name, confidence, bbox) for _, field_name, confidence, bbox in selected]
+
+
+def apply_profile_pattern(text: str, profile: OcrProfile):
+    """
+    Valida el texto contra el patrón del perfil.
+    Retorna (valor, coincide): si hay coincidencia el valor es solo la parte que coincide;
+    sin patrón `coincide` es None.
+    """
+    if not profile.pattern:
+        return text, None
+    match = re.search(profile.pattern, text.replace(" ", ""))
+    if match:
+        return match.group(0), True
+    return text, False
@@ -2,18 +2,69 @@ import pytesseract
 import cv2
 import numpy as np
 import re
+import threading
 from PIL import Image
 
 # Importa el cargador de modelos Yolo
-from services.model_loader import load_yolo_model, YOLO_MODELS_PATH
+from services.model_loader import YOLO_MODELS_PATH, PRECISION_FP32, PRECISION_INT8
+from services.batch_inference import run_yolo_detection
+from services.tesseract_pool import is_tesseract_api_available, recognize_array, recognize_words
+from services.ocr_executor import map_ocr
+from services.preprocessing_service import binarize_image, binarize_region
+from services.ocr_profiles import OcrProfile, get_ocr_profile, apply_profile_pattern, select_detections
+from services.barcode_service import read_document_barcode, barcode_covers_document
+from services.template_service import align_document_template, template_field_bbox, warp_template_field
 from models.documents import DocumentType # Para usar los ENUMS de tipos de documento
+from config import (OCR_STRATEGY_BY_TYPE, YOLO_INT8_DOCUMENT_TYPES, YOLO_FAST_MODELS, OCR_NORMALIZE_CROPS,
+                    OCR_TARGET_TEXT_HEIGHT, OCR_CROP_PADDING, OCR_MIN_CROP_SCALE, OCR_MAX_CROP_SCALE)
 
-def perform_ocr_with_tesseract(cropped_image_np_array: np.ndarray, lang: str = 'spa', psm: int = 7) -> str:
+# Estrategias de OCR sobre las cajas detectadas por YOLO
+OCR_STRATEGY_CROP = "crop" # Un reconocimiento por caja (mejor para pocos campos grandes)
+OCR_STRATEGY_PAGE = "page" # Un solo reconocimiento de la página, palabras asignadas a cajas
+
+# Estrategia por tipo de documento (se puede sobreescribir con OCR_STRATEGY_BY_TYPE)
+OCR_STRATEGIES = {
+    DocumentType.DNI_FRONT: OCR_STRATEGY_CROP,
+    DocumentType.DNI_BACK: OCR_STRATEGY_CROP,
+    DocumentType.INVOICE_A: OCR_STRATEGY_CROP,
+    DocumentType.INVOICE_B: OCR_STRATEGY_CROP,
+    DocumentType.INVOICE_C: OCR_STRATEGY_CROP,
+}
+OCR_STRATEGIES.update({DocumentType(doc_type): strategy for doc_type, strategy in OCR_STRATEGY_BY_TYPE.items()})
+
+# Cascada de detectores: un modelo rápido (YOLO_FAST_MODELS) y el modelo completo si hace falta
+CASCADE_TIER_FAST = "fast"
+CASCADE_TIER_FULL = "full"
+
+# Campos que el detector rápido debe encontrar para aceptar su resultado
+_DNI_REQUIRED_FIELDS = ['dni_apellido', 'dni_nombre', 'dni_numero']
+_INVOICE_REQUIRED_FIELDS = ['factura_numero', 'factura_fecha_emision', 'emisor_cuit', 'total']
+CASCADE_REQUIRED_FIELDS = {
+    DocumentType.DNI_FRONT: _DNI_REQUIRED_FIELDS,
+    DocumentType.DNI_BACK: [],
+    DocumentType.INVOICE_A: _INVOICE_REQUIRED_FIELDS,
+    DocumentType.INVOICE_B: _INVOICE_REQUIRED_FIELDS,
+    DocumentType.INVOICE_C: _INVOICE_REQUIRED_FIELDS,
+}
+
+# Confianza mínima por clase para no escalar
+CASCADE_DEFAULT_THRESHOLD = 0.5
+CASCADE_CLASS_THRESHOLDS = {
+    'dni_numero': 0.6,
+    'emisor_cuit': 0.6,
+    'total': 0.6,
+}
+
+def perform_ocr_with_tesseract(cropped_image_np_array: np.ndarray, lang: str = 'spa', psm: int = 7,
+                               whitelist: str = None) -> str:
     """
     Realiza OCR usando Tesseract en una imagen recortada (array de NumPy).
     PSM 7: Trata la imagen como una sola línea de texto.
     PSM 8: Trata la imagen como una sola palabra.
     Estos son buenos para regiones ya detectadas.
+    `whitelist` restringe el alfabeto (ej. solo dígitos para CUIT/DNI), más rápido y preciso.
+    Si tesserocr está disponible se usa el handle persistente del hilo (sin lanzar
+    un proceso `tesseract` por recorte); sino se recurre a pytesseract.
     """
     if cropped_image_np_array is None or cropped_image_np_array.size == 0:
         return ""
@@ -22,41 +73,167 @@ def perform_ocr_with_tesseract(cropped_image_np_array: np.ndarray, lang: str = '
     if np.all(cropped_image_np_array == 0) or np.all(cropped_image_np_array == 255):
         return ""
 
+    if is_tesseract_api_available():
+        return recognize_array(cropped_image_np_array, lang=lang, psm=psm, whitelist=whitelist).strip()
+
     pil_image = Image.fromarray(cropped_image_np_array)
     custom_config = f'--oem 3 --psm {psm}' # OEM 3 para motor LSTM, PSM según el campo
+    if whitelist:
+        custom_config += f' -c tessedit_char_whitelist={whitelist}'
     text = pytesseract.image_to_string(pil_image, lang=lang, config=custom_config)
     return text.strip()
 
-def perform_yolo_ocr(np_image_preprocessed: np.ndarray, document_type: DocumentType) -> dict:
+def estimate_text_height(cropped_image_np_array: np.ndarray):
     """
-    Detecta campos usando YOLOv8 y realiza OCR con Tesseract en las regiones detectadas.
+    Estima la altura (px) de la línea de texto de un recorte con un perfil de proyección
+    horizontal: la racha más larga de filas con tinta (píxeles oscuros).
+    Retorna None si el recorte no tiene tinta suficiente.
     """
-    extracted_data = {}
-    yolo_model_name = None
+    if cropped_image_np_array.ndim == 3:
+        cropped_image_np_array = cv2.cvtColor(cropped_image_np_array, cv2.COLOR_BGR2GRAY)
+    ink_per_row = np.count_nonzero(cropped_image_np_array < 128, axis=1)
+    peak = int(ink_per_row.max()) if ink_per_row.size else 0
+    if peak == 0:
+        return None
+
+    # Filas con tinta significativa (ignora ruido de 1-2 píxeles)
+    text_rows = ink_per_row > max(1, peak * 0.05)
+    longest = current = 0
+    for has_ink in text_rows:
+        current = current + 1 if has_ink else 0
+        longest = max(longest, current)
+    return longest or None
+
+# Buffer preasignado por hilo para el recorte normalizado (crece según haga falta)
+_crop_buffers = threading.local()
+
+def _get_crop_canvas(height: int, width: int) -> np.ndarray:
+    canvas = getattr(_crop_buffers, "canvas", None)
+    if canvas is None or canvas.shape[0] < height or canvas.shape[1] < width:
+        new_height = max(height, canvas.shape[0] if canvas is not None else 0)
+        new_width = max(width, canvas.shape[1] if canvas is not None else 0)
+        canvas = _crop_buffers.canvas = np.empty((new_height, new_width), dtype=np.uint8)
+    return canvas[:height, :width]
+
+def normalize_crop_for_ocr(cropped_image_np_array: np.ndarray, target_height: int = OCR_TARGET_TEXT_HEIGHT,
+                           padding: int = OCR_CROP_PADDING) -> np.ndarray:
+    """
+    Reescala el recorte para que su línea de texto mida ~`target_height` px (el rango en que
+    Tesseract es más preciso) y agrega un margen blanco de `padding` px.
+    Los campos pequeños se agrandan (mejor precisión) y los enormes se reducen (menos tiempo).
+    Reutiliza un buffer por hilo: el resultado es válido hasta la próxima llamada en el mismo hilo.
+    """
+    if cropped_image_np_array.ndim == 3:
+        cropped_image_np_array = cv2.cvtColor(cropped_image_np_array, cv2.COLOR_BGR2GRAY)
+
+    text_height = estimate_text_height(cropped_image_np_array)
+    scale = 1.0
+    if text_height:
+        scale = min(max(target_height / text_height, OCR_MIN_CROP_SCALE), OCR_MAX_CROP_SCALE)
+        if abs(scale - 1.0) < 0.15: # Ya está cerca del tamaño óptimo
+            scale = 1.0
+
+    h, w = cropped_image_np_array.shape[:2]
+    new_h = max(1, int(round(h * scale)))
+    new_w = max(1, int(round(w * scale)))
+
+    canvas = _get_crop_canvas(new_h + 2 * padding, new_w + 2 * padding)
+    canvas.fill(255)
+    interior = canvas[padding:padding + new_h, padding:padding + new_w]
+    if scale == 1.0:
+        interior[...] = cropped_image_np_array
+    else:
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        cv2.resize(cropped_image_np_array, (new_w, new_h), dst=interior, interpolation=interpolation)
+    return canvas
 
-    # Seleccionar el modelo YOLO adecuado
+def ocr_field_crop(cropped_image_np_array: np.ndarray, profile: OcrProfile) -> str:
+    """
+    Realiza OCR de un recorte aplicando el perfil de su clase (altura de texto, PSM, idioma y alfabeto).
+    Con OCR_NORMALIZE_CROPS el recorte se lleva a la altura de texto objetivo antes del OCR.
+    """
+    if cropped_image_np_array is None or cropped_image_np_array.size == 0:
+        return ""
+    if OCR_NORMALIZE_CROPS:
+        cropped_image_np_array = normalize_crop_for_ocr(cropped_image_np_array,
+                                                        profile.text_height or OCR_TARGET_TEXT_HEIGHT)
+    return perform_ocr_with_tesseract(cropped_image_np_array, lang=profile.lang, psm=profile.psm,
+                                      whitelist=profile.whitelist)
+
+def perform_page_ocr_words(np_image: np.ndarray, lang: str = 'spa', psm: int = 3) -> list:
+    """
+    Realiza un único OCR sobre la página completa con salida a nivel de palabra.
+    Retorna una lista en orden de lectura de {'text', 'confidence', 'bbox': [x1, y1, x2, y2]}.
+    """
+    if np_image is None or np_image.size == 0:
+        return []
+
+    if is_tesseract_api_available():
+        return recognize_words(np_image, lang=lang, psm=psm)
+
+    data = pytesseract.image_to_data(Image.fromarray(np_image), lang=lang, config=f'--oem 3 --psm {psm}',
+                                     output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        text = text.strip()
+        if not text:
+            continue
+        x, y, bw, bh = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+        words.append({
+            'text': text,
+            'confidence': max(float(data['conf'][i]), 0.0) / 100.0,
+            'bbox': [x, y, x + bw, y + bh]
+        })
+    return words
+
+def assign_words_to_boxes(words: list, boxes: list) -> list:
+    """
+    Asigna cada palabra a la caja (x1, y1, x2, y2) que contiene su centro.
+    Si varias cajas contienen el centro se elige la de menor área (la más específica).
+    Retorna el texto de cada caja, en el orden de `boxes`, con las palabras en orden de lectura.
+    """
+    assigned = [[] for _ in boxes]
+    areas = [(x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in boxes]
+
+    for word in words:
+        wx1, wy1, wx2, wy2 = word['bbox']
+        cx = (wx1 + wx2) / 2.0
+        cy = (wy1 + wy2) / 2.0
+        best_index = None
+        for i, (x1, y1, x2, y2) in enumerate(boxes):
+            if x1 <= cx <= x2 and y1 <= cy <= y2:
+                if best_index is None or areas[i] < areas[best_index]:
+                    best_index = i
+        if best_index is not None:
+            assigned[best_index].append(word['text'])
+
+    return [" ".join(texts) for texts in assigned]
+
+def get_yolo_model_name(document_type: DocumentType) -> str:
+    """Selecciona el modelo YOLO adecuado para el tipo de documento."""
     if document_type in [DocumentType.DNI_FRONT, DocumentType.DNI_BACK]:
-        yolo_model_name = "dni_yolov8.pt" # Aquí tu modelo entrenado para DNI
+        return "dni_yolov8.pt" # Aquí tu modelo entrenado para DNI
     elif document_type in [DocumentType.INVOICE_A, DocumentType.INVOICE_B, DocumentType.INVOICE_C]:
-        yolo_model_name = "invoices_cpu_abs/weights/best.pt" # Tu modelo entrenado para facturas
-    else:
-        # Para el desarrollo inicial, usa un modelo genérico
-        print(f"Advertencia: Tipo de documento {document_type} no tiene un modelo YOLO específico. Usando yolov8n.pt")
-        yolo_model_name = "yolov8n.pt" # Modelo genérico solo para pruebas, NO para prod.
+        return "invoices_cpu_abs/weights/best.pt" # Tu modelo entrenado para facturas
+    # Para el desarrollo inicial, usa un modelo genérico
+    print(f"Advertencia: Tipo de documento {document_type} no tiene un modelo YOLO específico. Usando yolov8n.pt")
+    return "yolov8n.pt" # Modelo genérico solo para pruebas, NO para prod.
 
-    try:
-        yolo_model = load_yolo_model(yolo_model_name)
-    except FileNotFoundError as e:
-        print(f"Error al cargar modelo YOLO: {e}. Asegúrate de que los modelos estén en {YOLO_MODELS_PATH}")
-        # Fallback: Si no hay modelo YOLO, intentar OCR genérico (menos preciso)
-        # O simplemente lanzar el error para que el worker lo marque como fallido
-        extracted_data['full_text_fallback'] = perform_ocr_with_tesseract(np_image_preprocessed, psm=3)
-        return extracted_data
+def get_yolo_precision(document_type: DocumentType) -> str:
+    """INT8 para los tipos listados en YOLO_INT8_DOCUMENT_TYPES (si el modelo cuantizado cumple el presupuesto de mAP)."""
+    return PRECISION_INT8 if document_type.value in YOLO_INT8_DOCUMENT_TYPES else PRECISION_FP32
 
-    # Realizar inferencia
-    results = yolo_model(np_image_preprocessed)
+def detect_fields(np_image: np.ndarray, yolo_model_name: str, precision: str = PRECISION_FP32) -> list:
+    """
+    Ejecuta YOLO y retorna las regiones detectadas, en el orden de YOLO, como
+    tuplas (field_name, confidence, [x1, y1, x2, y2]) recortadas a los límites de la imagen.
+    Lanza FileNotFoundError si el modelo no existe.
+    """
+    # Realizar inferencia (agrupada con páginas de otras tareas con el pool threads y YOLO_BATCH_SIZE > 1)
+    results = [run_yolo_detection(yolo_model_name, np_image, precision)]
 
-    # Procesar los resultados
+    detections = []
+    h, w = np_image.shape[:2]
     for r in results:
         boxes = r.boxes
         names = r.names # Map ID de clase a nombre (ej. 0: 'dni_apellido')
@@ -67,9 +244,7 @@ def perform_yolo_ocr(np_image_preprocessed: np.ndarray, document_type: DocumentT
             class_id = int(box.cls[0])
             field_name = names[class_id]
 
-            # Recortar la región de interés (ROI) de la imagen preprocesada
             # Asegurarse de que las coordenadas sean válidas
-            h, w = np_image_preprocessed.shape[:2]
             x1 = max(0, x1)
             y1 = max(0, y1)
             x2 = min(w, x2)
@@ -78,20 +253,230 @@ def perform_yolo_ocr(np_image_preprocessed: np.ndarray, document_type: DocumentT
             if x1 >= x2 or y1 >= y2: # Región inválida
                 continue
 
-            cropped_region = np_image_preprocessed[y1:y2, x1:x2]
+            detections.append((field_name, confidence, [x1, y1, x2, y2]))
+    return detections
 
-            # Realizar OCR con Tesseract en la región recortada
-            # Puedes ajustar el PSM según el tipo de campo
-            psm_mode = 7 # Por defecto, una línea
-            # Ej: if "numero" in field_name: psm_mode = 8 # para palabras
-            text_value = perform_ocr_with_tesseract(cropped_region, lang='spa', psm=psm_mode)
-            
-            # Guardar el resultado y la confianza
-            extracted_data[field_name] = {
-                'value': text_value,
-                'confidence': confidence,
-                'bbox': [x1, y1, x2, y2]
-            }
-            print(f"Detectado {field_name}: '{text_value}' (Conf: {confidence:.2f})")
+def get_cascade_escalation_reasons(detections: list, document_type: DocumentType, known_fields=()) -> list:
+    """
+    Indica por qué el resultado del detector rápido no alcanza: campos obligatorios
+    ausentes o con confianza por debajo del umbral de su clase. Lista vacía = aceptar.
+    Los campos de `known_fields` (ya leídos de un código) no se exigen al detector.
+    """
+    best_confidence = {}
+    for field_name, confidence, _ in detections:
+        best_confidence[field_name] = max(confidence, best_confidence.get(field_name, 0.0))
+
+    reasons = []
+    for field_name in CASCADE_REQUIRED_FIELDS.get(document_type, []):
+        if field_name in known_fields:
+            continue
+        threshold = CASCADE_CLASS_THRESHOLDS.get(field_name, CASCADE_DEFAULT_THRESHOLD)
+        if field_name not in best_confidence:
+            reasons.append(f"{field_name}: ausente")
+        elif best_confidence[field_name] < threshold:
+            reasons.append(f"{field_name}: confianza {best_confidence[field_name]:.2f} < {threshold:.2f}")
+    return reasons
+
+def detect_fields_with_cascade(np_image: np.ndarray, document_type: DocumentType, metadata: dict = None,
+                               known_fields=()) -> list:
+    """
+    Detecta primero con el modelo rápido del tipo (YOLO_FAST_MODELS) y solo escala al modelo
+    completo si faltan campos obligatorios o su confianza es baja. Registra el nivel usado en `metadata`.
+    """
+    full_model_name = get_yolo_model_name(document_type)
+    fast_model_name = YOLO_FAST_MODELS.get(document_type.value)
+    precision = get_yolo_precision(document_type)
+    detector_info = {'tier': CASCADE_TIER_FULL, 'model': full_model_name, 'escalated': False}
+
+    detections = None
+    if fast_model_name:
+        try:
+            detections = detect_fields(np_image, fast_model_name, precision)
+        except FileNotFoundError as e:
+            print(f"Advertencia: modelo rápido no disponible ({e}); se usa el modelo completo")
+        else:
+            reasons = get_cascade_escalation_reasons(detections, document_type, known_fields)
+            if reasons:
+                print(f"Cascada: escalando a {full_model_name} ({'; '.join(reasons)})")
+                detector_info.update({'escalated': True, 'escalation_reasons': reasons})
+                detections = None
+            else:
+                detector_info.update({'tier': CASCADE_TIER_FAST, 'model': fast_model_name})
+
+    if detections is None:
+        detections = detect_fields(np_image, full_model_name, precision)
+
+    if metadata is not None:
+        metadata['detector'] = detector_info
+    return detections
+
+def scale_detections(detections: list, from_shape, to_shape) -> list:
+    """
+    Lleva las cajas detectadas sobre una imagen de tamaño `from_shape` a las coordenadas
+    de la misma página con tamaño `to_shape` (redondeando hacia afuera y recortando a los límites).
+    """
+    scale_x = to_shape[1] / from_shape[1]
+    scale_y = to_shape[0] / from_shape[0]
+    h, w = to_shape[:2]
+    scaled = []
+    for field_name, confidence, (x1, y1, x2, y2) in detections:
+        bbox = [max(0, int(np.floor(x1 * scale_x))), max(0, int(np.floor(y1 * scale_y))),
+                min(w, int(np.ceil(x2 * scale_x))), min(h, int(np.ceil(y2 * scale_y)))]
+        scaled.append((field_name, confidence, bbox))
+    return scaled
+
+def perform_yolo_ocr(np_image_preprocessed: np.ndarray, document_type: DocumentType, strategy: str = None,
+                     metadata: dict = None, detection_image: np.ndarray = None, binarize_crops: bool = False,
+                     barcode_fields: dict = None) -> dict:
+    """
+    Detecta campos usando YOLOv8 y realiza OCR con Tesseract en las regiones detectadas.
+    Con la estrategia "crop" los recortes de un documento se reconocen en paralelo
+    (ver services/ocr_executor.py); con "page" se reconoce la página una sola vez y cada
+    palabra se asigna a la caja que la contiene. Si `strategy` es None se usa OCR_STRATEGIES.
+    Si se pasa `metadata` (dict), se completa con información del pipeline (ej. nivel de la cascada).
+
+    Doble resolución (ver preprocessing_service.prepare_page_for_detection): si se pasa
+    `detection_image`, YOLO corre sobre esa versión reducida de la página y las cajas se llevan
+    a las coordenadas de `np_image_preprocessed`; con `binarize_crops` solo se binarizan las
+    regiones que se reconocen.
+
+    Antes de YOLO se usa el código del documento (services/barcode_service.py, ej. el QR de
+    AFIP, PDF417 del DNI): sus campos se toman con confianza 1.0 y solo se reconocen las cajas de
+    los demás; si el código trae todos los campos del tipo (BARCODE_SUFFICIENT_FIELDS) no se corre YOLO.
+    Los workers pasan `barcode_fields` leídos sobre la imagen decodificada (PreparedPage); si es None
+    el código se busca en `np_image_preprocessed`.
+    Los documentos con plantilla (services/template_service.py, ej. DNI) tampoco usan YOLO cuando
+    la página se alinea con su diseño canónico: los campos se recortan en sus coordenadas conocidas.
+    """
+    if strategy is None:
+        strategy = OCR_STRATEGIES.get(document_type, OCR_STRATEGY_CROP)
+    if strategy not in (OCR_STRATEGY_CROP, OCR_STRATEGY_PAGE):
+        raise ValueError(f"Estrategia de OCR desconocida: {strategy}")
+
+    if barcode_fields is None:
+        barcode_fields = read_document_barcode(np_image_preprocessed, document_type, metadata)
+    extracted_data = dict(barcode_fields)
+    if barcode_covers_document(barcode_fields, document_type):
+        # El código trae todos los campos del documento: no hace falta YOLO ni OCR
+        if metadata is not None:
+            metadata['detections'] = {'detected': 0, 'ocr': 0, 'skipped': 'barcode'}
+        return extracted_data
+
+    alignment = align_document_template(np_image_preprocessed, document_type, metadata)
+    if alignment is not None:
+        # Documento de diseño fijo alineado con su plantilla: los campos salen de coordenadas conocidas, sin YOLO
+        extracted_data.update(perform_template_ocr(np_image_preprocessed, alignment, barcode_fields, binarize_crops))
+        if metadata is not None:
+            ocr_count = sum(name not in barcode_fields for name in alignment.template.fields)
+            metadata['detections'] = {'detected': 0, 'ocr': ocr_count, 'skipped': 'template'}
+        return extracted_data
+
+    try:
+        detections = detect_fields_with_cascade(
+            np_image_preprocessed if detection_image is None else detection_image, document_type, metadata,
+            known_fields=barcode_fields)
+    except FileNotFoundError as e:
+        print(f"Error al cargar modelo YOLO: {e}. Asegúrate de que los modelos estén en {YOLO_MODELS_PATH}")
+        # Fallback: Si no hay modelo YOLO, intentar OCR genérico (menos preciso)
+        # O simplemente lanzar el error para que el worker lo marque como fallido
+        page = binarize_image(np_image_preprocessed) if binarize_crops else np_image_preprocessed
+        extracted_data['full_text_fallback'] = perform_ocr_with_tesseract(page, psm=3)
+        return extracted_data
+
+    if detection_image is not None:
+        detections = scale_detections(detections, detection_image.shape, np_image_preprocessed.shape)
+        if metadata is not None:
+            metadata['detection_resolution'] = {'detection': list(detection_image.shape[:2]),
+                                                'ocr': list(np_image_preprocessed.shape[:2])}
+
+    # Antes del OCR: descartar cajas de baja confianza, duplicados de campos de una sola instancia
+    # y los campos que ya trajo el código
+    detected_count = len(detections)
+    detections = [detection for detection in select_detections(detections) if detection[0] not in barcode_fields]
+    if metadata is not None:
+        metadata['detections'] = {'detected': detected_count, 'ocr': len(detections)}
+
+    if strategy == OCR_STRATEGY_PAGE:
+        # Un único reconocimiento de la página; las palabras se reparten entre las cajas
+        page = binarize_image(np_image_preprocessed) if binarize_crops and detections else np_image_preprocessed
+        words = perform_page_ocr_words(page, lang='spa') if detections else []
+        texts = assign_words_to_boxes(words, [bbox for _, _, bbox in detections])
+    else:
+        # Recortar las regiones de interés (ROI) de la imagen preprocesada
+        if binarize_crops:
+            crops = [binarize_region(np_image_preprocessed, bbox) for _, _, bbox in detections]
+        else:
+            crops = [np_image_preprocessed[y1:y2, x1:x2] for _, _, (x1, y1, x2, y2) in detections]
+        # PSM, idioma, alfabeto y escala según el perfil de cada campo (services/ocr_profiles.py)
+        profiles = [get_ocr_profile(field_name) for field_name, _, _ in detections]
+
+        # OCR de todos los recortes en paralelo; map_ocr conserva el orden de las cajas
+        texts = map_ocr(ocr_field_crop, crops, profiles)
+
+    extracted_data.update(build_extracted_fields(detections, texts))
+    return extracted_data
+
+def perform_template_ocr(np_image: np.ndarray, alignment, skip_fields=(), binarize_crops: bool = False) -> dict:
+    """
+    OCR de los campos de una plantilla alineada (services/template_service.py): cada campo se
+    recorta rectificado desde sus coordenadas en la plantilla y se reconoce con su perfil.
+    La confianza de cada campo es la fracción de inliers de la alineación.
+    """
+    field_names = [name for name in alignment.template.fields if name not in skip_fields]
+    crops = [warp_template_field(np_image, alignment, name) for name in field_names]
+    if binarize_crops:
+        crops = [binarize_image(crop) for crop in crops]
+    detections = [(name, alignment.inlier_ratio, template_field_bbox(alignment, name, np_image.shape))
+                  for name in field_names]
+    texts = map_ocr(ocr_field_crop, crops, [get_ocr_profile(name) for name in field_names])
+    return build_extracted_fields(detections, texts)
+
+def build_extracted_fields(detections: list, texts: list) -> dict:
+    """Arma el resultado por campo ({'value', 'confidence', 'bbox'}) a partir de las cajas y su texto."""
+    extracted_data = {}
+    for (field_name, confidence, bbox), text_value in zip(detections, texts):
+        if field_name in extracted_data:
+            # Campo multi-instancia: se unen las cajas en orden de lectura
+            previous = extracted_data[field_name]
+            px1, py1, px2, py2 = previous['bbox']
+            previous['value'] = f"{previous['value']}\n{text_value}"
+            previous['confidence'] = max(previous['confidence'], confidence)
+            previous['bbox'] = [min(px1, bbox[0]), min(py1, bbox[1]), max(px2, bbox[2]), max(py2, bbox[3])]
+            continue
+
+        # Validar contra el patrón esperado del campo (ej. formato de CUIT)
+        text_value, pattern_valid = apply_profile_pattern(text_value, get_ocr_profile(field_name))
+
+        # Guardar el resultado y la confianza
+        extracted_data[field_name] = {
+            'value': text_value,
+            'confidence': confidence,
+            'bbox': bbox
+        }
+        if pattern_valid is not None:
+            extracted_data[field_name]['pattern_valid'] = pattern_valid
+        print(f"Detectado {field_name}: '{text_value}' (Conf: {confidence:.2f})")
     
-    return extracted_data
\ No newline at end of file
+    return extracted_data
+
+def perform_yolo_text_layer(words: list, page_shape, detection_image: np.ndarray, document_type: DocumentType,
+                            metadata: dict = None) -> dict:
+    """
+    Como perform_yolo_ocr pero sin OCR, para páginas que ya traen texto (capa de texto de un PDF):
+    YOLO ubica los campos sobre `detection_image` (la página reducida) y el texto de cada caja
+    sale de `words` ({'text', 'bbox'} en coordenadas de una página de tamaño `page_shape`).
+    """
+    try:
+        detections = detect_fields_with_cascade(detection_image, document_type, metadata)
+    except FileNotFoundError as e:
+        print(f"Error al cargar modelo YOLO: {e}. Asegúrate de que los modelos estén en {YOLO_MODELS_PATH}")
+        return {'full_text_fallback': " ".join(word['text'] for word in words)}
+
+    detections = scale_detections(detections, detection_image.shape, page_shape)
+    detected_count = len(detections)
+    detections = select_detections(detections)
+    if metadata is not None:
+        metadata['detections'] = {'detected': detected_count, 'ocr': 0, 'text_layer': len(detections)}
+
+    texts = assign_words_to_boxes(words, [bbox for _, _, bbox in detections])
+    return build_extracted_fields(detections, texts)
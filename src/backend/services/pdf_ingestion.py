@@ -0,0 +1,153 @@
+# ocr_api/services/pdf_ingestion.py
+
+import math
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from config import (PDF_RENDER_DPI, PDF_TEXT_LAYER_MIN_WORDS, PDF_MAX_PAGES, DECODE_MAX_MEGAPIXELS,
+                    YOLO_DETECTION_MAX_SIDE)
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF es opcional: sin él los PDF se rechazan con un error claro
+try:
+    import pymupdf
+except ImportError:  # pragma: no cover - depende del entorno
+    try:
+        import fitz as pymupdf  # nombre del módulo en versiones anteriores a 1.24
+    except ImportError:
+        pymupdf = None
+
+# PyMuPDF no es thread-safe (MuPDF comparte su contexto entre documentos): toda llamada se serializa
+# con este lock, incluso entre documentos distintos procesados por hilos del mismo worker. Se toma
+# por página y no a lo largo del generador, así que las páginas ya entregadas se procesan en paralelo
+_pymupdf_lock = threading.Lock()
+
+# La especificación admite basura antes del encabezado: se busca en el primer KB
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_SEARCH_BYTES = 1024
+# Unidades de PDF (puntos) por pulgada
+PDF_POINTS_PER_INCH = 72.0
+
+
+@dataclass
+class PdfPageContent:
+    """
+    Una página del PDF lista para el pipeline:
+    - con capa de texto: `words` (en px a render_dpi) y `detection_image` (página reducida para YOLO)
+    - sin capa de texto: `image`, la página rasterizada a render_dpi (BGR) para preprocesar + OCR
+    """
+    index: int
+    page_shape: tuple
+    words: Optional[list] = None
+    detection_image: Optional[np.ndarray] = None
+    image: Optional[np.ndarray] = None
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def has_text_layer(self) -> bool:
+        return self.words is not None
+
+
+def is_pdf(file_bytes: bytes) -> bool:
+    """Detecta un PDF por su firma (%PDF-), sin depender de la extensión ni del MIME declarado."""
+    return PDF_MAGIC in file_bytes[:PDF_HEADER_SEARCH_BYTES]
+
+
+def render_page(page, zoom: float) -> np.ndarray:
+    """Rasteriza la página con el factor `zoom` (1.0 = 72 DPI) y la retorna como BGR de 3 canales."""
+    pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), colorspace=pymupdf.csRGB, alpha=False)
+    rows = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)
+    rgb = rows[:, :pixmap.width * pixmap.n].reshape(pixmap.height, pixmap.width, pixmap.n)
+    # cvtColor copia: el resultado no depende del buffer del pixmap
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def extract_text_words(page, zoom: float) -> list:
+    """
+    Palabras de la capa de texto en orden de lectura, como {'text', 'confidence', 'bbox'}
+    con el bbox en px de la página rasterizada con `zoom` (mismo formato que perform_page_ocr_words).
+    """
+    # Las coordenadas de get_text no incluyen la rotación de la página; el pixmap sí
+    matrix = page.rotation_matrix * pymupdf.Matrix(zoom, zoom)
+    words = []
+    for x0, y0, x1, y1, text, *_ in page.get_text("words", sort=True):
+        text = text.strip()
+        if not text:
+            continue
+        rect = pymupdf.Rect(x0, y0, x1, y1) * matrix
+        words.append({
+            'text': text,
+            'confidence': 1.0,
+            'bbox': [int(rect.x0), int(rect.y0), int(math.ceil(rect.x1)), int(math.ceil(rect.y1))],
+        })
+    return words
+
+
+def _render_zoom(page, render_dpi: float, max_megapixels: float) -> float:
+    """Zoom para `render_dpi`, reducido si la página superaría el presupuesto de píxeles."""
+    zoom = render_dpi / PDF_POINTS_PER_INCH
+    pixels = page.rect.width * page.rect.height * zoom * zoom
+    if pixels > max_megapixels * 1e6:
+        zoom *= math.sqrt(max_megapixels * 1e6 / pixels)
+    return zoom
+
+
+def iter_pdf_pages(pdf_bytes: bytes, render_dpi: float = PDF_RENDER_DPI, min_text_words: int = PDF_TEXT_LAYER_MIN_WORDS,
+                   detection_max_side: int = YOLO_DETECTION_MAX_SIDE, max_pages: int = PDF_MAX_PAGES,
+                   max_megapixels: float = DECODE_MAX_MEGAPIXELS):
+    """
+    Recorre el PDF página por página (generador): cada página se rasteriza recién cuando se
+    pide, así que la memoria depende de cuántas páginas consume el llamador a la vez, no del
+    tamaño del documento. Las páginas con al menos `min_text_words` palabras en su capa de
+    texto solo se rasterizan reducidas (para YOLO); el texto sale del PDF sin OCR.
+    Lanza ValueError si el PDF no se puede abrir, está cifrado o supera `max_pages`.
+    """
+    if pymupdf is None:
+        raise RuntimeError("Se recibió un PDF pero PyMuPDF no está instalado (pip install pymupdf)")
+    with _pymupdf_lock:
+        try:
+            document = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+        except Exception as e:
+            raise ValueError(f"No se pudo abrir el PDF: {e}")
+        page_count, needs_pass = document.page_count, document.needs_pass
+
+    try:
+        if needs_pass:
+            raise ValueError("El PDF está protegido con contraseña")
+        if page_count == 0:
+            raise ValueError("El PDF no tiene páginas")
+        if page_count > max_pages:
+            raise ValueError(f"El PDF tiene {page_count} páginas (máximo {max_pages})")
+
+        for index in range(page_count):
+            with _pymupdf_lock:
+                content = _read_page(document, index, render_dpi, min_text_words, detection_max_side,
+                                     max_megapixels)
+            # El lock no se retiene mientras el llamador procesa la página
+            yield content
+    finally:
+        with _pymupdf_lock:
+            document.close()
+
+
+def _read_page(document, index: int, render_dpi: float, min_text_words: int, detection_max_side: int,
+               max_megapixels: float) -> PdfPageContent:
+    """Extrae la capa de texto y rasteriza una página; se llama con _pymupdf_lock tomado."""
+    page = document.load_page(index)
+    zoom = _render_zoom(page, render_dpi, max_megapixels)
+    page_shape = (int(round(page.rect.height * zoom)), int(round(page.rect.width * zoom)))
+    metadata = {'render_dpi': zoom * PDF_POINTS_PER_INCH, 'image_dimensions': list(page_shape)}
+
+    words = extract_text_words(page, zoom)
+    if len(words) >= min_text_words:
+        detection_zoom = min(zoom, detection_max_side / max(page.rect.width, page.rect.height))
+        metadata['text_layer_words'] = len(words)
+        return PdfPageContent(index=index, page_shape=page_shape, words=words,
+                              detection_image=render_page(page, detection_zoom), metadata=metadata)
+    return PdfPageContent(index=index, page_shape=page_shape, image=render_page(page, zoom), metadata=metadata)
@@ -0,0 +1,244 @@
+# ocr_api/services/preprocessing_cache.py
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+from config import (PREPROCESSING_CACHE_ENABLED, PREPROCESSING_CACHE_DIR, PREPROCESSING_CACHE_MAX_MB,
+                    PREPROCESSING_ANALYSIS_MAX_SIDE, YOLO_DETECTION_MAX_SIDE, OCR_DUAL_RESOLUTION,
+                    DECODE_TARGET_DPI, DECODE_MAX_MEGAPIXELS, ORIENTATION_MIN_CONFIDENCE, QUALITY_GATE_MODE,
+                    QUALITY_THUMBNAIL_SIDE, QUALITY_MIN_SHARPNESS, QUALITY_MIN_DPI, QUALITY_MIN_CONTRAST,
+                    QUALITY_MIN_PAGE_COVERAGE, BARCODE_FAST_PATH, BARCODE_DETECTION_MAX_SIDE)
+from services.image_decoding import decode_document_image
+from services.quality_service import check_image_quality
+from services.barcode_service import read_document_barcode
+from services.preprocessing_service import (
+    PREPROCESSING_PIPELINE_VERSION, PreparedPage, get_preprocessing_pipeline,
+    preprocess_image_for_ocr, prepare_page_for_detection, BINARIZE_BLOCK_SIZE, BINARIZE_C,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_EXTENSION = ".npz"
+
+# Tamaño del cache por directorio, estimado en este proceso: se inicializa con un recorrido completo
+# (evict_cache) y se actualiza en cada escritura, de modo que el directorio solo se vuelve a recorrer
+# cuando la estimación supera el límite. Las escrituras de otros procesos se ven en ese recorrido.
+_cache_sizes = {}
+_cache_sizes_lock = threading.Lock()
+
+
+def get_cache_key(file_bytes: bytes, stages: list, dual_resolution: bool, document_type=None) -> str:
+    """
+    Clave del cache: hash del archivo original + hash de todo lo que determina el resultado
+    del preprocesamiento y la metadata guardada con él (tipo de documento, versión del pipeline,
+    etapas, modo, parámetros de decodificación, tamaño, orientación, binarización, control de calidad
+    y lectura de códigos).
+    """
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    pipeline = json.dumps({
+        'version': PREPROCESSING_PIPELINE_VERSION,
+        'document_type': getattr(document_type, "value", document_type),
+        'stages': list(stages),
+        'dual_resolution': dual_resolution,
+        'decode_target_dpi': DECODE_TARGET_DPI,
+        'decode_max_megapixels': DECODE_MAX_MEGAPIXELS,
+        'analysis_max_side': PREPROCESSING_ANALYSIS_MAX_SIDE,
+        'detection_max_side': YOLO_DETECTION_MAX_SIDE if dual_resolution else None,
+        'orientation_min_confidence': ORIENTATION_MIN_CONFIDENCE,
+        'binarize': [BINARIZE_BLOCK_SIZE, BINARIZE_C],
+        'quality': [QUALITY_GATE_MODE, QUALITY_THUMBNAIL_SIDE, QUALITY_MIN_SHARPNESS, QUALITY_MIN_DPI,
+                    QUALITY_MIN_CONTRAST, QUALITY_MIN_PAGE_COVERAGE],
+        'barcode': [BARCODE_FAST_PATH, BARCODE_DETECTION_MAX_SIDE],
+    }, sort_keys=True)
+    pipeline_hash = hashlib.sha256(pipeline.encode("utf-8")).hexdigest()[:16]
+    return f"{file_hash}-{pipeline_hash}"
+
+
+def _cache_path(key: str, cache_dir: str = PREPROCESSING_CACHE_DIR) -> str:
+    # Subdirectorio por los dos primeros caracteres para no acumular miles de archivos en uno solo
+    return os.path.join(cache_dir, key[:2], f"{key}{CACHE_EXTENSION}")
+
+
+def load_cached_page(key: str, cache_dir: str = PREPROCESSING_CACHE_DIR):
+    """Retorna (arrays, metadata) guardados para `key`, o None si no están en el cache."""
+    path = _cache_path(key, cache_dir)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files if name != "metadata"}
+            metadata = json.loads(str(data["metadata"])) if "metadata" in data.files else {}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # Entrada corrupta (ej. escritura interrumpida): se descarta
+        logger.warning(f"Entrada de cache inválida {path}: {e}")
+        _remove(path)
+        return None
+
+    # LRU: la fecha de modificación marca el último uso
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return arrays, metadata
+
+
+def store_cached_page(key: str, arrays: dict, metadata: dict = None, cache_dir: str = PREPROCESSING_CACHE_DIR,
+                      max_bytes: int = PREPROCESSING_CACHE_MAX_MB * 1024 * 1024):
+    """
+    Guarda los arrays (npz comprimido, sin pérdida) de forma atómica y aplica el límite de tamaño
+    (el cache se recorre solo cuando el tamaño estimado supera `max_bytes`).
+    """
+    path = _cache_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=CACHE_EXTENSION, dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, metadata=np.array(json.dumps(metadata or {}, default=str)), **arrays)
+        added_bytes = os.path.getsize(tmp_path) - _file_size(path)
+        os.replace(tmp_path, path)
+    except Exception:
+        _remove(tmp_path)
+        raise
+
+    with _cache_sizes_lock:
+        total = _cache_sizes.get(cache_dir)
+        if total is not None:
+            total = _cache_sizes[cache_dir] = total + added_bytes
+    if total is None or total > max_bytes:
+        evict_cache(max_bytes, cache_dir)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def evict_cache(max_bytes: int, cache_dir: str = PREPROCESSING_CACHE_DIR) -> int:
+    """
+    Elimina las entradas usadas hace más tiempo hasta que el cache ocupe <= max_bytes y actualiza el
+    tamaño estimado del directorio. Retorna cuántas eliminó.
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # eliminado por otro proceso
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+        removed += 1
+    with _cache_sizes_lock:
+        _cache_sizes[cache_dir] = total
+    if removed:
+        logger.info(f"Cache de preprocesamiento: {removed} entradas eliminadas por tamaño")
+    return removed
+
+
+def prepare_decoded_page(original_image, document_type, stages: list = None,
+                         dual_resolution: bool = OCR_DUAL_RESOLUTION, metadata: dict = None,
+                         context=None) -> PreparedPage:
+    """
+    Control de calidad y preprocesamiento de una página ya decodificada (sin cache), por
+    ejemplo cada página rasterizada de un PDF. Lanza ImageQualityError si la página no
+    puede dar un OCR útil. Retorna la PreparedPage igual que get_preprocessed_page.
+    El código del documento (QR de AFIP, PDF417 del DNI) se lee sobre la imagen decodificada:
+    el suavizado y la binarización del preprocesamiento degradan sus módulos.
+    """
+    if stages is None:
+        stages = get_preprocessing_pipeline(document_type)
+    if metadata is None:
+        metadata = {}
+    metadata['image_dimensions'] = list(original_image.shape[:2])
+    # Control de calidad antes del preprocesamiento
+    check_image_quality(original_image, document_type, metadata=metadata)
+    barcode_fields = read_document_barcode(original_image, document_type, metadata)
+    if dual_resolution:
+        page = prepare_page_for_detection(original_image, document_type, metadata=metadata, stages=stages,
+                                          context=context)
+    else:
+        page = PreparedPage(detection_image=None, binarize=False,
+                            ocr_image=preprocess_image_for_ocr(original_image, document_type, metadata=metadata,
+                                                               stages=stages, context=context))
+    page.barcode_fields = barcode_fields
+    return page
+
+
+def get_preprocessed_page(image_bytes: bytes, document_type, decode=None, dual_resolution: bool = OCR_DUAL_RESOLUTION,
+                          metadata: dict = None, context=None) -> PreparedPage:
+    """
+    Retorna la página preprocesada del documento, desde el cache si ya se procesó el mismo
+    archivo con la misma versión del pipeline; si no, decodifica (decode_document_image, o
+    `decode(bytes)` si se indica), pasa el control de calidad
+    (quality_service), preprocesa y guarda el resultado.
+    Con doble resolución el resultado es el de prepare_page_for_detection; si no, `ocr_image`
+    es la página binarizada y `detection_image` es None (YOLO usa la misma página).
+    """
+    stages = get_preprocessing_pipeline(document_type)
+    cache_enabled = PREPROCESSING_CACHE_ENABLED and bool(PREPROCESSING_CACHE_DIR)
+    key = get_cache_key(image_bytes, stages, dual_resolution, document_type) if cache_enabled else None
+
+    if cache_enabled:
+        cached = load_cached_page(key)
+        if cached is not None:
+            arrays, cached_metadata = cached
+            # Datos internos de la entrada, no forman parte de la metadata del documento
+            binarize = bool(cached_metadata.pop("binarize_crops", False))
+            barcode_fields = cached_metadata.pop("barcode_fields", None)
+            if metadata is not None:
+                metadata.update(cached_metadata)
+                metadata['preprocessing_cache'] = {'key': key, 'hit': True}
+            return PreparedPage(detection_image=arrays.get("detection_image"), ocr_image=arrays["ocr_image"],
+                                binarize=binarize, barcode_fields=barcode_fields)
+
+    page_metadata = {}
+    if decode is None:
+        original_image = decode_document_image(image_bytes, metadata=page_metadata)
+    else:
+        original_image = decode(image_bytes)
+    # ImageQualityError si no pasa el control de calidad (no se guarda en el cache: un nuevo intento lo reevalúa)
+    page = prepare_decoded_page(original_image, document_type, stages=stages, dual_resolution=dual_resolution,
+                                metadata=page_metadata, context=context)
+
+    if cache_enabled:
+        arrays = {'ocr_image': page.ocr_image}
+        if page.detection_image is not None:
+            arrays['detection_image'] = page.detection_image
+        try:
+            store_cached_page(key, arrays, {**page_metadata, 'binarize_crops': page.binarize,
+                                            'barcode_fields': page.barcode_fields})
+        except OSError as e:
+            # El cache es una optimización: un disco lleno no debe hacer fallar el documento
+            logger.warning(f"No se pudo guardar en el cache de preprocesamiento: {e}")
+
+    if metadata is not None:
+        metadata.update(page_metadata)
+        if cache_enabled:
+            metadata['preprocessing_cache'] = {'key': key, 'hit': False}
+    return page
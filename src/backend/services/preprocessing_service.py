@@ -1,86 +1,565 @@
+import time
+import logging
+import threading
 import cv2
 import numpy as np
+import pytesseract
+from PIL import Image
 
-def preprocess_image_for_ocr(np_image: np.ndarray) -> np.ndarray:
+from dataclasses import dataclass
+
+from config import (PREPROCESSING_ANALYSIS_MAX_SIDE, PREPROCESSING_PIPELINE_BY_TYPE, YOLO_DETECTION_MAX_SIDE,
+                    ORIENTATION_MIN_CONFIDENCE)
+from models.enums import DocumentType
+from services.tesseract_pool import is_tesseract_api_available, detect_orientation
+
+logger = logging.getLogger(__name__)
+
+# Versión del pipeline de preprocesamiento: incrementarla al cambiar cualquier etapa
+# (invalida las páginas guardadas en services/preprocessing_cache.py)
+PREPROCESSING_PIPELINE_VERSION = "3"
+
+# Inclinaciones menores a este ángulo (grados) no justifican re-muestrear la página
+MIN_SKEW_ANGLE = 0.1
+# Fracción del lado mayor: si el cuadrilátero está a esta distancia de las esquinas, la página ya ocupa toda la imagen
+PAGE_QUAD_TOLERANCE = 0.01
+# Filas por franja al buscar el primer plano para estimar la inclinación
+SKEW_STRIP_HEIGHT = 256
+# Parámetros de la binarización adaptativa (ventana en px y constante restada a la media)
+BINARIZE_BLOCK_SIZE = 11
+BINARIZE_C = 2
+# Rotaciones en sentido horario por múltiplos de 90° (orientación gruesa de la página)
+QUARTER_TURN_ROTATIONS = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+class PreprocessingContext:
     """
-    Realiza un preprocesamiento básico en una imagen para mejorar la precisión del OCR.
-    Acepta una imagen OpenCV (np.ndarray) y retorna una imagen preprocesada.
+    Buffers preasignados del preprocesamiento, para un solo hilo.
+    Cada buffer se identifica por nombre y crece hasta el tamaño de la página más grande vista;
+    las páginas siguientes usan una vista de ese almacenamiento, de modo que en régimen
+    estacionario el pipeline no asigna memoria del tamaño de la página.
+    Los arrays retornados con un contexto son vistas de sus buffers: son válidos hasta la
+    próxima llamada que use el mismo contexto (copiarlos si se necesitan más tiempo).
     """
-    if np_image is None:
-        raise ValueError("Input image is None.")
 
-    # 1. Escala de grises
-    gray = cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY)
+    def __init__(self):
+        self._buffers = {}
 
-    # 2. Suavizado para reducir ruido (Filtro Gaussiano)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    
-    doc_aligned = deskew_image(blurred)
-    processed_image = correct_perspective(doc_aligned)
+    def buffer(self, name: str, shape, dtype=np.uint8) -> np.ndarray:
+        """Array contiguo de forma `shape` respaldado por el buffer `name` (se agranda si hace falta)."""
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        store = self._buffers.get((name, dtype))
+        if store is None or store.size < size:
+            store = self._buffers[(name, dtype)] = np.empty(size, dtype=dtype)
+        return store[:size].reshape(shape)
 
-    # 3. Binarización Adaptativa
-    final_processed_image = cv2.adaptiveThreshold(processed_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 11, 2)    
-    
+    def page_buffer(self, shape, avoid: np.ndarray = None, dtype=np.uint8) -> np.ndarray:
+        """
+        Buffer de página para la salida de una etapa: alterna entre dos buffers y usa el que
+        no comparte memoria con `avoid` (la entrada de la etapa), porque los warps no son in-place.
+        """
+        for name in ("page_a", "page_b"):
+            candidate = self.buffer(name, shape, dtype)
+            if avoid is None or not np.may_share_memory(candidate, avoid):
+                return candidate
+        raise RuntimeError("No hay buffer de página libre")
 
-    return final_processed_image
+    @property
+    def nbytes(self) -> int:
+        return sum(store.nbytes for store in self._buffers.values())
 
-def deskew_image(image: np.ndarray) -> np.ndarray:
-    # corrección de rotación
-    img = cv2.bitwise_not(image)
-    coords = np.column_stack(np.where(img > 0))
-    if len(coords) < 10:
-        return image  # No enough text to determine skew
+    def clear(self):
+        self._buffers.clear()
+
+# Un contexto por hilo (los hijos de Celery procesan una tarea a la vez por hilo)
+_thread_contexts = threading.local()
+
+def get_preprocessing_context() -> PreprocessingContext:
+    """Contexto de buffers del hilo actual (se crea en el primer uso)."""
+    context = getattr(_thread_contexts, "context", None)
+    if context is None:
+        context = _thread_contexts.context = PreprocessingContext()
+    return context
+
+def build_pyramid_level(image: np.ndarray, max_side: int = PREPROCESSING_ANALYSIS_MAX_SIDE,
+                        context: PreprocessingContext = None) -> np.ndarray:
+    """Reduce la imagen con pyrDown hasta que su lado mayor sea <= max_side."""
+    level = image
+    step = 0
+    while max(level.shape[:2]) > max_side:
+        shape = ((level.shape[0] + 1) // 2, (level.shape[1] + 1) // 2) + level.shape[2:]
+        dst = context.buffer(("pyramid_a", "pyramid_b")[step % 2], shape) if context is not None else None
+        level = cv2.pyrDown(level, dst=dst)
+        step += 1
+    return level
+
+def _foreground_extremes(image: np.ndarray, strip_height: int = SKEW_STRIP_HEIGHT):
+    """
+    Puntos (fila, columna) más a la izquierda y más a la derecha de cada fila con primer plano
+    (píxeles distintos de blanco) y la cantidad total de píxeles de primer plano.
+    Se recorre la imagen por franjas: la memoria es O(alto + franja * ancho), no O(píxeles de primer plano).
+    La envolvente convexa de estos puntos es la misma que la de todos los píxeles de primer plano.
+    """
+    (h, w) = image.shape[:2]
+    points = []
+    foreground_count = 0
+    for y0 in range(0, h, strip_height):
+        mask = image[y0:y0 + strip_height] < 255
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            continue
+        foreground_count += int(np.count_nonzero(mask))
+        mask = mask[rows]
+        left = mask.argmax(axis=1)
+        right = (w - 1) - mask[:, ::-1].argmax(axis=1)
+        rows = rows + y0
+        points.append(np.column_stack((rows, left)))
+        points.append(np.column_stack((rows, right)))
+    if not points:
+        return np.empty((0, 2), dtype=np.int32), 0
+    return np.concatenate(points).astype(np.int32), foreground_count
+
+def estimate_skew_angle(image: np.ndarray):
+    """
+    Ángulo (grados) que endereza el texto de la imagen, o None si no hay suficiente contenido.
+    El rectángulo mínimo se calcula sobre los extremos de cada fila, con memoria acotada.
+    """
+    coords, foreground_count = _foreground_extremes(image)
+    if foreground_count < 10:
+        return None  # No enough text to determine skew
     angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect retorna [-90, 0) en OpenCV < 4.5 y (0, 90] en versiones posteriores:
+    # se lleva a (-45, 45] para no rotar 90° una página derecha
     if angle < -45:
-        angle = -(90 + angle)
+        angle += 90
+    elif angle > 45:
+        angle -= 90
+    return -angle
+
+def _rotation_matrix(shape, angle: float) -> np.ndarray:
+    """Matriz 3x3 de rotación alrededor del centro de una imagen de tamaño `shape`."""
+    (h, w) = shape[:2]
+    center = (w // 2, h // 2)
+    return np.vstack([cv2.getRotationMatrix2D(center, angle, 1.0), [0, 0, 1]])
+
+def quarter_turn_transform(size, rotation: int) -> np.ndarray:
+    """
+    Matriz 3x3 que rota `rotation` grados en sentido horario (90, 180 o 270) una imagen de
+    tamaño (ancho, alto); equivalente exacta de cv2.rotate para componer con otras transformaciones.
+    """
+    (w, h) = size
+    if rotation == 90:
+        return np.array([[0, -1, h - 1], [1, 0, 0], [0, 0, 1]], dtype=np.float64)
+    if rotation == 180:
+        return np.array([[-1, 0, w - 1], [0, -1, h - 1], [0, 0, 1]], dtype=np.float64)
+    if rotation == 270:
+        return np.array([[0, 1, 0], [-1, 0, w - 1], [0, 0, 1]], dtype=np.float64)
+    raise ValueError(f"Rotación no soportada: {rotation}")
+
+# El aviso de OSD no disponible (sin binario de Tesseract o sin osd.traineddata) se emite una vez por proceso
+_osd_unavailable_logged = False
+_osd_log_lock = threading.Lock()
+
+def _log_osd_unavailable(error: Exception):
+    global _osd_unavailable_logged
+    with _osd_log_lock:
+        first = not _osd_unavailable_logged
+        _osd_unavailable_logged = True
+    if first:
+        logger.warning(f"OSD de Tesseract no disponible, la etapa '{STAGE_ORIENTATION}' no rota páginas: {error}")
     else:
-        angle = -angle
+        logger.debug(f"OSD de Tesseract no disponible: {error}")
+
+def detect_page_orientation(image: np.ndarray):
+    """
+    Orientación gruesa (0/90/180/270) de la página con el OSD de Tesseract, pensada para un
+    nivel reducido de la pirámide. Retorna {'rotation', 'confidence', ...} (rotation = grados
+    en sentido horario que la enderezan) o None si no hay texto suficiente o el OSD no está disponible.
+    """
+    try:
+        if is_tesseract_api_available():
+            return detect_orientation(image)
+        osd = pytesseract.image_to_osd(Image.fromarray(image), config='--psm 0',
+                                       output_type=pytesseract.Output.DICT)
+        return {'rotation': int(osd['rotate']) % 360, 'confidence': float(osd['orientation_conf']),
+                'script': osd.get('script')}
+    except pytesseract.TesseractError as e:
+        # Pocos caracteres para decidir: es normal en páginas casi vacías, la página sigue sin rotar
+        if "Too few characters" in str(e):
+            logger.debug(f"Texto insuficiente para detectar la orientación de la página: {e}")
+        else:
+            _log_osd_unavailable(e)
+        return None
+    except Exception as e:
+        _log_osd_unavailable(e)
+        return None
+
+def deskew_image(image: np.ndarray, context: PreprocessingContext = None) -> np.ndarray:
+    # corrección de rotación
+    angle = estimate_skew_angle(image)
+    if angle is None:
+        return image
     # Rotar la imagen para corregir la inclinación
     (h, w) = image.shape[:2]
-    center = (w // 2, h // 2)   
-    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-    rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    M = _rotation_matrix(image.shape, angle)[:2]
+    dst = context.page_buffer(image.shape, avoid=image) if context is not None else None
+    rotated = cv2.warpAffine(image, M, (w, h), dst=dst, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
     return rotated
-#
-def correct_perspective(image: np.ndarray) -> np.ndarray:
-    #corrección de perspectiva
+
+def estimate_page_quad(image: np.ndarray):
+    """
+    Cuadrilátero del documento (contorno externo más grande aproximado a 4 lados),
+    ordenado (superior-izq, superior-der, inferior-der, inferior-izq), o None si no hay uno.
+    """
     contours, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not contours:
-        return image
-    
+        return None
+
     largest_contour = max(contours, key=cv2.contourArea)
     # Aproxima el contorno a un polígono de 4 lados (esquina)
     perimeter = cv2.arcLength(largest_contour, True)
     approx = cv2.approxPolyDP(largest_contour, 0.02 * perimeter, True)
-    if len(approx) == 4:
-        # Reordena los puntos para que la transformación funcione
-        # (superior-izq, superior-der, inferior-der, inferior-izq)
-        points = approx.reshape(4, 2)
-        rect = np.zeros((4, 2), dtype="float32")
-        
-        s = points.sum(axis=1)
-        rect[0] = points[np.argmin(s)]
-        rect[2] = points[np.argmax(s)]
-        
-        diff = np.diff(points, axis=1)
-        rect[1] = points[np.argmin(diff)]
-        rect[3] = points[np.argmax(diff)]
-        
-        # Calcula las dimensiones del nuevo documento
-        (tl, tr, br, bl) = rect
-        widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
-        widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
-        maxWidth = max(int(widthA), int(widthB))
-        
-        heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
-        heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
-        maxHeight = max(int(heightA), int(heightB))
-        
-        # Define los puntos de destino para la transformación
-        dst = np.array([[0, 0], [maxWidth - 1, 0], [maxWidth - 1, maxHeight - 1], [0, maxHeight - 1]], dtype="float32")
-        
-        # Obtiene la matriz de transformación y aplica la corrección
-        M = cv2.getPerspectiveTransform(rect, dst)
-        image = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
-    return image 
\ No newline at end of file
+    if len(approx) != 4:
+        return None
+
+    # Reordena los puntos para que la transformación funcione
+    points = approx.reshape(4, 2)
+    rect = np.zeros((4, 2), dtype="float32")
+
+    s = points.sum(axis=1)
+    rect[0] = points[np.argmin(s)]
+    rect[2] = points[np.argmax(s)]
+
+    diff = np.diff(points, axis=1)
+    rect[1] = points[np.argmin(diff)]
+    rect[3] = points[np.argmax(diff)]
+    return rect
+
+def _perspective_from_quad(rect: np.ndarray):
+    """Matriz de perspectiva que lleva el cuadrilátero a un rectángulo y el tamaño (ancho, alto) de salida."""
+    # Calcula las dimensiones del nuevo documento
+    (tl, tr, br, bl) = rect
+    widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
+    widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
+    maxWidth = max(int(widthA), int(widthB))
+
+    heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
+    heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
+    maxHeight = max(int(heightA), int(heightB))
+
+    # Define los puntos de destino para la transformación
+    dst = np.array([[0, 0], [maxWidth - 1, 0], [maxWidth - 1, maxHeight - 1], [0, maxHeight - 1]], dtype="float32")
+    return cv2.getPerspectiveTransform(rect, dst), (maxWidth, maxHeight)
+
+def _quad_covers_image(rect: np.ndarray, shape) -> bool:
+    (h, w) = shape[:2]
+    corners = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype="float32")
+    return bool(np.all(np.abs(rect - corners) <= PAGE_QUAD_TOLERANCE * max(h, w)))
+
+def correct_perspective(image: np.ndarray, context: PreprocessingContext = None) -> np.ndarray:
+    #corrección de perspectiva
+    rect = estimate_page_quad(image)
+    if rect is None:
+        return image
+    # Obtiene la matriz de transformación y aplica la corrección
+    M, size = _perspective_from_quad(rect)
+    dst = context.page_buffer((size[1], size[0]) + image.shape[2:], avoid=image) if context is not None else None
+    return cv2.warpPerspective(image, M, size, dst=dst)
+
+def estimate_page_transform(image: np.ndarray, max_side: int = PREPROCESSING_ANALYSIS_MAX_SIDE):
+    """
+    Estima inclinación y cuadrilátero de la página sobre un nivel reducido de la pirámide
+    y retorna la transformación equivalente a resolución completa:
+    (matriz 3x3 o None si la página no necesita corrección, tamaño (ancho, alto) de salida).
+    """
+    state = PageState(image, max_side)
+    _stage_deskew(state)
+    _stage_perspective(state)
+    return state.pending_transform()
+
+def apply_page_transform(image: np.ndarray, transform, output_size, dst: np.ndarray = None) -> np.ndarray:
+    """
+    Aplica la transformación de `estimate_page_transform` con un único re-muestreo.
+    `dst` (opcional) recibe el resultado; no puede compartir memoria con `image`.
+    """
+    if transform is None:
+        return image
+    if np.allclose(transform[2], [0, 0, 1]):
+        return cv2.warpAffine(image, transform[:2], output_size, dst=dst, flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REPLICATE)
+    return cv2.warpPerspective(image, transform, output_size, dst=dst, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+# --- Pipeline de etapas configurable por tipo de documento ---
+
+STAGE_GRAYSCALE = "grayscale"
+STAGE_DENOISE = "denoise"
+STAGE_ORIENTATION = "orientation"
+STAGE_DESKEW = "deskew"
+STAGE_PERSPECTIVE = "perspective"
+STAGE_BINARIZE = "binarize"
+# Las etapas geométricas solo estiman; la transformación acumulada se aplica con un único warp
+# antes de la siguiente etapa no geométrica (o al final del pipeline)
+STAGE_WARP = "warp"
+GEOMETRY_STAGES = {STAGE_ORIENTATION, STAGE_DESKEW, STAGE_PERSPECTIVE}
+
+# STAGE_ORIENTATION no va por defecto (un OSD de Tesseract por página): se habilita por tipo con
+# PREPROCESSING_PIPELINE_BY_TYPE para los documentos que llegan rotados
+DEFAULT_PIPELINE = [STAGE_GRAYSCALE, STAGE_DENOISE, STAGE_DESKEW, STAGE_PERSPECTIVE, STAGE_BINARIZE]
+
+class PageState:
+    """Estado de una página a lo largo del pipeline: imagen actual y geometría pendiente de aplicar."""
+
+    def __init__(self, image: np.ndarray, max_side: int = PREPROCESSING_ANALYSIS_MAX_SIDE,
+                 context: PreprocessingContext = None):
+        self.image = image
+        self.max_side = max_side
+        self.context = context
+        self.level = None
+        self.transform = np.eye(3)
+        self.output_size = (image.shape[1], image.shape[0])
+
+    def analysis_level(self) -> np.ndarray:
+        """Nivel reducido de la pirámide donde se estima la geometría (se calcula una sola vez)."""
+        if self.level is None:
+            self.level = build_pyramid_level(self.image, self.max_side, self.context)
+        return self.level
+
+    def level_scale(self) -> np.ndarray:
+        # El nivel sigue a la geometría pendiente: se compara con el tamaño de salida, no con la imagen
+        (w, h) = self.output_size
+        (level_h, level_w) = self.analysis_level().shape[:2]
+        return np.array([w / level_w, h / level_h], dtype="float32")
+
+    def output_buffer(self, shape):
+        """Buffer del contexto para la salida de una etapa (None = que OpenCV asigne uno nuevo)."""
+        if self.context is None:
+            return None
+        return self.context.page_buffer(shape, avoid=self.image)
+
+    def pending_transform(self):
+        (h, w) = self.image.shape[:2]
+        if self.output_size == (w, h) and np.allclose(self.transform, np.eye(3)):
+            return None, self.output_size
+        return self.transform, self.output_size
+
+    def apply_pending_transform(self) -> bool:
+        transform, output_size = self.pending_transform()
+        if transform is not None:
+            dst = self.output_buffer((output_size[1], output_size[0]) + self.image.shape[2:])
+            self.image = apply_page_transform(self.image, transform, output_size, dst)
+        self.level = None
+        self.transform = np.eye(3)
+        self.output_size = (self.image.shape[1], self.image.shape[0])
+        return transform is not None
+
+def _stage_grayscale(state: PageState) -> dict:
+    if state.image.ndim == 2:
+        return {'applied': False, 'reason': 'already_gray'}
+    state.image = cv2.cvtColor(state.image, cv2.COLOR_BGR2GRAY, dst=state.output_buffer(state.image.shape[:2]))
+    return {'applied': True}
+
+def _stage_denoise(state: PageState) -> dict:
+    # Suavizado para reducir ruido (Filtro Gaussiano)
+    state.image = cv2.GaussianBlur(state.image, (5, 5), 0, dst=state.output_buffer(state.image.shape))
+    return {'applied': True}
+
+def _stage_orientation(state: PageState) -> dict:
+    level = state.analysis_level()
+    orientation = detect_page_orientation(level)
+    if orientation is None:
+        return {'applied': False, 'reason': 'not_detected'}
+    rotation = orientation['rotation']
+    details = {'rotation': rotation, 'confidence': orientation['confidence']}
+    if rotation not in QUARTER_TURN_ROTATIONS:
+        return {'applied': False, 'reason': 'upright', **details}
+    if orientation['confidence'] < ORIENTATION_MIN_CONFIDENCE:
+        return {'applied': False, 'reason': 'low_confidence', **details}
+
+    state.transform = quarter_turn_transform(state.output_size, rotation) @ state.transform
+    if rotation != 180:
+        state.output_size = (state.output_size[1], state.output_size[0])
+    # Las etapas siguientes estiman sobre el nivel ya rotado
+    state.level = cv2.rotate(level, QUARTER_TURN_ROTATIONS[rotation])
+    return {'applied': True, **details}
+
+def _stage_deskew(state: PageState) -> dict:
+    angle = estimate_skew_angle(state.analysis_level())
+    if angle is None:
+        return {'applied': False, 'reason': 'no_content'}
+    if abs(angle) < MIN_SKEW_ANGLE:
+        return {'applied': False, 'reason': 'straight', 'angle': angle}
+
+    (w, h) = state.output_size
+    state.transform = _rotation_matrix((h, w), angle) @ state.transform
+    # El cuadrilátero se busca sobre el nivel ya enderezado, igual que en la cadena original
+    level = state.analysis_level()
+    state.level = cv2.warpAffine(level, _rotation_matrix(level.shape, angle)[:2], (level.shape[1], level.shape[0]),
+                                 flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return {'applied': True, 'angle': angle}
+
+def _stage_perspective(state: PageState) -> dict:
+    level = state.analysis_level()
+    rect = estimate_page_quad(level)
+    if rect is None:
+        return {'applied': False, 'reason': 'no_quad'}
+    if _quad_covers_image(rect, level.shape):
+        return {'applied': False, 'reason': 'page_fills_image'}
+
+    perspective, state.output_size = _perspective_from_quad(rect * state.level_scale())
+    state.transform = perspective @ state.transform
+    return {'applied': True}
+
+def binarize_image(image: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+    # Binarización Adaptativa
+    return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                 BINARIZE_BLOCK_SIZE, BINARIZE_C, dst=dst)
+
+def _stage_binarize(state: PageState) -> dict:
+    state.image = binarize_image(state.image, dst=state.output_buffer(state.image.shape))
+    return {'applied': True}
+
+# Etapas disponibles: nombre -> función(PageState) que retorna {'applied': bool, ...}
+PREPROCESSING_STAGES = {
+    STAGE_GRAYSCALE: _stage_grayscale,
+    STAGE_DENOISE: _stage_denoise,
+    STAGE_ORIENTATION: _stage_orientation,
+    STAGE_DESKEW: _stage_deskew,
+    STAGE_PERSPECTIVE: _stage_perspective,
+    STAGE_BINARIZE: _stage_binarize,
+}
+
+# Pipeline por tipo de documento (se puede sobreescribir con PREPROCESSING_PIPELINE_BY_TYPE)
+PREPROCESSING_PIPELINES = {doc_type: DEFAULT_PIPELINE for doc_type in DocumentType}
+PREPROCESSING_PIPELINES.update({DocumentType(doc_type): stages
+                                for doc_type, stages in PREPROCESSING_PIPELINE_BY_TYPE.items()})
+
+def get_preprocessing_pipeline(document_type: DocumentType = None) -> list:
+    """Etapas a aplicar para un tipo de documento (DEFAULT_PIPELINE si no hay configuración)."""
+    return PREPROCESSING_PIPELINES.get(document_type, DEFAULT_PIPELINE)
+
+def run_preprocessing_pipeline(np_image: np.ndarray, stages: list, metadata: dict = None,
+                               context: PreprocessingContext = None) -> np.ndarray:
+    """
+    Ejecuta `stages` en orden sobre la imagen. Las etapas geométricas se acumulan y se
+    aplican con un único warp. Si se pasa `metadata` (dict), se completa con las etapas
+    ejecutadas, si se aplicaron o se omitieron y su tiempo.
+    Con `context` las etapas escriben en sus buffers (ver PreprocessingContext).
+    """
+    unknown = [stage for stage in stages if stage not in PREPROCESSING_STAGES]
+    if unknown:
+        raise ValueError(f"Etapas de preprocesamiento desconocidas: {unknown}")
+
+    state = PageState(np_image, context=context)
+    stage_log = []
+    pipeline_start = time.perf_counter()
+
+    def flush_geometry():
+        start = time.perf_counter()
+        applied = state.apply_pending_transform()
+        if applied:
+            stage_log.append({'stage': STAGE_WARP, 'applied': True, 'ms': (time.perf_counter() - start) * 1000})
+
+    for stage in stages:
+        if stage not in GEOMETRY_STAGES:
+            flush_geometry()
+        start = time.perf_counter()
+        details = PREPROCESSING_STAGES[stage](state)
+        stage_log.append({'stage': stage, **details, 'ms': (time.perf_counter() - start) * 1000})
+    flush_geometry()
+
+    if metadata is not None:
+        metadata['preprocessing'] = {
+            'pipeline': list(stages),
+            'stages': stage_log,
+            'total_ms': (time.perf_counter() - pipeline_start) * 1000,
+        }
+    return state.image
+
+def preprocess_image_for_ocr(np_image: np.ndarray, document_type: DocumentType = None, metadata: dict = None,
+                             stages: list = None, context: PreprocessingContext = None) -> np.ndarray:
+    """
+    Realiza un preprocesamiento básico en una imagen para mejorar la precisión del OCR.
+    Acepta una imagen OpenCV (np.ndarray) y retorna una imagen preprocesada.
+    Las etapas dependen del tipo de documento (PREPROCESSING_PIPELINES) o de `stages`;
+    orientación (0/90/180/270), deskew y perspectiva se estiman sobre un nivel reducido de la pirámide, se omiten si la
+    página no las necesita y se aplican con un único warp a resolución completa.
+    Si se pasa `metadata` (dict), se registran las etapas aplicadas y sus tiempos.
+    Con `context` (ej. get_preprocessing_context()) no se asignan páginas intermedias nuevas y
+    el resultado es una vista de los buffers del contexto.
+    """
+    if np_image is None:
+        raise ValueError("Input image is None.")
+    if stages is None:
+        stages = get_preprocessing_pipeline(document_type)
+    return run_preprocessing_pipeline(np_image, stages, metadata, context)
+
+
+# --- Doble resolución: detección sobre la página reducida, OCR sobre recortes a resolución completa ---
+
+@dataclass
+class PreparedPage:
+    """
+    Página alineada lista para el pipeline de doble resolución:
+    - detection_image: página reducida (BGR, lado mayor <= YOLO_DETECTION_MAX_SIDE) para YOLO
+    - ocr_image: página alineada a resolución completa, en gris y sin binarizar
+    - binarize: si los recortes deben binarizarse antes del OCR (la etapa estaba en el pipeline)
+    - barcode_fields: campos leídos del código del documento sobre la imagen decodificada, antes
+      del preprocesamiento (None si no se buscó)
+    """
+    detection_image: np.ndarray
+    ocr_image: np.ndarray
+    binarize: bool = True
+    barcode_fields: dict = None
+
+def prepare_page_for_detection(np_image: np.ndarray, document_type: DocumentType = None, metadata: dict = None,
+                               stages: list = None, detection_max_side: int = YOLO_DETECTION_MAX_SIDE,
+                               context: PreprocessingContext = None) -> PreparedPage:
+    """
+    Ejecuta el pipeline del tipo de documento sin la binarización y retorna la página alineada
+    a resolución completa junto con una copia reducida para YOLO. La binarización se hace
+    después, solo sobre los recortes que se van a reconocer (ver binarize_region).
+    Con `context` ambas imágenes son vistas de los buffers del contexto.
+    """
+    if np_image is None:
+        raise ValueError("Input image is None.")
+    if stages is None:
+        stages = get_preprocessing_pipeline(document_type)
+
+    aligned = run_preprocessing_pipeline(np_image, [stage for stage in stages if stage != STAGE_BINARIZE], metadata,
+                                         context)
+
+    (h, w) = aligned.shape[:2]
+    factor = min(1.0, detection_max_side / max(h, w))
+    detection_image = aligned
+    if factor < 1.0:
+        # INTER_AREA promedia los píxeles: evita el aliasing del texto fino al reducir mucho
+        size = (max(1, int(round(w * factor))), max(1, int(round(h * factor))))
+        dst = context.buffer("detection", (size[1], size[0]) + aligned.shape[2:]) if context is not None else None
+        detection_image = cv2.resize(aligned, size, dst=dst, interpolation=cv2.INTER_AREA)
+    if detection_image.ndim == 2:
+        dst = context.buffer("detection_bgr", detection_image.shape + (3,)) if context is not None else None
+        detection_image = cv2.cvtColor(detection_image, cv2.COLOR_GRAY2BGR, dst=dst)
+
+    return PreparedPage(detection_image=detection_image, ocr_image=aligned, binarize=STAGE_BINARIZE in stages)
+
+def binarize_region(image: np.ndarray, bbox) -> np.ndarray:
+    """
+    Binariza solo la región [x1, y1, x2, y2] de la página. Se toma un margen de contexto de media
+    ventana para que el resultado sea idéntico al de binarizar la página completa.
+    """
+    x1, y1, x2, y2 = bbox
+    (h, w) = image.shape[:2]
+    margin = BINARIZE_BLOCK_SIZE // 2
+    cx1, cy1 = max(0, x1 - margin), max(0, y1 - margin)
+    cx2, cy2 = min(w, x2 + margin), min(h, y2 + margin)
+    region = image[cy1:cy2, cx1:cx2]
+    if region.ndim == 3:
+        region = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    binarized = binarize_image(region)
+    return binarized[y1 - cy1:y2 - cy1, x1 - cx1:x2 - cx1]
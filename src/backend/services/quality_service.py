@@ -0,0 +1,152 @@
+# ocr_api/services/quality_service.py
+
+import time
+import logging
+
+import cv2
+import numpy as np
+
+from config import (QUALITY_GATE_MODE, QUALITY_THUMBNAIL_SIDE, QUALITY_MIN_SHARPNESS, QUALITY_MIN_DPI,
+                    QUALITY_MIN_CONTRAST, QUALITY_MIN_PAGE_COVERAGE)
+from models.enums import DocumentType
+
+logger = logging.getLogger(__name__)
+
+# Modos del control de calidad
+QUALITY_GATE_OFF = "off"        # no se evalúa
+QUALITY_GATE_FLAG = "flag"      # se evalúa y se informa, el documento sigue el pipeline
+QUALITY_GATE_REJECT = "reject"  # los documentos que van a fallar se rechazan antes del pipeline
+
+QUALITY_OK = "ok"
+QUALITY_WARNING = "warning"
+QUALITY_FAIL = "fail"
+
+# Lado mayor físico del documento (pulgadas) para estimar la resolución efectiva
+DNI_LONG_SIDE_INCHES = 3.37   # ID-1 (85,6 mm)
+A4_LONG_SIDE_INCHES = 11.69
+DOCUMENT_LONG_SIDE_INCHES = {
+    DocumentType.DNI_FRONT: DNI_LONG_SIDE_INCHES,
+    DocumentType.DNI_BACK: DNI_LONG_SIDE_INCHES,
+    DocumentType.INVOICE_A: A4_LONG_SIDE_INCHES,
+    DocumentType.INVOICE_B: A4_LONG_SIDE_INCHES,
+    DocumentType.INVOICE_C: A4_LONG_SIDE_INCHES,
+}
+
+# Fracciones de píxeles casi negros / casi blancos a partir de las cuales la imagen está sub/sobreexpuesta
+MAX_DARK_FRACTION = 0.8
+MAX_CLIPPED_FRACTION = 0.98
+
+
+class ImageQualityError(ValueError):
+    """La imagen no alcanza la calidad mínima para el OCR; el mensaje describe los problemas."""
+
+
+def _grade(value: float, minimum: float) -> str:
+    # Por debajo del mínimo falla; hasta 1,5 veces el mínimo es dudosa
+    if value < minimum:
+        return QUALITY_FAIL
+    if value < minimum * 1.5:
+        return QUALITY_WARNING
+    return QUALITY_OK
+
+
+def _page_region(gray_thumbnail: np.ndarray):
+    """Región del documento en la miniatura (zona clara más grande tras Otsu): (fracción del área, bbox)."""
+    _, mask = cv2.threshold(gray_thumbnail, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return 0.0, None
+    largest = max(contours, key=cv2.contourArea)
+    area = gray_thumbnail.shape[0] * gray_thumbnail.shape[1]
+    return cv2.contourArea(largest) / area, cv2.boundingRect(largest)
+
+
+def assess_image_quality(np_image: np.ndarray, document_type: DocumentType = None,
+                         thumbnail_side: int = QUALITY_THUMBNAIL_SIDE) -> dict:
+    """
+    Evalúa sobre una miniatura si la imagen puede dar un OCR útil:
+    nitidez (varianza del Laplaciano), resolución efectiva del documento (DPI), exposición
+    (contraste y píxeles recortados) y fracción del cuadro que ocupa la página.
+    Retorna {'verdict', 'metrics', 'issues', 'ms'}; verdict es "ok", "warning" o "fail".
+    """
+    start = time.perf_counter()
+    h, w = np_image.shape[:2]
+    gray = cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY) if np_image.ndim == 3 else np_image
+    scale = min(1.0, thumbnail_side / max(h, w))
+    thumbnail = gray if scale == 1.0 else cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                                      interpolation=cv2.INTER_AREA)
+
+    sharpness = float(cv2.Laplacian(thumbnail, cv2.CV_64F).var())
+    contrast = float(thumbnail.std())
+    dark_fraction = float(np.count_nonzero(thumbnail <= 10)) / thumbnail.size
+    clipped_fraction = float(np.count_nonzero(thumbnail >= 250)) / thumbnail.size
+    coverage, page_bbox = _page_region(thumbnail)
+
+    # Resolución efectiva: lado mayor de la página (a resolución completa) sobre su tamaño físico
+    page_long_side = max(page_bbox[2], page_bbox[3]) / scale if page_bbox else max(h, w)
+    effective_dpi = page_long_side / DOCUMENT_LONG_SIDE_INCHES.get(document_type, A4_LONG_SIDE_INCHES)
+
+    checks = {
+        'sharpness': _grade(sharpness, QUALITY_MIN_SHARPNESS),
+        'resolution': _grade(effective_dpi, QUALITY_MIN_DPI),
+        'contrast': _grade(contrast, QUALITY_MIN_CONTRAST),
+        'page_coverage': _grade(coverage, QUALITY_MIN_PAGE_COVERAGE),
+        'exposure': QUALITY_FAIL if dark_fraction > MAX_DARK_FRACTION or clipped_fraction > MAX_CLIPPED_FRACTION
+                    else QUALITY_OK,
+    }
+    messages = {
+        'sharpness': f"imagen borrosa (nitidez {sharpness:.0f}, mínimo {QUALITY_MIN_SHARPNESS})",
+        'resolution': f"resolución insuficiente (~{effective_dpi:.0f} DPI, mínimo {QUALITY_MIN_DPI})",
+        'contrast': f"contraste insuficiente ({contrast:.0f}, mínimo {QUALITY_MIN_CONTRAST})",
+        'page_coverage': f"el documento ocupa poco del cuadro ({coverage:.0%}, mínimo {QUALITY_MIN_PAGE_COVERAGE:.0%})",
+        'exposure': (f"imagen subexpuesta ({dark_fraction:.0%} negro)" if dark_fraction > MAX_DARK_FRACTION
+                     else f"imagen sobreexpuesta ({clipped_fraction:.0%} blanco)"),
+    }
+    issues = [{'check': name, 'status': status, 'message': messages[name]}
+              for name, status in checks.items() if status != QUALITY_OK]
+
+    if any(issue['status'] == QUALITY_FAIL for issue in issues):
+        verdict = QUALITY_FAIL
+    elif issues:
+        verdict = QUALITY_WARNING
+    else:
+        verdict = QUALITY_OK
+
+    return {
+        'verdict': verdict,
+        'metrics': {
+            'sharpness': sharpness,
+            'effective_dpi': effective_dpi,
+            'contrast': contrast,
+            'dark_fraction': dark_fraction,
+            'clipped_fraction': clipped_fraction,
+            'page_coverage': coverage,
+        },
+        'issues': issues,
+        'ms': (time.perf_counter() - start) * 1000,
+    }
+
+
+def format_quality_issues(assessment: dict) -> str:
+    """Mensaje legible con los problemas de calidad (para processing_error)."""
+    return "; ".join(issue['message'] for issue in assessment['issues'])
+
+
+def check_image_quality(np_image: np.ndarray, document_type: DocumentType = None, metadata: dict = None,
+                        mode: str = QUALITY_GATE_MODE):
+    """
+    Control de calidad previo al pipeline. Registra la evaluación en metadata['quality'] y,
+    en modo "reject", lanza ImageQualityError si el documento no puede dar un OCR útil.
+    """
+    if mode == QUALITY_GATE_OFF:
+        return None
+
+    assessment = assess_image_quality(np_image, document_type)
+    if metadata is not None:
+        metadata['quality'] = assessment
+    if assessment['issues']:
+        logger.info(f"Control de calidad ({assessment['verdict']}): {format_quality_issues(assessment)}")
+
+    if mode == QUALITY_GATE_REJECT and assessment['verdict'] == QUALITY_FAIL:
+        raise ImageQualityError(f"Calidad de imagen insuficiente para OCR: {format_quality_issues(assessment)}")
+    return assessment
@@ -0,0 +1,285 @@
+# ocr_api/services/template_service.py
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from models.enums import DocumentType
+from config import (TEMPLATE_ALIGNMENT_ENABLED, DOCUMENT_TEMPLATES_PATH, TEMPLATE_ALIGNMENT_MAX_SIDE,
+                    TEMPLATE_MIN_INLIERS, TEMPLATE_MIN_INLIER_RATIO)
+
+logger = logging.getLogger(__name__)
+
+# Tarjeta ID-1 (DNI tarjeta): 85,6 x 54 mm
+ID1_CARD_SIZE_MM = (85.6, 54.0)
+
+# Parámetros de ORB y del emparejamiento (test de razón de Lowe) para alinear con la plantilla
+ORB_PAGE_FEATURES = 2000
+ORB_TEMPLATE_FEATURES = 1500
+MATCH_RATIO = 0.75
+RANSAC_REPROJECTION_PX = 4.0
+# La tarjeta proyectada debe ocupar al menos esta fracción de la imagen
+MIN_CARD_COVERAGE = 0.15
+
+
+@dataclass(frozen=True)
+class DocumentTemplate:
+    """
+    Diseño canónico de un documento de formato fijo. `reference` es la imagen del ejemplar de
+    referencia (en DOCUMENT_TEMPLATES_PATH) recortada justo al borde de la tarjeta; `fields` son
+    los rectángulos (x, y, ancho, alto) en mm de cada clase de YOLO y `excluded` las zonas
+    variables (foto, MRZ) que, como los campos, no aportan puntos para la alineación.
+    """
+    name: str
+    reference: str
+    size_mm: tuple
+    fields: dict
+    excluded: tuple = ()
+
+
+@dataclass
+class TemplateAlignment:
+    """Resultado de alinear una página con una plantilla; `homography` lleva mm de la plantilla a px de la página."""
+    template: DocumentTemplate
+    accepted: bool
+    reason: str = ""
+    matches: int = 0
+    inliers: int = 0
+    homography: Optional[np.ndarray] = None
+    px_per_mm: float = 0.0
+
+    @property
+    def inlier_ratio(self) -> float:
+        return self.inliers / self.matches if self.matches else 0.0
+
+
+# Coordenadas aproximadas en mm del diseño del DNI tarjeta (2012+), sin validar contra una imagen de
+# referencia real (no se incluyen en el repositorio): hay que revisarlas al agregar dni_front.png /
+# dni_back.png y antes de habilitar TEMPLATE_ALIGNMENT_ENABLED
+DNI_FRONT_TEMPLATE = DocumentTemplate(
+    name="dni_front",
+    reference="dni_front.png",
+    size_mm=ID1_CARD_SIZE_MM,
+    fields={
+        'dni_apellido': (30.0, 13.5, 42.0, 4.5),
+        'dni_nombre': (30.0, 19.5, 42.0, 4.5),
+        'dni_sexo': (30.0, 25.5, 8.0, 4.0),
+        'dni_fecha_nacimiento': (30.0, 31.0, 24.0, 4.0),
+        'dni_fecha_emision': (30.0, 36.5, 24.0, 4.0),
+        'dni_fecha_vencimiento': (30.0, 42.0, 24.0, 4.0),
+        'dni_numero': (4.0, 46.0, 26.0, 5.5),
+    },
+    excluded=((3.0, 11.0, 25.0, 34.0),),  # foto
+)
+
+DNI_BACK_TEMPLATE = DocumentTemplate(
+    name="dni_back",
+    reference="dni_back.png",
+    size_mm=ID1_CARD_SIZE_MM,
+    fields={
+        'dni_domicilio': (3.0, 3.0, 62.0, 8.0),
+        'dni_lugar_nacimiento': (3.0, 11.5, 50.0, 4.5),
+    },
+    excluded=((66.0, 2.0, 18.0, 22.0), (2.0, 36.0, 81.6, 16.0)),  # huella y MRZ
+)
+
+TEMPLATE_REGISTRY = {
+    DocumentType.DNI_FRONT: DNI_FRONT_TEMPLATE,
+    DocumentType.DNI_BACK: DNI_BACK_TEMPLATE,
+}
+
+# Puntos y descriptores ORB de cada plantilla, calculados una vez por proceso
+_template_features = {}
+_template_features_lock = threading.Lock()
+# Plantillas cuya referencia falta o no sirve: el error también se recuerda por proceso, para no
+# releer el disco ni repetir el aviso en cada documento
+_template_errors = {}
+
+
+def _to_gray(np_image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY) if np_image.ndim == 3 else np_image
+
+
+def _downscale(np_image: np.ndarray, max_side: int) -> np.ndarray:
+    scale = min(1.0, max_side / max(np_image.shape[:2]))
+    if scale == 1.0:
+        return np_image
+    size = (max(1, int(round(np_image.shape[1] * scale))), max(1, int(round(np_image.shape[0] * scale))))
+    return cv2.resize(np_image, size, interpolation=cv2.INTER_AREA)
+
+
+def _mm_rect_to_px(rect, px_per_mm_x: float, px_per_mm_y: float):
+    x, y, w, h = rect
+    return (int(x * px_per_mm_x), int(y * px_per_mm_y),
+            int(np.ceil((x + w) * px_per_mm_x)), int(np.ceil((y + h) * px_per_mm_y)))
+
+
+def load_template_features(template: DocumentTemplate, templates_path: str = DOCUMENT_TEMPLATES_PATH,
+                           max_side: int = TEMPLATE_ALIGNMENT_MAX_SIDE):
+    """
+    Puntos ORB de la imagen de referencia reducida a `max_side`, sin los campos ni las zonas
+    excluidas. Retorna (keypoints, descriptores, px por mm en x, px por mm en y).
+    Lanza FileNotFoundError si la imagen de referencia no existe (se avisa una sola vez por proceso).
+    """
+    path = os.path.join(templates_path, template.reference)
+    key = (path, max_side)
+    with _template_features_lock:
+        if key in _template_errors:
+            error = _template_errors[key]
+            raise type(error)(*error.args)
+        if key not in _template_features:
+            try:
+                _template_features[key] = _compute_template_features(template, path, max_side)
+            except (FileNotFoundError, ValueError) as e:
+                _template_errors[key] = e
+                logger.warning(f"Plantilla '{template.name}' deshabilitada en este proceso, se usa YOLO: {e}")
+                raise
+            logger.info(f"Plantilla '{template.name}' cargada ({len(_template_features[key][0])} puntos)")
+    return _template_features[key]
+
+
+def _compute_template_features(template: DocumentTemplate, path: str, max_side: int):
+    reference = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if reference is None:
+        raise FileNotFoundError(f"Imagen de referencia de la plantilla '{template.name}' no encontrada: {path}")
+    reference = _downscale(reference, max_side)
+    px_per_mm_x = reference.shape[1] / template.size_mm[0]
+    px_per_mm_y = reference.shape[0] / template.size_mm[1]
+
+    mask = np.full(reference.shape, 255, dtype=np.uint8)
+    for rect in (*template.fields.values(), *template.excluded):
+        x1, y1, x2, y2 = _mm_rect_to_px(rect, px_per_mm_x, px_per_mm_y)
+        mask[y1:y2, x1:x2] = 0
+    keypoints, descriptors = cv2.ORB_create(ORB_TEMPLATE_FEATURES).detectAndCompute(reference, mask)
+    if descriptors is None:
+        raise ValueError(f"La referencia de la plantilla '{template.name}' no tiene puntos característicos")
+    points = np.float32([keypoint.pt for keypoint in keypoints])
+    return points, descriptors, px_per_mm_x, px_per_mm_y
+
+
+def _reject(alignment: TemplateAlignment, reason: str) -> TemplateAlignment:
+    alignment.accepted = False
+    alignment.reason = reason
+    return alignment
+
+
+def align_to_template(np_image: np.ndarray, template: DocumentTemplate, templates_path: str = DOCUMENT_TEMPLATES_PATH,
+                      max_side: int = TEMPLATE_ALIGNMENT_MAX_SIDE, min_inliers: int = TEMPLATE_MIN_INLIERS,
+                      min_inlier_ratio: float = TEMPLATE_MIN_INLIER_RATIO) -> TemplateAlignment:
+    """
+    Alinea la página con la plantilla: ORB + test de razón sobre la página reducida a `max_side`
+    (la misma escala que la referencia) y homografía por RANSAC. La alineación se acepta con al
+    menos `min_inliers` coincidencias consistentes, una fracción de inliers >= `min_inlier_ratio`
+    y una tarjeta proyectada convexa y de tamaño razonable. La homografía resultante va de mm de
+    la plantilla a px de `np_image`.
+    """
+    template_points, template_descriptors, px_per_mm_x, px_per_mm_y = load_template_features(
+        template, templates_path, max_side)
+    alignment = TemplateAlignment(template=template, accepted=False)
+
+    small = _to_gray(_downscale(np_image, max_side))
+    page_keypoints, page_descriptors = cv2.ORB_create(ORB_PAGE_FEATURES).detectAndCompute(small, None)
+    if page_descriptors is None or len(page_keypoints) < min_inliers:
+        return _reject(alignment, "la página no tiene suficientes puntos característicos")
+
+    pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(template_descriptors, page_descriptors, k=2)
+    good = [pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < MATCH_RATIO * pair[1].distance]
+    alignment.matches = len(good)
+    if len(good) < min_inliers:
+        return _reject(alignment, f"{len(good)} coincidencias < {min_inliers}")
+
+    source = template_points[[match.queryIdx for match in good]].reshape(-1, 1, 2)
+    target = np.float32([page_keypoints[match.trainIdx].pt for match in good]).reshape(-1, 1, 2)
+    homography, inlier_mask = cv2.findHomography(source, target, cv2.RANSAC, RANSAC_REPROJECTION_PX)
+    if homography is None:
+        return _reject(alignment, "no se pudo estimar la homografía")
+    alignment.inliers = int(inlier_mask.sum())
+    if alignment.inliers < min_inliers or alignment.inlier_ratio < min_inlier_ratio:
+        return _reject(alignment, f"{alignment.inliers} inliers de {alignment.matches} coincidencias")
+
+    # mm de la plantilla -> px de la referencia reducida -> px de la página reducida -> px de la página
+    to_reference = np.diag([px_per_mm_x, px_per_mm_y, 1.0])
+    to_page = np.diag([np_image.shape[1] / small.shape[1], np_image.shape[0] / small.shape[0], 1.0])
+    homography = to_page @ homography @ to_reference
+
+    width_mm, height_mm = template.size_mm
+    corners = cv2.perspectiveTransform(
+        np.float32([[0, 0], [width_mm, 0], [width_mm, height_mm], [0, height_mm]]).reshape(-1, 1, 2), homography)
+    if not cv2.isContourConvex(corners.astype(np.float32)):
+        return _reject(alignment, "la tarjeta proyectada no es convexa")
+    coverage = cv2.contourArea(corners) / (np_image.shape[0] * np_image.shape[1])
+    if coverage < MIN_CARD_COVERAGE:
+        return _reject(alignment, f"la tarjeta proyectada ocupa {coverage:.0%} de la imagen")
+
+    corners = corners.reshape(-1, 2)
+    card_width_px = (np.linalg.norm(corners[1] - corners[0]) + np.linalg.norm(corners[2] - corners[3])) / 2
+    alignment.homography = homography
+    alignment.px_per_mm = card_width_px / width_mm
+    alignment.accepted = True
+    return alignment
+
+
+def template_field_bbox(alignment: TemplateAlignment, field_name: str, page_shape) -> list:
+    """Caja [x1, y1, x2, y2] en px de la página que contiene el rectángulo del campo proyectado."""
+    x, y, w, h = alignment.template.fields[field_name]
+    corners = cv2.perspectiveTransform(
+        np.float32([[x, y], [x + w, y], [x + w, y + h], [x, y + h]]).reshape(-1, 1, 2), alignment.homography)
+    x1, y1 = corners.reshape(-1, 2).min(axis=0)
+    x2, y2 = corners.reshape(-1, 2).max(axis=0)
+    height, width = page_shape[:2]
+    return [max(0, int(x1)), max(0, int(y1)), min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2)))]
+
+
+def warp_template_field(np_image: np.ndarray, alignment: TemplateAlignment, field_name: str) -> np.ndarray:
+    """
+    Recorte rectificado del campo: se muestrea solo la región del campo (no la página entera)
+    a la resolución nativa de la tarjeta en la foto, corrigiendo la perspectiva residual.
+    """
+    x, y, w, h = alignment.template.fields[field_name]
+    scale = alignment.px_per_mm
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    # px del recorte -> mm de la plantilla -> px de la página
+    crop_to_page = alignment.homography @ np.array([[1 / scale, 0, x], [0, 1 / scale, y], [0, 0, 1]])
+    return cv2.warpPerspective(np_image, crop_to_page, size, flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+def align_document_template(np_image: np.ndarray, document_type: DocumentType, metadata: dict = None,
+                            enabled: bool = TEMPLATE_ALIGNMENT_ENABLED) -> Optional[TemplateAlignment]:
+    """
+    Camino rápido sin modelo para documentos de diseño fijo: si el tipo tiene plantilla
+    (TEMPLATE_REGISTRY) y la página se alinea con calidad suficiente, retorna la alineación para
+    recortar los campos en sus coordenadas conocidas. Retorna None (y se usa YOLO) si no hay
+    plantilla, falta la imagen de referencia o la alineación no alcanza los umbrales.
+    """
+    template = TEMPLATE_REGISTRY.get(document_type)
+    if not enabled or template is None:
+        return None
+
+    start = time.perf_counter()
+    try:
+        alignment = align_to_template(np_image, template)
+    except (FileNotFoundError, ValueError) as e:
+        # Ya se avisó al fallar la carga (load_template_features)
+        logger.debug(f"Plantilla no disponible: {e}")
+        return None
+    except cv2.error as e:
+        logger.warning(f"Error al alinear con la plantilla '{template.name}': {e}")
+        return None
+
+    if metadata is not None:
+        metadata['template'] = {'name': template.name, 'accepted': alignment.accepted, 'matches': alignment.matches,
+                                'inliers': alignment.inliers, 'inlier_ratio': round(alignment.inlier_ratio, 3),
+                                'ms': (time.perf_counter() - start) * 1000}
+        if not alignment.accepted:
+            metadata['template']['reason'] = alignment.reason
+    if not alignment.accepted:
+        logger.info(f"Plantilla '{template.name}' descartada: {alignment.reason}; se usa YOLO")
+        return None
+    return alignment
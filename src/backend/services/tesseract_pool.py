@@ -0,0 +1,153 @@
+# ocr_api/services/tesseract_pool.py
+
+import logging
+import threading
+import numpy as np
+
+from config import TESSERACT_ENGINE, TESSERACT_PRELOAD_LANGS, TESSDATA_PATH
+
+logger = logging.getLogger(__name__)
+
+# tesserocr es opcional: envuelve la API C++ de Tesseract en el mismo proceso.
+# Si no está instalado se sigue usando pytesseract (un proceso `tesseract` por llamada).
+try:
+    import tesserocr
+except ImportError:  # pragma: no cover - depende del entorno
+    tesserocr = None
+
+# Un handle por hilo: TessBaseAPI no es thread-safe, pero cada hilo puede tener el suyo.
+_thread_local = threading.local()
+
+
+def is_tesseract_api_available() -> bool:
+    """Indica si se debe usar la API en proceso (tesserocr) en lugar de pytesseract."""
+    if TESSERACT_ENGINE == "cli":
+        return False
+    if tesserocr is None:
+        if TESSERACT_ENGINE == "api":
+            raise RuntimeError("TESSERACT_ENGINE=api pero tesserocr no está instalado")
+        return False
+    return True
+
+
+def get_tesseract_api(lang: str = 'spa'):
+    """
+    Retorna el handle TessBaseAPI del hilo actual para `lang`, creándolo si no existe.
+    El traineddata se carga una sola vez por hilo y por idioma.
+    """
+    handles = getattr(_thread_local, "handles", None)
+    if handles is None:
+        handles = _thread_local.handles = {}
+
+    api = handles.get(lang)
+    if api is None:
+        kwargs = {"lang": lang, "oem": tesserocr.OEM.DEFAULT}
+        if TESSDATA_PATH:
+            kwargs["path"] = TESSDATA_PATH
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        handles[lang] = api
+        logger.info(f"Handle Tesseract creado (lang={lang}, hilo={threading.current_thread().name})")
+    return api
+
+
+def warmup_tesseract_pool(langs=None):
+    """
+    Crea por adelantado los handles del hilo actual.
+    Se llama al iniciar cada proceso worker para no pagar la carga del traineddata en la primera tarea.
+    """
+    if not is_tesseract_api_available():
+        return
+    for lang in (langs or TESSERACT_PRELOAD_LANGS):
+        get_tesseract_api(lang)
+
+
+def close_tesseract_pool():
+    """Libera los handles del hilo actual."""
+    handles = getattr(_thread_local, "handles", None)
+    if not handles:
+        return
+    for api in handles.values():
+        api.End()
+    handles.clear()
+
+
+def _set_image(api, image: np.ndarray, psm: int):
+    """Carga un array de NumPy (uint8, gris o BGR) en el handle sin copias intermedias a PIL."""
+    if image.ndim == 3:
+        # Tesseract espera RGB; los arrays de OpenCV vienen en BGR
+        image = image[:, :, ::-1]
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+
+    height, width = image.shape[:2]
+    bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+
+    api.SetPageSegMode(psm)
+    api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, image.strides[0])
+
+
+def recognize_array(image: np.ndarray, lang: str = 'spa', psm: int = 7, whitelist: str = None) -> str:
+    """
+    Reconoce texto en un array de NumPy (uint8, gris o BGR) usando el handle del hilo.
+    Los bytes se pasan directamente a Tesseract: sin PIL ni archivos temporales.
+    `whitelist` restringe los caracteres reconocibles (ej. solo dígitos).
+    """
+    api = get_tesseract_api(lang)
+    _set_image(api, image, psm)
+    if whitelist:
+        api.SetVariable("tessedit_char_whitelist", whitelist)
+    try:
+        return api.GetUTF8Text()
+    finally:
+        # Libera la imagen y los resultados, conservando el modelo cargado;
+        # el handle se reutiliza para otros campos, así que se quita la whitelist
+        if whitelist:
+            api.SetVariable("tessedit_char_whitelist", "")
+        api.Clear()
+
+
+def recognize_words(image: np.ndarray, lang: str = 'spa', psm: int = 3) -> list:
+    """
+    Reconoce la imagen completa y retorna las palabras en orden de lectura,
+    cada una como {'text', 'confidence', 'bbox': [x1, y1, x2, y2]}.
+    """
+    api = get_tesseract_api(lang)
+    _set_image(api, image, psm)
+    words = []
+    try:
+        api.Recognize()
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(api.GetIterator(), level):
+            text = word.GetUTF8Text(level)
+            if not text or not text.strip():
+                continue
+            x1, y1, x2, y2 = word.BoundingBox(level)
+            words.append({
+                'text': text.strip(),
+                'confidence': word.Confidence(level) / 100.0,
+                'bbox': [x1, y1, x2, y2]
+            })
+    finally:
+        api.Clear()
+    return words
+
+
+def detect_orientation(image: np.ndarray):
+    """
+    Orientación de la página con el OSD de Tesseract (requiere osd.traineddata).
+    Retorna {'rotation': grados en sentido horario que la enderezan (0, 90, 180, 270),
+    'confidence', 'script'} o None si no hay texto suficiente para decidir.
+    """
+    api = get_tesseract_api('osd')
+    _set_image(api, image, tesserocr.PSM.OSD_ONLY)
+    try:
+        result = api.DetectOrientationScript()
+    finally:
+        api.Clear()
+    if not result:
+        return None
+    # orient_deg es la orientación del texto en sentido antihorario; se corrige rotando lo mismo en sentido horario
+    return {
+        'rotation': (360 - int(result['orient_deg'])) % 360,
+        'confidence': float(result['orient_conf']),
+        'script': result.get('script_name'),
+    }
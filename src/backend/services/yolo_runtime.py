@@ -0,0 +1,238 @@
+# ocr_api/services/yolo_runtime.py
+#
+# Backends de inferencia YOLOv8 para CPU sin PyTorch (ONNX Runtime y OpenVINO).
+# Los modelos se exportan desde los `.pt` con scripts/export_yolo_models.py y se
+# cargan a través de services/model_loader.py. El resultado imita la parte de
+# `ultralytics.engine.results.Results` que usa perform_yolo_ocr: `r.boxes` iterable
+# con `box.xyxy[0]`, `box.conf[0]`, `box.cls[0]` y `r.names`.
+
+import os
+import ast
+import cv2
+import yaml
+import numpy as np
+
+# Runtimes opcionales: solo se requieren si se usan
+try:
+    import onnxruntime
+except ImportError:  # pragma: no cover - depende del entorno
+    onnxruntime = None
+
+try:
+    import openvino
+except ImportError:  # pragma: no cover - depende del entorno
+    openvino = None
+
+# Valores por defecto de ultralytics para predict()
+DEFAULT_CONF_THRESHOLD = 0.25
+DEFAULT_IOU_THRESHOLD = 0.7
+DEFAULT_MAX_DETECTIONS = 300
+
+
+class DetectionBox:
+    """Una detección, con la misma forma de acceso que un box de ultralytics."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy.reshape(1, 4)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.cls = np.array([cls], dtype=np.float32)
+
+
+class DetectionBoxes:
+    """Conjunto de detecciones de una imagen (arrays N x 4, N, N)."""
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self.conf)):
+            yield DetectionBox(self.xyxy[i], self.conf[i], self.cls[i])
+
+
+class DetectionResult:
+    """Resultado de una imagen: `boxes`, `names` y `orig_shape` como en ultralytics."""
+
+    def __init__(self, boxes: DetectionBoxes, names: dict, orig_shape):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+
+def letterbox(image: np.ndarray, size: int):
+    """
+    Redimensiona manteniendo la relación de aspecto y rellena hasta `size` x `size` (gris 114),
+    igual que el preprocesamiento de ultralytics. Retorna (imagen, escala, (pad_x, pad_y)).
+    """
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (size - new_w) / 2
+    pad_y = (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (left, top)
+
+
+def _to_input_tensor(images: list, size: int):
+    """Convierte imágenes BGR/gris a un tensor NCHW float32 RGB normalizado."""
+    batch = []
+    transforms = []
+    for image in images:
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        boxed, ratio, pad = letterbox(image, size)
+        batch.append(boxed[:, :, ::-1].transpose(2, 0, 1))
+        transforms.append((ratio, pad))
+    tensor = np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+    return tensor, transforms
+
+
+def _postprocess(prediction: np.ndarray, ratio: float, pad, orig_shape, names: dict,
+                 conf_threshold: float, iou_threshold: float, max_det: int) -> DetectionResult:
+    """Filtra por confianza, aplica NMS por clase y lleva las cajas a coordenadas de la imagen original."""
+    # Salida YOLOv8: (4 + num_clases, N) con cajas cx, cy, w, h en píxeles del tensor de entrada
+    prediction = prediction.T
+    class_scores = prediction[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    confidences = class_scores[np.arange(len(class_ids)), class_ids]
+
+    keep = confidences >= conf_threshold
+    prediction, class_ids, confidences = prediction[keep], class_ids[keep], confidences[keep]
+
+    xyxy = np.empty((len(prediction), 4), dtype=np.float32)
+    if len(prediction):
+        cx, cy, bw, bh = prediction[:, 0], prediction[:, 1], prediction[:, 2], prediction[:, 3]
+        xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          conf_threshold, iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)[:max_det]
+        xywh, class_ids, confidences = xywh[indices], class_ids[indices], confidences[indices]
+
+        xyxy = np.empty((len(indices), 4), dtype=np.float32)
+        xyxy[:, 0] = (xywh[:, 0] - pad[0]) / ratio
+        xyxy[:, 1] = (xywh[:, 1] - pad[1]) / ratio
+        xyxy[:, 2] = (xywh[:, 0] + xywh[:, 2] - pad[0]) / ratio
+        xyxy[:, 3] = (xywh[:, 1] + xywh[:, 3] - pad[1]) / ratio
+        h, w = orig_shape[:2]
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, w)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, h)
+
+    boxes = DetectionBoxes(xyxy, confidences.astype(np.float32), class_ids.astype(np.float32))
+    return DetectionResult(boxes, names, orig_shape[:2])
+
+
+def _parse_metadata_value(value):
+    """Los metadatos de ultralytics se guardan como repr de Python (ej. "{0: 'total'}")."""
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return value
+
+
+def _imgsz_from_metadata(value, default: int = 640) -> int:
+    value = _parse_metadata_value(value)
+    if isinstance(value, (list, tuple)) and value:
+        return int(value[0])
+    if isinstance(value, int):
+        return value
+    return default
+
+
+class _CpuYoloModel:
+    """Base común: preprocesamiento, ejecución por lotes y postprocesamiento."""
+
+    runtime = None
+
+    def __init__(self, names: dict, imgsz: int, max_batch: int):
+        self.names = {int(k): v for k, v in names.items()}
+        self.imgsz = imgsz
+        # 0 = batch dinámico; 1 = el modelo se exportó con batch fijo
+        self.max_batch = max_batch
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, source, conf: float = DEFAULT_CONF_THRESHOLD, iou: float = DEFAULT_IOU_THRESHOLD,
+                 max_det: int = DEFAULT_MAX_DETECTIONS, **kwargs) -> list:
+        images = source if isinstance(source, (list, tuple)) else [source]
+        step = self.max_batch or len(images)
+        results = []
+        for start in range(0, len(images), step):
+            chunk = images[start:start + step]
+            tensor, transforms = _to_input_tensor(chunk, self.imgsz)
+            output = self._infer(tensor)
+            for image, prediction, (ratio, pad) in zip(chunk, output, transforms):
+                results.append(_postprocess(prediction, ratio, pad, image.shape, self.names, conf, iou, max_det))
+        return results
+
+
+class OnnxYoloModel(_CpuYoloModel):
+    """YOLOv8 exportado a ONNX, ejecutado con ONNX Runtime en CPU."""
+
+    runtime = "onnx"
+
+    def __init__(self, model_path: str):
+        if onnxruntime is None:
+            raise ImportError("onnxruntime no está instalado")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        super().__init__(
+            names=_parse_metadata_value(metadata.get("names", "{}")),
+            imgsz=_imgsz_from_metadata(metadata.get("imgsz")),
+            max_batch=batch_dim if isinstance(batch_dim, int) else 0,
+        )
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+
+class OpenVinoYoloModel(_CpuYoloModel):
+    """YOLOv8 exportado a OpenVINO IR (directorio `*_openvino_model`), ejecutado en CPU."""
+
+    runtime = "openvino"
+
+    def __init__(self, model_dir: str):
+        if openvino is None:
+            raise ImportError("openvino no está instalado")
+        xml_files = [f for f in os.listdir(model_dir) if f.endswith(".xml")]
+        if not xml_files:
+            raise FileNotFoundError(f"No se encontró un modelo OpenVINO (.xml) en {model_dir}")
+
+        core = openvino.Core()
+        model = core.read_model(os.path.join(model_dir, xml_files[0]))
+        batch_dim = model.input(0).get_partial_shape()[0]
+        self.compiled = core.compile_model(model, "CPU", {"PERFORMANCE_HINT": "LATENCY"})
+        self.output = self.compiled.output(0)
+
+        metadata = {}
+        metadata_path = os.path.join(model_dir, "metadata.yaml")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = yaml.safe_load(f) or {}
+        super().__init__(
+            names=metadata.get("names", {}),
+            imgsz=_imgsz_from_metadata(metadata.get("imgsz")),
+            max_batch=0 if batch_dim.is_dynamic else batch_dim.get_length(),
+        )
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        return self.compiled([tensor])[self.output]
@@ -0,0 +1,120 @@
+import sys
+import os
+import json
+import base64
+import cv2
+import numpy as np
+import pytest
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+# zxing-cpp es opcional en el servicio (sin él no hay camino rápido de códigos de barras)
+zxingcpp = pytest.importorskip("zxingcpp")
+
+from models.enums import DocumentType
+from services.barcode_service import (decode_afip_qr_payload, afip_payload_to_fields, read_document_barcode,
+                                      parse_dni_pdf417, barcode_covers_document)
+
+_AFIP_PAYLOAD = {"ver": 1, "fecha": "2024-03-15", "cuit": 30712345674, "ptoVta": 3, "tipoCmp": 1,
+                 "nroCmp": 12345, "importe": 12100.5, "moneda": "PES", "ctz": 1, "tipoDocRec": 80,
+                 "nroDocRec": 20123456789, "tipoCodAut": "E", "codAut": 74123456789012}
+
+# PDF417 del DNI: formato actual (frente) y anterior (dorso)
+_DNI_PDF417_CURRENT = "00512345678@PEREZ@JUAN CARLOS@M@12345678@B@15/04/1985@20/06/2016@200"
+_DNI_PDF417_PREVIOUS = ("@12345678    @A@1@PEREZ@JUAN CARLOS@ARGENTINO@15/04/1985@M@10/03/2010"
+                        "@00123456789@7007@10/03/2025@123@0@ILR:2.01 C:100310.01")
+
+def _afip_qr_url(payload: dict = _AFIP_PAYLOAD) -> str:
+    encoded = base64.b64encode(json.dumps(payload).encode()).decode()
+    return f"https://www.afip.gob.ar/fe/qr/?p={encoded}"
+
+def _invoice_with_qr() -> np.ndarray:
+    # Factura A4 a ~200 DPI con el QR de AFIP (~3 cm) en el pie de página
+    page = np.full((2339, 1654), 255, dtype=np.uint8)
+    cv2.putText(page, "FACTURA A", (100, 200), cv2.FONT_HERSHEY_SIMPLEX, 2, 0, 4)
+    qr = cv2.QRCodeEncoder.create().encode(_afip_qr_url())
+    qr = cv2.resize(qr, None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST)
+    page[1950:1950 + qr.shape[0], 120:120 + qr.shape[1]] = qr
+    return page
+
+def _dni_front_with_pdf417() -> np.ndarray:
+    # Foto del frente del DNI (~1000 px de ancho) con el PDF417 abajo
+    card = np.full((640, 1010), 235, dtype=np.uint8)
+    code = np.array(zxingcpp.write_barcode(zxingcpp.BarcodeFormat.PDF417, _DNI_PDF417_CURRENT, width=600, height=150))
+    card[450:450 + code.shape[0], 200:200 + code.shape[1]] = code
+    return card
+
+def test_decode_afip_qr_payload():
+    assert decode_afip_qr_payload(_afip_qr_url())["codAut"] == 74123456789012
+    for text in ("https://example.com/?q=1", "https://www.afip.gob.ar/fe/qr/?p=no-es-base64",
+                 _afip_qr_url({"ver": 1, "cuit": 30712345674})):
+        try:
+            decode_afip_qr_payload(text)
+            assert False, f"Debería haber lanzado ValueError: {text}"
+        except ValueError:
+            pass
+
+def test_afip_payload_to_fields():
+    fields = afip_payload_to_fields(_AFIP_PAYLOAD, [10, 20, 110, 120])
+    values = {field_name: field['value'] for field_name, field in fields.items()}
+    assert values == {
+        'factura_numero': "00003-00012345",
+        'factura_tipo': "A",
+        'factura_fecha_emision': "15/03/2024",
+        'emisor_cuit': "30-71234567-4",
+        'receptor_cuit': "20-12345678-9",
+        'total': "$ 12.100,50",
+        'cae': "74123456789012",
+    }
+    assert all(field['confidence'] == 1.0 and field['bbox'] == [10, 20, 110, 120] for field in fields.values())
+
+def test_read_document_barcode():
+    metadata = {}
+    fields = read_document_barcode(_invoice_with_qr(), DocumentType.INVOICE_A, metadata, enabled=True)
+    assert fields['cae']['value'] == "74123456789012"
+    assert metadata['barcode']['found'] and 'total' in metadata['barcode']['fields']
+    x1, y1, _, _ = fields['total']['bbox']
+    assert 100 < x1 < 140 and 1930 < y1 < 1970, "bbox del QR en coordenadas de la página completa"
+    # Sin QR, o tipos sin lector, no hay campos
+    assert read_document_barcode(np.full((800, 600), 255, np.uint8), DocumentType.INVOICE_B, enabled=True) == {}
+    assert read_document_barcode(_invoice_with_qr(), DocumentType.DNI_FRONT, enabled=True) == {}
+
+def test_parse_dni_pdf417():
+    assert parse_dni_pdf417(_DNI_PDF417_CURRENT) == {
+        'dni_apellido': "PEREZ", 'dni_nombre': "JUAN CARLOS", 'dni_sexo': "M", 'dni_numero': "12.345.678",
+        'dni_fecha_nacimiento': "15/04/1985", 'dni_fecha_emision': "20/06/2016",
+    }
+    previous = parse_dni_pdf417(_DNI_PDF417_PREVIOUS)
+    assert previous['dni_numero'] == "12.345.678" and previous['dni_fecha_vencimiento'] == "10/03/2025"
+    for text in ("no es un DNI", "00512345678@PEREZ@JUAN@Z@12345678@B@15/04/1985@20/06/2016",
+                 "00512345678@PEREZ@JUAN@M@12345678@B@1985-04-15@20/06/2016"):
+        try:
+            parse_dni_pdf417(text)
+            assert False, f"Debería haber lanzado ValueError: {text}"
+        except ValueError:
+            pass
+
+def test_read_dni_pdf417():
+    metadata = {}
+    fields = read_document_barcode(_dni_front_with_pdf417(), DocumentType.DNI_FRONT, metadata, enabled=True)
+    assert fields['dni_numero']['value'] == "12.345.678" and fields['dni_numero']['confidence'] == 1.0
+    assert metadata['barcode']['format'] == "dni_pdf417"
+    # El PDF417 actual no trae el vencimiento: YOLO corre para ese campo; al dorso le falta el domicilio
+    assert not barcode_covers_document(fields, DocumentType.DNI_FRONT)
+    assert not barcode_covers_document(fields, DocumentType.DNI_BACK)
+    # El formato anterior trae todos los campos del frente
+    previous = {name: {'value': value, 'confidence': 1.0}
+                for name, value in parse_dni_pdf417(_DNI_PDF417_PREVIOUS).items()}
+    assert barcode_covers_document(previous, DocumentType.DNI_FRONT)
+    partial = {name: field for name, field in previous.items() if name != 'dni_sexo'}
+    assert not barcode_covers_document(partial, DocumentType.DNI_FRONT)
+
+if __name__ == "__main__":
+    test_decode_afip_qr_payload()
+    test_afip_payload_to_fields()
+    test_read_document_barcode()
+    test_parse_dni_pdf417()
+    test_read_dni_pdf417()
@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services import batch_inference, model_loader
+from services.model_loader import RUNTIME_ONNX, PRECISION_FP32
+
+class _NotThreadSafeModel:
+    """Modelo falso que falla si dos hilos lo usan a la vez (como una instancia de ultralytics)."""
+
+    def __init__(self, *args):
+        self.active = 0
+        self.calls = []
+        self._guard = threading.Lock()
+
+    def __call__(self, images):
+        with self._guard:
+            self.active += 1
+            assert self.active == 1, "Inferencia concurrente sobre la misma instancia"
+        time.sleep(0.01)
+        with self._guard:
+            self.active -= 1
+            self.calls.append(images)
+        return [f"resultado:{image}" for image in (images if isinstance(images, list) else [images])]
+
+def _register_model(model_name: str, model) -> tuple:
+    cache_key = (model_name, RUNTIME_ONNX, PRECISION_FP32)
+    model_loader._resolved_variants[(model_name, None, PRECISION_FP32)] = (RUNTIME_ONNX, PRECISION_FP32)
+    model_loader._yolo_model_cache[cache_key] = model
+    model_loader._inference_locks[cache_key] = threading.Lock()
+    return cache_key
+
+def _run_in_threads(func, count: int) -> list:
+    results = [None] * count
+    def run(i):
+        results[i] = func(i)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_unbatched_detection_is_serialized_per_model():
+    model = _NotThreadSafeModel()
+    _register_model("modelo_falso.pt", model)
+    batch_size = batch_inference.YOLO_BATCH_SIZE
+    batch_inference.YOLO_BATCH_SIZE = 1  # sin batching: cada hilo infiere por su cuenta
+    try:
+        results = _run_in_threads(lambda i: batch_inference.run_yolo_detection("modelo_falso.pt", i), 8)
+    finally:
+        batch_inference.YOLO_BATCH_SIZE = batch_size
+    assert results == [f"resultado:{i}" for i in range(8)]
+    assert len(model.calls) == 8
+
+def test_concurrent_callers_share_one_forward_pass():
+    model = _NotThreadSafeModel()
+    load_yolo_model = batch_inference.load_yolo_model
+    batch_inference.load_yolo_model = lambda model_name, precision: model
+    try:
+        # Plazo largo: el lote se despacha al completarse, no por tiempo
+        detector = batch_inference.BatchingDetector(max_batch_size=4, max_wait_ms=5000)
+        results = _run_in_threads(lambda i: detector.detect("modelo_falso.pt", i), 4)
+    finally:
+        batch_inference.load_yolo_model = load_yolo_model
+    assert len(model.calls) == 1
+    assert sorted(model.calls[0]) == [0, 1, 2, 3]
+    # Cada llamador recibe el resultado de su propia imagen
+    assert results == [f"resultado:{i}" for i in range(4)]
+
+def test_batching_only_with_threads_pool():
+    settings = (batch_inference.YOLO_BATCH_SIZE, batch_inference.CELERY_WORKER_POOL)
+    try:
+        # Con prefork cada proceso tiene una sola tarea: el lote solo agregaría espera
+        batch_inference.YOLO_BATCH_SIZE, batch_inference.CELERY_WORKER_POOL = 8, "prefork"
+        assert batch_inference.get_batching_detector() is None
+        batch_inference.YOLO_BATCH_SIZE, batch_inference.CELERY_WORKER_POOL = 1, "threads"
+        assert batch_inference.get_batching_detector() is None
+        batch_inference.YOLO_BATCH_SIZE, batch_inference.CELERY_WORKER_POOL = 8, "threads"
+        assert isinstance(batch_inference.get_batching_detector(), batch_inference.BatchingDetector)
+    finally:
+        batch_inference.YOLO_BATCH_SIZE, batch_inference.CELERY_WORKER_POOL = settings
+        batch_inference._batching_detector = None
+
+def test_model_is_loaded_once_from_concurrent_threads():
+    created = []
+    def slow_model(path):
+        time.sleep(0.02)
+        created.append(path)
+        return _NotThreadSafeModel()
+
+    patches = {
+        (model_loader, 'resolve_precision'): lambda name, precision, runtime: PRECISION_FP32,
+        (model_loader, 'resolve_runtime'): lambda name, runtime, precision: RUNTIME_ONNX,
+        (model_loader, 'get_exported_model_path'): lambda name, runtime, precision: __file__,
+        (model_loader.yolo_runtime, 'OnnxYoloModel'): slow_model,
+    }
+    originals = {key: getattr(*key) for key in patches}
+    for (module, name), value in patches.items():
+        setattr(module, name, value)
+    try:
+        models = _run_in_threads(lambda i: model_loader.load_yolo_model("modelo_concurrente.pt"), 8)
+    finally:
+        for (module, name), value in originals.items():
+            setattr(module, name, value)
+    assert len(created) == 1
+    assert all(model is models[0] for model in models)
+
+if __name__ == "__main__":
+    test_unbatched_detection_is_serialized_per_model()
+    test_concurrent_callers_share_one_forward_pass()
+    test_batching_only_with_threads_pool()
+    test_model_is_loaded_once_from_concurrent_threads()
@@ -0,0 +1,126 @@
+import sys
+import os
+import io
+import time
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services.image_decoding import (decode_document_image, choose_reduction, read_image_header, is_tiff,
+                                     count_tiff_pages, iter_tiff_pages)
+
+def _jpeg_bytes(width: int, height: int, orientation: int = 1, dpi=None) -> bytes:
+    img = Image.new("RGB", (width, height), "white")
+    img.paste((0, 0, 0), (0, 0, width // 4, height // 8))  # marca en la esquina superior izquierda
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    kwargs = {'dpi': dpi} if dpi else {}
+    img.save(buffer, format="JPEG", exif=exif, **kwargs)
+    return buffer.getvalue()
+
+def test_choose_reduction():
+    # Foto de celular de 48 MP: ~684 DPI suponiendo una A4 en todo el cuadro -> 1/2
+    assert choose_reduction({'width': 8000, 'height': 6000, 'dpi': 72}, 300, 16e6) == 2
+    # Escaneo a 600 DPI declarados -> 1/2 alcanza los 300 DPI
+    assert choose_reduction({'width': 4960, 'height': 7016, 'dpi': 600}, 300, 64e6) == 2
+    # Escaneo a 300 DPI: sin reducción
+    assert choose_reduction({'width': 2480, 'height': 3508, 'dpi': 300}, 300, 16e6) == 1
+    # El presupuesto de píxeles manda aunque baje del DPI objetivo
+    assert choose_reduction({'width': 2480, 'height': 3508, 'dpi': 300}, 300, 4e6) == 2
+
+def test_decode_document_image_reduced_and_oriented():
+    metadata = {}
+    image = decode_document_image(_jpeg_bytes(4000, 3000, orientation=6), metadata=metadata,
+                                  target_dpi=150, max_megapixels=16)
+    # 4000 px / 11.69" ≈ 342 DPI -> 1/2; orientación 6 = rotar 90° horario
+    assert metadata['decoding']['reduction'] == 2
+    assert image.shape == (2000, 1500, 3)
+    # La marca de la esquina superior izquierda pasa a la superior derecha
+    assert image[10, -10].max() < 50 and image[10, 10].min() > 200
+
+def test_decode_rejects_invalid_bytes():
+    try:
+        decode_document_image(b"no es una imagen")
+        assert False, "Debería haber lanzado ValueError"
+    except ValueError:
+        pass
+    assert read_image_header(_jpeg_bytes(64, 32))['width'] == 64
+
+def _multipage_tiff() -> bytes:
+    # Lote del escáner: página bitonal, página en gris y página color de mayor tamaño
+    pages = [Image.new("1", (800, 1100), 1), Image.new("L", (800, 1100), 200), Image.new("RGB", (1600, 2200), "white")]
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format="TIFF", save_all=True, append_images=pages[1:], compression="tiff_deflate")
+    return buffer.getvalue()
+
+def test_iter_tiff_pages():
+    tiff_bytes = _multipage_tiff()
+    assert is_tiff(tiff_bytes) and count_tiff_pages(tiff_bytes) == 3
+
+    pages = iter_tiff_pages(tiff_bytes, max_megapixels=1)
+    index, page, metadata = next(pages)  # generador: solo se decodificó la primera página
+    assert index == 0 and page.shape == (1100, 800), "Las páginas bitonales quedan en un canal"
+    rest = list(pages)
+    assert rest[0][1].shape == (1100, 800)
+    # La página color supera el presupuesto de 1 MP y se reduce
+    color = rest[1][1]
+    assert color.ndim == 3 and color.shape[0] * color.shape[1] <= 1e6
+    assert rest[1][2]['decoding']['source_size'] == [2200, 1600]
+
+    try:
+        list(iter_tiff_pages(tiff_bytes, max_pages=2))
+        assert False, "Debería haber lanzado ValueError por exceso de páginas"
+    except ValueError:
+        pass
+
+def test_tiff_pages_share_the_detector_safely():
+    # Las páginas corren en paralelo en el executor de páginas y detectan con la misma instancia
+    # de YOLO (no thread-safe): run_yolo_detection debe serializar la inferencia
+    from models.enums import DocumentType
+    from services import batch_inference, document_pipeline, model_loader, ocr_executor
+
+    active = []
+    def model(image):
+        active.append(image)
+        assert len(active) == 1, "Inferencia concurrente sobre la misma instancia"
+        time.sleep(0.01)
+        active.remove(image)
+        return [float(image.mean())]
+
+    cache_key = ("modelo_tiff.pt", model_loader.RUNTIME_ONNX, model_loader.PRECISION_FP32)
+    model_loader._resolved_variants[("modelo_tiff.pt", None, model_loader.PRECISION_FP32)] = cache_key[1:]
+    model_loader._yolo_model_cache[cache_key] = model
+    model_loader._inference_locks[cache_key] = threading.Lock()
+
+    def process_page_image(image, document_type, metadata=None):
+        value = batch_inference.run_yolo_detection("modelo_tiff.pt", image)
+        return {'dni_numero': {'value': f"{value:.0f}", 'confidence': 0.9, 'bbox': [0, 0, 1, 1]}}
+
+    originals = (document_pipeline.process_page_image, ocr_executor.PAGE_MAX_WORKERS,
+                 batch_inference.YOLO_BATCH_SIZE)
+    ocr_executor.shutdown_ocr_executor()
+    document_pipeline.process_page_image = process_page_image
+    ocr_executor.PAGE_MAX_WORKERS = 3
+    batch_inference.YOLO_BATCH_SIZE = 1
+    try:
+        result = document_pipeline.process_tiff_document(_multipage_tiff(), DocumentType.DNI_FRONT)
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+        (document_pipeline.process_page_image, ocr_executor.PAGE_MAX_WORKERS,
+         batch_inference.YOLO_BATCH_SIZE) = originals
+    assert [page['page'] for page in result['pages']] == [1, 2, 3]
+    assert not any('error' in page for page in result['pages'])
+
+if __name__ == "__main__":
+    test_choose_reduction()
+    test_decode_document_image_reduced_and_oriented()
+    test_decode_rejects_invalid_bytes()
+    test_iter_tiff_pages()
+    test_tiff_pages_share_the_detector_safely()
@@ -0,0 +1,126 @@
+import sys
+import os
+import time
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services import ocr_executor, batch_inference
+
+def _slow_square(i):
+    # Los primeros elementos terminan último: el orden de finalización es el inverso del de entrada
+    time.sleep(0.002 * (10 - i))
+    return i * i
+
+def _with_settings(func, **settings):
+    originals = {name: getattr(ocr_executor, name) for name in settings}
+    for name, value in settings.items():
+        setattr(ocr_executor, name, value)
+    ocr_executor.shutdown_ocr_executor()
+    try:
+        return func()
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+        for name, value in originals.items():
+            setattr(ocr_executor, name, value)
+
+def test_map_ocr_keeps_input_order():
+    expected = [i * i for i in range(10)]
+    for mode in ("thread", "process", "serial"):
+        def run():
+            executor = ocr_executor.get_ocr_executor()
+            assert (executor is None) == (mode == "serial"), mode
+            return ocr_executor.map_ocr(_slow_square, range(10))
+        assert _with_settings(run, OCR_EXECUTOR=mode, OCR_MAX_WORKERS=4) == expected, mode
+
+def test_fork_resets_executors():
+    def run():
+        ocr_executor.get_ocr_executor()
+        ocr_executor.get_page_executor()
+        assert ocr_executor._executor is not None and ocr_executor._page_executor is not None
+
+        pid = os.fork()
+        if pid == 0:
+            # Hijo: los hilos del padre no existen, los executors se recrean bajo demanda
+            ok = ocr_executor._executor is None and ocr_executor._page_executor is None
+            ok = ok and batch_inference._batching_detector is None
+            ok = ok and ocr_executor.map_ocr(_slow_square, range(4)) == [0, 1, 4, 9]
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+        # El padre conserva sus executors
+        assert ocr_executor._executor is not None and ocr_executor._page_executor is not None
+    _with_settings(run, OCR_EXECUTOR="thread", OCR_MAX_WORKERS=2, PAGE_MAX_WORKERS=2)
+
+def test_concurrent_callers_share_one_executor():
+    created = []
+    thread_pool_executor = ocr_executor.ThreadPoolExecutor
+
+    def counting_executor(*args, **kwargs):
+        time.sleep(0.01)  # ensancha la ventana entre el chequeo y la creación
+        executor = thread_pool_executor(*args, **kwargs)
+        created.append(executor)
+        return executor
+
+    def run():
+        barrier = threading.Barrier(8)
+        results = []
+
+        def get_both():
+            barrier.wait(timeout=5)
+            results.append((ocr_executor.get_ocr_executor(), ocr_executor.get_page_executor()))
+
+        threads = [threading.Thread(target=get_both) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(created) == 2, "Un executor de OCR y uno de páginas"
+        assert len({id(executor) for executor, _ in results}) == 1
+        assert len({id(page_executor) for _, page_executor in results}) == 1
+
+    ocr_executor.ThreadPoolExecutor = counting_executor
+    try:
+        _with_settings(run, OCR_EXECUTOR="thread", OCR_MAX_WORKERS=2, PAGE_MAX_WORKERS=2)
+    finally:
+        ocr_executor.ThreadPoolExecutor = thread_pool_executor
+
+def test_warmup_starts_page_workers():
+    def run():
+        ocr_executor.warmup_ocr_executor(timeout=5)
+        names = {thread.name for thread in threading.enumerate()}
+        assert {f"page_{i}" for i in range(3)} <= names, names
+    _with_settings(run, OCR_EXECUTOR="serial", PAGE_MAX_WORKERS=3)
+
+def test_map_pages_bounds_pages_in_flight():
+    lock = threading.Lock()
+    counts = {'produced': 0, 'finished': 0, 'max_in_flight': 0}
+
+    def pages():
+        for i in range(20):
+            with lock:
+                counts['produced'] += 1
+                counts['max_in_flight'] = max(counts['max_in_flight'], counts['produced'] - counts['finished'])
+            yield i
+
+    def process(page):
+        time.sleep(0.005 if page % 3 else 0.02)
+        with lock:
+            counts['finished'] += 1
+        return page
+
+    results = _with_settings(lambda: ocr_executor.map_pages(process, pages()),
+                             PAGE_MAX_WORKERS=2, PAGE_MAX_IN_FLIGHT=3)
+    assert results == list(range(20))
+    assert counts['max_in_flight'] <= 3, counts
+    assert counts['finished'] == 20
+
+if __name__ == "__main__":
+    test_map_ocr_keeps_input_order()
+    test_fork_resets_executors()
+    test_concurrent_callers_share_one_executor()
+    test_warmup_starts_page_workers()
+    test_map_pages_bounds_pages_in_flight()
@@ -8,7 +8,9 @@ if project_root and project_root not in sys.path:
 
 import cv2
 import numpy as np
-from services.ocr_service import perform_ocr_with_tesseract, perform_yolo_ocr
+from services.ocr_service import perform_ocr_with_tesseract, perform_yolo_ocr, assign_words_to_boxes, OCR_STRATEGY_PAGE
+from services.ocr_service import estimate_text_height, normalize_crop_for_ocr, scale_detections
+from services.ocr_profiles import get_ocr_profile, apply_profile_pattern, select_detections, DEFAULT_PROFILE
 from models.documents import DocumentType
 
 def test_perform_ocr_with_tesseract():
@@ -29,6 +31,104 @@ def test_perform_yolo_ocr():
     assert isinstance(result, dict), "El resultado debe ser un diccionario"
     assert len(result) > 0, "El resultado YOLO OCR está vacío"
 
+def test_assign_words_to_boxes():
+    words = [
+        {'text': 'CUIT:', 'confidence': 0.9, 'bbox': [10, 10, 50, 30]},
+        {'text': '20-12345678-9', 'confidence': 0.9, 'bbox': [55, 10, 160, 30]},
+        {'text': 'TOTAL', 'confidence': 0.9, 'bbox': [10, 200, 60, 220]},
+        {'text': '$1.234,50', 'confidence': 0.9, 'bbox': [70, 200, 150, 220]},
+        {'text': 'ignorado', 'confidence': 0.9, 'bbox': [400, 400, 450, 420]},
+    ]
+    # La segunda caja está contenida en la primera: la palabra va a la más específica
+    boxes = [[0, 0, 200, 40], [50, 5, 170, 35], [0, 190, 200, 230]]
+    texts = assign_words_to_boxes(words, boxes)
+    assert texts == ["CUIT:", "20-12345678-9", "TOTAL $1.234,50"]
+
+def test_perform_yolo_ocr_page_strategy():
+    image_path = os.path.join(project_root, "src", "backend", "tests", "test_invoice.jpg")
+    img = cv2.imread(image_path)
+    assert img is not None, "No se pudo cargar la imagen de prueba"
+    result = perform_yolo_ocr(img, DocumentType.INVOICE_A, strategy=OCR_STRATEGY_PAGE)
+    assert isinstance(result, dict), "El resultado debe ser un diccionario"
+
+def test_ocr_profiles():
+    cuit_profile = get_ocr_profile('emisor_cuit')
+    assert set(cuit_profile.whitelist) <= set("0123456789-"), "El CUIT debe usar un alfabeto numérico"
+    assert get_ocr_profile('campo_desconocido') == DEFAULT_PROFILE
+
+    value, valid = apply_profile_pattern("CUIT 20-12345678-9", cuit_profile)
+    assert valid and value == "20-12345678-9"
+    value, valid = apply_profile_pattern("20-1234", cuit_profile)
+    assert valid is False and value == "20-1234"
+    assert apply_profile_pattern("Juan Perez", DEFAULT_PROFILE) == ("Juan Perez", None)
+
+def test_select_detections():
+    detections = [
+        ('total', 0.55, [10, 500, 100, 520]),
+        ('emisor_cuit', 0.90, [10, 10, 100, 30]),
+        ('total', 0.85, [10, 600, 100, 620]),
+        ('emisor_cuit', 0.10, [10, 40, 100, 60]),   # bajo el piso de confianza
+        ('total', 0.85, [10, 400, 100, 420]),       # empate: gana la más arriba
+    ]
+    selected = select_detections(detections)
+    assert selected == [
+        ('total', 0.85, [10, 400, 100, 420]),
+        ('emisor_cuit', 0.90, [10, 10, 100, 30]),
+    ]
+
+def test_normalize_crop_for_ocr():
+    crop = np.full((30, 200), 255, dtype=np.uint8)
+    crop[10:18, 20:180] = 0 # línea de texto de 8 px
+    assert estimate_text_height(crop) == 8
+    normalized = normalize_crop_for_ocr(crop, target_height=32, padding=10)
+    assert normalized.shape == (30 * 4 + 20, 200 * 4 + 20)
+    assert abs(estimate_text_height(normalized) - 32) <= 2
+    assert normalized[:10].min() == 255 # margen blanco
+    assert estimate_text_height(np.full((30, 200), 255, dtype=np.uint8)) is None
+
+def test_scale_detections():
+    detections = [('total', 0.9, [10, 20, 110, 41])]
+    # Detección sobre una página reducida a la mitad -> coordenadas de la página completa
+    assert scale_detections(detections, (320, 240, 3), (640, 480)) == [('total', 0.9, [20, 40, 220, 82])]
+    # Escala no entera (479 / 240): el borde izquierdo se redondea hacia afuera (200 * 1.996 = 399.2 -> 399)
+    # y las cajas se recortan a los límites de la página
+    assert scale_detections([('total', 0.9, [200, 300, 240, 320])], (320, 240), (640, 479))[0][2] == [399, 600, 479, 640]
+
+def test_dni_front_barcode_still_reads_expiry_date():
+    from services import ocr_service
+    from services.barcode_service import parse_dni_pdf417
+    # PDF417 del formato actual: trae todo salvo el vencimiento
+    barcode = {name: {'value': value, 'confidence': 1.0}
+               for name, value in parse_dni_pdf417("00512345678@PEREZ@JUAN CARLOS@M@12345678@B@15/04/1985"
+                                                   "@20/06/2016@200").items()}
+    requested = {}
+
+    def detect(image, document_type, metadata=None, known_fields=()):
+        requested['known_fields'] = set(known_fields)
+        return [('dni_numero', 0.9, [10, 40, 100, 60]), ('dni_fecha_vencimiento', 0.9, [10, 10, 100, 30])]
+
+    patches = {
+        'read_document_barcode': lambda image, document_type, metadata=None: dict(barcode),
+        'align_document_template': lambda image, document_type, metadata=None: None,
+        'detect_fields_with_cascade': detect,
+        'map_ocr': lambda func, crops, profiles: ["20/06/2031" for _ in crops],
+    }
+    originals = {name: getattr(ocr_service, name) for name in patches}
+    for name, value in patches.items():
+        setattr(ocr_service, name, value)
+    try:
+        metadata = {}
+        result = perform_yolo_ocr(np.full((540, 856), 255, dtype=np.uint8), DocumentType.DNI_FRONT, metadata=metadata)
+    finally:
+        for name, value in originals.items():
+            setattr(ocr_service, name, value)
+
+    # El vencimiento sale de YOLO + OCR; el resto, del código (sin volver a reconocerse)
+    assert result['dni_fecha_vencimiento']['value'] == "20/06/2031"
+    assert result['dni_numero'] == barcode['dni_numero']
+    assert 'dni_fecha_vencimiento' not in requested['known_fields']
+    assert metadata['detections'] == {'detected': 2, 'ocr': 1}
+
 if __name__ == "__main__":
     print("First test \n")
     test_perform_ocr_with_tesseract()
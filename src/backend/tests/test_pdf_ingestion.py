@@ -0,0 +1,133 @@
+import sys
+import os
+import cv2
+import numpy as np
+import pytest
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+# PyMuPDF es opcional en el servicio (sin él los PDF fallan con RuntimeError)
+pymupdf = pytest.importorskip("pymupdf")
+
+from services import pdf_ingestion
+from services.pdf_ingestion import is_pdf, iter_pdf_pages
+import json
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models.enums import DocumentType
+from services.document_pipeline import merge_page_results, build_ocr_result
+
+def _two_page_pdf() -> bytes:
+    # Página 1: factura electrónica con capa de texto; página 2: escaneo (solo imagen)
+    document = pymupdf.open()
+    page = document.new_page(width=595, height=842)  # A4 en puntos
+    for i in range(12):
+        page.insert_text((72, 100 + i * 20), f"CUIT 20-12345678-9 renglon {i}", fontsize=11)
+    scan = np.full((400, 300, 3), 255, dtype=np.uint8)
+    cv2.putText(scan, "FACTURA", (40, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    page = document.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=cv2.imencode(".png", scan)[1].tobytes())
+    return document.tobytes()
+
+def test_is_pdf():
+    assert is_pdf(_two_page_pdf())
+    assert not is_pdf(cv2.imencode(".png", np.zeros((4, 4), np.uint8))[1].tobytes())
+
+def test_iter_pdf_pages():
+    pages = list(iter_pdf_pages(_two_page_pdf(), render_dpi=144, detection_max_side=320))
+    assert len(pages) == 2
+
+    text_page, scanned_page = pages
+    assert text_page.has_text_layer and text_page.image is None, "La página con texto no se rasteriza completa"
+    assert text_page.page_shape == (1684, 1190), "Tamaño a 144 DPI (2x)"
+    assert max(text_page.detection_image.shape[:2]) <= 320
+    first = text_page.words[0]
+    assert first['text'] == "CUIT"
+    # insert_text ubica la línea base en y=100 pt -> ~200 px a 144 DPI
+    assert 140 < first['bbox'][1] < 200 < first['bbox'][3] < 220
+
+    assert not scanned_page.has_text_layer
+    assert scanned_page.image.shape == (1684, 1190, 3)
+
+def test_iter_pdf_pages_rejects_invalid_pdf():
+    try:
+        list(iter_pdf_pages(b"%PDF-1.7 truncado"))
+        assert False, "Debería haber lanzado ValueError"
+    except ValueError:
+        pass
+
+def test_iter_pdf_pages_serializes_pymupdf():
+    pdf_bytes = _two_page_pdf()
+    calls = {'active': 0, 'max_active': 0}
+    counter_lock = threading.Lock()
+    read_page = pdf_ingestion._read_page
+
+    def counting_read_page(*args):
+        with counter_lock:
+            calls['active'] += 1
+            calls['max_active'] = max(calls['max_active'], calls['active'])
+        try:
+            return read_page(*args)
+        finally:
+            with counter_lock:
+                calls['active'] -= 1
+
+    def read_document(_):
+        return list(iter_pdf_pages(pdf_bytes, render_dpi=144, detection_max_side=320))
+
+    pdf_ingestion._read_page = counting_read_page
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            documents = list(executor.map(read_document, range(8)))
+    finally:
+        pdf_ingestion._read_page = read_page
+    assert calls['max_active'] == 1
+    for pages in documents:
+        assert [page.has_text_layer for page in pages] == [True, False]
+        assert pages[0].words[0]['text'] == "CUIT"
+
+def test_iter_pdf_pages_releases_lock_between_pages():
+    pages = iter_pdf_pages(_two_page_pdf(), render_dpi=72)
+    next(pages)
+    # Mientras el llamador procesa la página otro documento puede usar PyMuPDF
+    assert not pdf_ingestion._pymupdf_lock.locked()
+    pages.close()
+    assert not pdf_ingestion._pymupdf_lock.locked()
+
+def test_merge_page_results():
+    pages = [
+        {'page': 1, 'fields': {'emisor_cuit': {'value': '20-12345678-9', 'confidence': 0.9, 'bbox': [0, 0, 1, 1]}}},
+        {'page': 2, 'fields': {'emisor_cuit': {'value': '20-1234', 'confidence': 0.5, 'bbox': [0, 0, 1, 1]},
+                               'total': {'value': '$ 100,00', 'confidence': 0.8, 'bbox': [0, 0, 1, 1]}}},
+    ]
+    merged = merge_page_results(pages)
+    assert merged['emisor_cuit']['value'] == '20-12345678-9' and merged['emisor_cuit']['page'] == 1
+    assert merged['total']['page'] == 2
+
+def test_build_ocr_result_same_layout_for_one_or_many_pages():
+    doc_uuid = uuid.uuid4()
+    fields = {'numero_factura': {'value': '0001-00001234', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}}
+    single = build_ocr_result(doc_uuid, DocumentType.INVOICE_A, fields, processing_metadata={'rq': True})
+    multi = build_ocr_result(doc_uuid, DocumentType.INVOICE_A, fields,
+                             page_results=[{'page': 1, 'source': 'ocr', 'fields': fields, 'metadata': {}}])
+    assert set(single) == {'raw_ocr_output', 'structured_data', 'processing_quality', 'processing_metadata'}
+    assert set(multi) == set(single) | {'pages'}
+    for result in (single, multi):
+        assert result['raw_ocr_output'] == fields
+        assert result['structured_data']['document_id'] == str(doc_uuid)
+        assert result['processing_metadata']['document_id'] == str(doc_uuid)
+        json.dumps(result)  # se guarda como JSON en raw_ocr_output
+    assert single['processing_metadata']['rq'] is True
+
+if __name__ == "__main__":
+    test_is_pdf()
+    test_iter_pdf_pages()
+    test_iter_pdf_pages_rejects_invalid_pdf()
+    test_iter_pdf_pages_serializes_pymupdf()
+    test_iter_pdf_pages_releases_lock_between_pages()
+    test_merge_page_results()
+    test_build_ocr_result_same_layout_for_one_or_many_pages()
@@ -0,0 +1,113 @@
+import sys
+import os
+import tempfile
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from models.enums import DocumentType
+from services import preprocessing_cache
+from services.preprocessing_cache import get_cache_key, load_cached_page, store_cached_page, evict_cache
+
+def test_cache_key_depends_on_file_and_pipeline():
+    key = get_cache_key(b"archivo", ["grayscale", "binarize"], True)
+    assert key == get_cache_key(b"archivo", ["grayscale", "binarize"], True)
+    assert key != get_cache_key(b"otro archivo", ["grayscale", "binarize"], True)
+    assert key != get_cache_key(b"archivo", ["grayscale", "denoise", "binarize"], True)
+    assert key != get_cache_key(b"archivo", ["grayscale", "binarize"], False)
+    # La metadata guardada (control de calidad) depende del tipo de documento
+    assert get_cache_key(b"archivo", ["grayscale"], True, DocumentType.DNI_FRONT) != \
+        get_cache_key(b"archivo", ["grayscale"], True, DocumentType.INVOICE_A)
+
+def test_cache_hit_returns_document_metadata_only():
+    page = np.random.randint(0, 255, (300, 200), dtype=np.uint8)
+    settings = (preprocessing_cache.PREPROCESSING_CACHE_ENABLED, preprocessing_cache.load_cached_page)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        preprocessing_cache.PREPROCESSING_CACHE_ENABLED = True
+        preprocessing_cache.load_cached_page = lambda key: load_cached_page(key, cache_dir)
+        try:
+            stages = preprocessing_cache.get_preprocessing_pipeline(DocumentType.INVOICE_A)
+            key = get_cache_key(b"archivo", stages, False, DocumentType.INVOICE_A)
+            fields = {'cuit_emisor': {'value': '20111111112', 'confidence': 1.0, 'bbox': [1, 2, 3, 4]}}
+            store_cached_page(key, {'ocr_image': page}, {'quality': {'verdict': 'ok'}, 'binarize_crops': True,
+                                                         'barcode_fields': fields}, cache_dir=cache_dir)
+            metadata = {}
+            prepared = preprocessing_cache.get_preprocessed_page(b"archivo", DocumentType.INVOICE_A,
+                                                                 dual_resolution=False, metadata=metadata)
+        finally:
+            preprocessing_cache.PREPROCESSING_CACHE_ENABLED, preprocessing_cache.load_cached_page = settings
+    assert prepared.binarize is True and np.array_equal(prepared.ocr_image, page)
+    assert prepared.barcode_fields == fields
+    assert metadata['preprocessing_cache']['hit'] is True
+    # Los datos internos de la entrada no llegan a processing_metadata
+    assert metadata['quality'] == {'verdict': 'ok'}
+    assert 'binarize_crops' not in metadata and 'barcode_fields' not in metadata
+
+def test_barcode_is_read_from_the_decoded_page():
+    original = np.random.randint(0, 255, (300, 200, 3), dtype=np.uint8)
+    received = []
+    fields = {'dni_numero': {'value': '12345678', 'confidence': 1.0, 'bbox': None}}
+    settings = (preprocessing_cache.check_image_quality, preprocessing_cache.read_document_barcode)
+    preprocessing_cache.check_image_quality = lambda image, document_type, metadata=None: None
+    preprocessing_cache.read_document_barcode = lambda image, document_type, metadata=None: \
+        received.append(image) or fields
+    try:
+        prepared = preprocessing_cache.prepare_decoded_page(original, DocumentType.DNI_FRONT, dual_resolution=False)
+    finally:
+        preprocessing_cache.check_image_quality, preprocessing_cache.read_document_barcode = settings
+    # El código se busca en la imagen decodificada, no en la página suavizada y binarizada
+    assert len(received) == 1 and received[0] is original
+    assert prepared.barcode_fields == fields
+
+def test_store_load_and_evict():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        assert load_cached_page("ab" * 32, cache_dir) is None
+
+        page = np.random.randint(0, 255, (300, 200), dtype=np.uint8)
+        store_cached_page("ab" * 32, {'ocr_image': page}, {'binarize_crops': True}, cache_dir=cache_dir)
+        arrays, metadata = load_cached_page("ab" * 32, cache_dir)
+        assert np.array_equal(arrays['ocr_image'], page), "El cache debe ser sin pérdida"
+        assert metadata == {'binarize_crops': True}
+
+        # Al superar el tamaño máximo se elimina la entrada usada hace más tiempo
+        os.utime(os.path.join(cache_dir, "ab", "ab" * 32 + ".npz"), (0, 0))
+        store_cached_page("cd" * 32, {'ocr_image': page}, cache_dir=cache_dir, max_bytes=10 ** 9)
+        assert evict_cache(1, cache_dir) == 2
+        assert evict_cache(0, cache_dir) == 0
+        assert load_cached_page("ab" * 32, cache_dir) is None
+
+def test_store_scans_the_cache_only_over_the_limit():
+    page = np.random.randint(0, 255, (300, 200), dtype=np.uint8)
+    walks = []
+    walk = preprocessing_cache.os.walk
+    preprocessing_cache.os.walk = lambda *args: walks.append(args) or walk(*args)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Un solo recorrido para inicializar el tamaño; luego se acumula en memoria
+            for i in range(5):
+                store_cached_page(f"{i:02d}" * 32, {'ocr_image': page}, cache_dir=cache_dir, max_bytes=10 ** 9)
+            assert len(walks) == 1
+            sizes = [os.path.getsize(os.path.join(root, name)) for root, _, names in walk(cache_dir) for name in names]
+            assert preprocessing_cache._cache_sizes[cache_dir] == sum(sizes)
+
+            # Sobrescribir una entrada no cambia el total más allá de su diferencia de tamaño
+            store_cached_page("00" * 32, {'ocr_image': page}, cache_dir=cache_dir, max_bytes=10 ** 9)
+            assert preprocessing_cache._cache_sizes[cache_dir] == sum(sizes)
+
+            # Al superar el límite se recorre el directorio y se desaloja hasta cumplirlo
+            store_cached_page("ff" * 32, {'ocr_image': page}, cache_dir=cache_dir, max_bytes=2 * max(sizes))
+            assert len(walks) == 2
+            assert preprocessing_cache._cache_sizes[cache_dir] <= 2 * max(sizes)
+            assert load_cached_page("ff" * 32, cache_dir) is not None
+    finally:
+        preprocessing_cache.os.walk = walk
+
+if __name__ == "__main__":
+    test_cache_key_depends_on_file_and_pipeline()
+    test_cache_hit_returns_document_metadata_only()
+    test_barcode_is_read_from_the_decoded_page()
+    test_store_load_and_evict()
+    test_store_scans_the_cache_only_over_the_limit()
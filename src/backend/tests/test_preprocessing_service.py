@@ -1,5 +1,6 @@
 import sys
 import os
+import tracemalloc
 import cv2
 import numpy as np
 from dotenv import load_dotenv
@@ -13,8 +14,20 @@ if project_root and project_root not in sys.path:
 from src.backend.services.preprocessing_service import (
     preprocess_image_for_ocr, 
     deskew_image, 
-    correct_perspective
+    correct_perspective,
+    estimate_page_transform,
+    estimate_skew_angle,
+    STAGE_GRAYSCALE,
+    STAGE_BINARIZE,
+    prepare_page_for_detection,
+    binarize_region,
+    PreprocessingContext,
+    apply_page_transform,
+    quarter_turn_transform,
+    run_preprocessing_pipeline,
+    STAGE_ORIENTATION
 )
+from src.backend.services import preprocessing_service
 
 def test_preprocess_image_for_ocr():
     """Test de la función principal de preprocesamiento"""
@@ -66,8 +79,56 @@ def test_deskew_image():
     result = deskew_image(empty_img)
     assert np.array_equal(result, empty_img), "Imagen vacía debe retornarse sin cambios"
     
+    # El estimador por franjas coincide con minAreaRect sobre todos los píxeles de primer plano
+    page = np.full((700, 500), 255, dtype=np.uint8)
+    for y in range(100, 600, 40):
+        cv2.line(page, (50, y), (450, y + 25), 0, 3)
+    all_points = np.column_stack(np.where(page < 255))
+    angle = cv2.minAreaRect(all_points)[-1]
+    expected = -(angle + 90 if angle < -45 else angle - 90 if angle > 45 else angle)
+    assert abs(estimate_skew_angle(page) - expected) < 1e-3, "El ángulo debe coincidir con el estimador original"
+
     print("✓ Test de corrección de inclinación exitoso.")
 
+def _min_area_rect_from_0_to_90(min_area_rect):
+    # Emula la convención de OpenCV >= 4.5, ángulos en (0, 90] (un rectángulo recto da 90°),
+    # a partir de la de versiones anteriores, [-90, 0)
+    def wrapped(points):
+        center, (width, height), angle = min_area_rect(points)
+        if angle >= 0:
+            return center, (width, height), angle
+        return center, (height, width), angle + 90 if angle + 90 > 0 else 90.0
+    return wrapped
+
+def test_estimate_skew_angle_range():
+    """Test de regresión: el ángulo de minAreaRect se lleva a (-45, 45] en cualquier versión de OpenCV"""
+    print("Testing estimate_skew_angle range...")
+
+    page = np.full((800, 600), 255, dtype=np.uint8)
+    for y in range(150, 650, 40):
+        cv2.line(page, (100, y), (500, y), 0, 3)
+    tilted_pages = {tilt: cv2.warpAffine(page, cv2.getRotationMatrix2D((300, 400), tilt, 1.0), (600, 800),
+                                         borderValue=255)
+                    for tilt in (5, -5, 30, -30)}
+
+    min_area_rect = cv2.minAreaRect
+    for convention in (min_area_rect, _min_area_rect_from_0_to_90(min_area_rect)):
+        cv2.minAreaRect = convention
+        try:
+            # Página derecha: con la convención (0, 90] minAreaRect da 90° y no debe rotarse
+            assert abs(estimate_skew_angle(page)) < 0.1, "Una página derecha no debe rotarse"
+            assert np.array_equal(deskew_image(page), page), "Una página derecha debe quedar igual"
+
+            for tilt, tilted in tilted_pages.items():
+                angle = estimate_skew_angle(tilted)
+                assert abs(angle + tilt) < 0.5, f"Inclinación de {tilt}°: se estimó {angle}°"
+                assert abs(estimate_skew_angle(deskew_image(tilted))) < 0.5, \
+                    f"La página inclinada {tilt}° debe quedar derecha"
+        finally:
+            cv2.minAreaRect = min_area_rect
+
+    print("✓ Test de rango del ángulo de inclinación exitoso.")
+
 def test_correct_perspective():
     """Test de la función de corrección de perspectiva"""
     print("Testing correct_perspective...")
@@ -89,6 +150,178 @@ def test_correct_perspective():
     
     print("✓ Test de corrección de perspectiva exitoso.")
 
+def test_estimate_page_transform():
+    """Test de la estimación de geometría sobre la pirámide"""
+    print("Testing estimate_page_transform...")
+
+    # Página limpia y derecha: no requiere re-muestreo
+    page = np.full((2400, 1700), 255, dtype=np.uint8)
+    transform, size = estimate_page_transform(page, max_side=512)
+    assert transform is None and size == (1700, 2400), "Una página derecha no debe transformarse"
+    assert apply_page_transform(page, transform, size) is page
+
+    # Bloque de "texto" inclinado: se estima en el nivel reducido y se aplica a resolución completa
+    cv2.rectangle(page, (400, 600), (1300, 1400), 0, -1)
+    M = cv2.getRotationMatrix2D((850, 1200), 5, 1.0)
+    skewed = cv2.warpAffine(page, M, (1700, 2400), borderValue=255)
+    transform, size = estimate_page_transform(skewed, max_side=512)
+    assert transform is not None, "La inclinación debe detectarse en el nivel reducido"
+    aligned = apply_page_transform(skewed, transform, size)
+    assert aligned.shape == (size[1], size[0]), "El warp debe producir el tamaño estimado"
+
+    print("✓ Test de estimación de geometría exitoso.")
+
+def test_quarter_turn_transform():
+    """Test de la rotación por múltiplos de 90° como transformación componible"""
+    print("Testing quarter_turn_transform...")
+
+    image = np.random.randint(0, 255, (7, 5), dtype=np.uint8)
+    expected = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+    for rotation, flag in expected.items():
+        size = (7, 5) if rotation != 180 else (5, 7)
+        rotated = apply_page_transform(image, quarter_turn_transform((5, 7), rotation), size)
+        assert np.array_equal(rotated, cv2.rotate(image, flag)), f"La rotación de {rotation}° debe ser exacta"
+
+    print("✓ Test de rotación por cuartos de vuelta exitoso.")
+
+def _with_fake_osd(image_to_osd, func):
+    # Camino pytesseract con un OSD falso (sin binario de Tesseract ni osd.traineddata)
+    api_available, original = preprocessing_service.is_tesseract_api_available, preprocessing_service.pytesseract.image_to_osd
+    preprocessing_service.is_tesseract_api_available = lambda: False
+    preprocessing_service.pytesseract.image_to_osd = image_to_osd
+    try:
+        return func()
+    finally:
+        preprocessing_service.is_tesseract_api_available = api_available
+        preprocessing_service.pytesseract.image_to_osd = original
+
+def test_detect_page_orientation():
+    """Test del mapeo del OSD de Tesseract a la rotación horaria que endereza la página"""
+    print("Testing detect_page_orientation...")
+
+    page = np.full((300, 200), 255, dtype=np.uint8)
+    page[20:60, 20:120] = 0  # marca asimétrica: arriba a la izquierda en la página derecha
+    # Tesseract reporta la orientación del texto y "Rotate", los grados horarios que la corrigen
+    scans = {0: (page, 0), 90: (cv2.rotate(page, cv2.ROTATE_90_COUNTERCLOCKWISE), 270),
+             180: (cv2.rotate(page, cv2.ROTATE_180), 180), 270: (cv2.rotate(page, cv2.ROTATE_90_CLOCKWISE), 90)}
+    for rotate, (scan, orientation) in scans.items():
+        osd = {'orientation': orientation, 'rotate': rotate, 'orientation_conf': 5.0, 'script': 'Latin'}
+        detected = _with_fake_osd(lambda *args, **kwargs: osd, lambda: preprocessing_service.detect_page_orientation(scan))
+        assert detected['rotation'] == rotate and detected['confidence'] == 5.0
+
+        # La etapa orientation aplica esa rotación y deja la página derecha
+        metadata = {}
+        straightened = _with_fake_osd(lambda *args, **kwargs: osd,
+                                      lambda: run_preprocessing_pipeline(scan, [STAGE_ORIENTATION], metadata=metadata))
+        assert np.array_equal(straightened, page), f"La rotación {rotate}° debe enderezar la página"
+        assert metadata['preprocessing']['stages'][0]['applied'] is (rotate != 0)
+
+    print("✓ Test de orientación exitoso.")
+
+def test_osd_unavailable_is_logged_once():
+    """Test del aviso único cuando el OSD no está disponible (y silencio con poco texto)"""
+    print("Testing OSD unavailable warning...")
+
+    page = np.full((300, 200), 255, dtype=np.uint8)
+    warnings = []
+    warning, logged = preprocessing_service.logger.warning, preprocessing_service._osd_unavailable_logged
+    preprocessing_service.logger.warning = warnings.append
+    preprocessing_service._osd_unavailable_logged = False
+
+    def too_few_characters(*args, **kwargs):
+        raise preprocessing_service.pytesseract.TesseractError(1, "Too few characters. Skipping this page")
+
+    def missing_osd(*args, **kwargs):
+        raise preprocessing_service.pytesseract.TesseractError(1, "Failed loading language 'osd'")
+
+    try:
+        assert _with_fake_osd(too_few_characters, lambda: preprocessing_service.detect_page_orientation(page)) is None
+        assert warnings == []
+        for _ in range(3):
+            assert _with_fake_osd(missing_osd, lambda: preprocessing_service.detect_page_orientation(page)) is None
+        assert len(warnings) == 1
+    finally:
+        preprocessing_service.logger.warning = warning
+        preprocessing_service._osd_unavailable_logged = logged
+
+    print("✓ Test de aviso de OSD exitoso.")
+
+def test_preprocessing_pipeline_metadata():
+    """Test del pipeline configurable: etapas omitidas y tiempos en metadata"""
+    print("Testing preprocessing pipeline metadata...")
+
+    # Página limpia y derecha: deskew y perspectiva no se aplican y no hay warp
+    page = np.full((1200, 850, 3), 255, dtype=np.uint8)
+    cv2.putText(page, "FACTURA 0001-00001234", (100, 300), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    metadata = {}
+    processed = preprocess_image_for_ocr(page, metadata=metadata)
+    assert processed.shape == (1200, 850), "Sin corrección geométrica la página conserva su tamaño"
+    stages = {entry['stage']: entry for entry in metadata['preprocessing']['stages']}
+    assert stages['deskew']['applied'] is False
+    assert stages['perspective']['applied'] is False
+    assert 'warp' not in stages
+    assert all(entry['ms'] >= 0 for entry in stages.values())
+
+    # Pipeline explícito (ej. documento nativo digital): solo gris y binarización
+    metadata = {}
+    processed = preprocess_image_for_ocr(page, stages=[STAGE_GRAYSCALE, STAGE_BINARIZE], metadata=metadata)
+    assert metadata['preprocessing']['pipeline'] == [STAGE_GRAYSCALE, STAGE_BINARIZE]
+    assert set(np.unique(processed)).issubset({0, 255})
+
+    try:
+        preprocess_image_for_ocr(page, stages=["sharpen"])
+        assert False, "Debería haber lanzado ValueError para una etapa desconocida"
+    except ValueError:
+        pass
+
+    print("✓ Test de pipeline de preprocesamiento exitoso.")
+
+def test_prepare_page_for_detection():
+    """Test de la doble resolución: página reducida para YOLO y recortes binarizados a resolución completa"""
+    print("Testing prepare_page_for_detection...")
+
+    page = np.full((2000, 1400, 3), 255, dtype=np.uint8)
+    cv2.putText(page, "CUIT 20-12345678-9", (200, 500), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    prepared = prepare_page_for_detection(page, detection_max_side=640)
+    assert max(prepared.detection_image.shape[:2]) == 640, "La imagen de detección debe reducirse"
+    assert prepared.detection_image.ndim == 3, "YOLO recibe una imagen de 3 canales"
+    assert prepared.ocr_image.shape == (2000, 1400), "La página de OCR conserva la resolución completa"
+    assert prepared.binarize, "El pipeline por defecto binariza"
+
+    # Binarizar solo la región debe dar lo mismo que binarizar la página y recortar
+    full = preprocess_image_for_ocr(page)
+    bbox = [180, 430, 900, 530]
+    region = binarize_region(prepared.ocr_image, bbox)
+    assert np.array_equal(region, full[430:530, 180:900]), "La región binarizada debe coincidir con la página"
+
+    print("✓ Test de doble resolución exitoso.")
+
+def test_preprocessing_context_reuses_buffers():
+    """Test del contexto de buffers: en régimen estacionario no se asignan páginas nuevas"""
+    print("Testing PreprocessingContext...")
+
+    page = np.full((2000, 1400, 3), 255, dtype=np.uint8)
+    cv2.putText(page, "FACTURA 0001-00001234", (200, 500), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    skewed = cv2.warpAffine(page, cv2.getRotationMatrix2D((700, 1000), 3, 1.0), (1400, 2000),
+                            borderValue=(255, 255, 255))
+
+    context = PreprocessingContext()
+    expected = preprocess_image_for_ocr(skewed)
+    first = preprocess_image_for_ocr(skewed, context=context)
+    assert np.array_equal(first, expected), "El contexto no debe cambiar el resultado"
+    buffers_size = context.nbytes
+
+    tracemalloc.start()
+    second = preprocess_image_for_ocr(skewed, context=context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert np.array_equal(second, expected)
+    assert context.nbytes == buffers_size, "Los buffers no deben crecer con una página del mismo tamaño"
+    assert peak < 2000 * 1400 // 2, f"No debe asignarse una página completa (pico {peak} bytes)"
+
+    print("✓ Test de contexto de preprocesamiento exitoso.")
+
 def test_integration_preprocessing():
     """Test de integración de todo el pipeline de preprocesamiento"""
     print("Testing integration preprocessing...")
@@ -140,7 +373,15 @@ if __name__ == "__main__":
     try:
         test_preprocess_image_for_ocr()
         test_deskew_image()
+        test_estimate_skew_angle_range()
         test_correct_perspective()
+        test_estimate_page_transform()
+        test_quarter_turn_transform()
+        test_detect_page_orientation()
+        test_osd_unavailable_is_logged_once()
+        test_preprocessing_pipeline_metadata()
+        test_prepare_page_for_detection()
+        test_preprocessing_context_reuses_buffers()
         test_integration_preprocessing()
         test_edge_cases()
         
@@ -0,0 +1,55 @@
+import sys
+import os
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from models.enums import DocumentType
+from services.quality_service import (assess_image_quality, check_image_quality, ImageQualityError,
+                                      QUALITY_OK, QUALITY_FAIL)
+
+def _photographed_invoice() -> np.ndarray:
+    # Hoja A4 a ~157 DPI sobre un fondo oscuro (foto de celular sobre una mesa)
+    image = np.full((2000, 1500, 3), 70, dtype=np.uint8)
+    cv2.rectangle(image, (100, 80), (1400, 1920), (255, 255, 255), -1)
+    for y in range(200, 1850, 40):
+        cv2.putText(image, "FACTURA 0001-00012345 CUIT 20-12345678-9", (150, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return image
+
+def test_sharp_page_passes():
+    assessment = assess_image_quality(_photographed_invoice(), DocumentType.INVOICE_A)
+    assert assessment['verdict'] == QUALITY_OK, assessment['issues']
+    assert 0.5 < assessment['metrics']['page_coverage'] < 0.95
+    assert 140 < assessment['metrics']['effective_dpi'] < 175
+
+def test_unreadable_pages_fail():
+    blurred = cv2.GaussianBlur(_photographed_invoice(), (0, 0), 12)
+    blank = np.full((2000, 1500, 3), 255, dtype=np.uint8)
+    tiny = cv2.resize(_photographed_invoice(), (150, 200), interpolation=cv2.INTER_AREA)
+    for image, check in ((blurred, 'sharpness'), (blank, 'contrast'), (tiny, 'resolution')):
+        assessment = assess_image_quality(image, DocumentType.INVOICE_A)
+        assert assessment['verdict'] == QUALITY_FAIL
+        assert check in [issue['check'] for issue in assessment['issues']]
+
+def test_check_image_quality_modes():
+    blank = np.full((2000, 1500, 3), 255, dtype=np.uint8)
+    metadata = {}
+    try:
+        check_image_quality(blank, DocumentType.DNI_FRONT, metadata=metadata, mode="reject")
+        assert False, "Debería haber lanzado ImageQualityError"
+    except ImageQualityError as e:
+        assert "contraste" in str(e)
+    assert metadata['quality']['verdict'] == QUALITY_FAIL
+    # "flag" registra la evaluación sin interrumpir; "off" no evalúa
+    assert check_image_quality(blank, DocumentType.DNI_FRONT, mode="flag")['verdict'] == QUALITY_FAIL
+    assert check_image_quality(blank, DocumentType.DNI_FRONT, mode="off") is None
+
+if __name__ == "__main__":
+    test_sharp_page_passes()
+    test_unreadable_pages_fail()
+    test_check_image_quality_modes()
@@ -0,0 +1,118 @@
+import sys
+import os
+import logging
+import tempfile
+from itertools import combinations
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from models.enums import DocumentType
+from services import template_service
+from services.template_service import (DocumentTemplate, ID1_CARD_SIZE_MM, TEMPLATE_REGISTRY, align_document_template,
+                                       align_to_template, template_field_bbox, warp_template_field)
+
+_PX_PER_MM = 10  # tarjeta de referencia de 856 x 540 px
+_TEMPLATE = DocumentTemplate(
+    name="tarjeta_prueba",
+    reference="tarjeta_prueba.png",
+    size_mm=ID1_CARD_SIZE_MM,
+    fields={'dni_numero': (50.0, 40.0, 25.0, 8.0)},
+)
+
+def _card(number: str = None) -> np.ndarray:
+    # Fondo fijo con textura (como la guilloche del documento) y el campo variable en blanco
+    rng = np.random.default_rng(7)
+    card = np.full((540, 856), 200, dtype=np.uint8)
+    for _ in range(150):
+        x, y = rng.integers(0, 856), rng.integers(0, 540)
+        cv2.circle(card, (int(x), int(y)), int(rng.integers(4, 20)), int(rng.integers(0, 120)), 2)
+    cv2.putText(card, "REPUBLICA ARGENTINA", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 20, 3)
+    cv2.rectangle(card, (500, 400), (750, 480), 255, -1)
+    if number:
+        cv2.putText(card, number, (510, 455), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    return card
+
+def _photographed(card: np.ndarray, homography: np.ndarray) -> np.ndarray:
+    # Foto de la tarjeta sobre una mesa, con perspectiva
+    return cv2.warpPerspective(card, homography, (1600, 1200), borderValue=60)
+
+def _templates_dir() -> str:
+    directory = tempfile.mkdtemp()
+    cv2.imwrite(os.path.join(directory, _TEMPLATE.reference), _card())
+    return directory
+
+def test_align_and_crop_field():
+    homography = np.array([[1.3, 0.08, 250], [-0.05, 1.25, 220], [0.00004, 0.00002, 1]])
+    photo = _photographed(_card("12.345.678"), homography)
+
+    alignment = align_to_template(photo, _TEMPLATE, templates_path=_templates_dir())
+    assert alignment.accepted, alignment.reason
+    assert alignment.inlier_ratio > 0.5
+
+    # La caja del campo coincide con la proyección del rectángulo conocido
+    corners = np.float32([[500, 400], [750, 400], [750, 480], [500, 480]]).reshape(-1, 1, 2)
+    projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    expected = [*projected.min(axis=0), *projected.max(axis=0)]
+    bbox = template_field_bbox(alignment, 'dni_numero', photo.shape)
+    assert all(abs(got - want) < 15 for got, want in zip(bbox, expected)), (bbox, expected)
+
+    # El recorte rectificado tiene la proporción del campo (25 x 8 mm) y contiene el texto
+    crop = warp_template_field(photo, alignment, 'dni_numero')
+    assert abs(crop.shape[1] / crop.shape[0] - 25 / 8) < 0.1
+    assert (crop < 100).mean() > 0.05
+
+def test_alignment_rejects_other_documents():
+    other = np.full((1200, 1600), 230, dtype=np.uint8)
+    for y in range(100, 1100, 60):
+        cv2.putText(other, "FACTURA 0001-00012345", (100, y), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+    alignment = align_to_template(other, _TEMPLATE, templates_path=_templates_dir())
+    assert not alignment.accepted and alignment.reason
+
+def _overlap_mm2(a, b) -> float:
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return max(0.0, width) * max(0.0, height)
+
+def test_registered_template_layouts_are_consistent():
+    # Las referencias reales no se versionan (son documentos de identidad): solo se comprueba que los
+    # rectángulos aproximados en mm sean coherentes entre sí, no que coincidan con el documento
+    for template in TEMPLATE_REGISTRY.values():
+        width_mm, height_mm = template.size_mm
+        rects = {**template.fields, **{f"excluida_{i}": rect for i, rect in enumerate(template.excluded)}}
+        for name, (x, y, w, h) in rects.items():
+            assert w > 0 and h > 0, (template.name, name)
+            assert x >= 0 and y >= 0 and x + w <= width_mm and y + h <= height_mm, (template.name, name)
+        for (name_a, a), (name_b, b) in combinations(rects.items(), 2):
+            assert _overlap_mm2(a, b) == 0, (template.name, name_a, name_b)
+
+        # Fuera de campos y zonas excluidas queda suficiente fondo fijo para los puntos ORB
+        masked_mm2 = sum(w * h for _, _, w, h in rects.values())
+        assert masked_mm2 / (width_mm * height_mm) < 0.6, template.name
+
+def test_missing_reference_is_reported_once(caplog):
+    template = DocumentTemplate(name="sin_referencia", reference="no_existe.png", size_mm=ID1_CARD_SIZE_MM, fields={})
+    registry = dict(TEMPLATE_REGISTRY)
+    TEMPLATE_REGISTRY[DocumentType.DNI_FRONT] = template
+    reads = []
+    imread = template_service.cv2.imread
+    template_service.cv2.imread = lambda *args: reads.append(args) or imread(*args)
+    try:
+        with caplog.at_level(logging.WARNING, logger=template_service.__name__):
+            for _ in range(3):
+                assert align_document_template(_card(), DocumentType.DNI_FRONT, enabled=True) is None
+    finally:
+        template_service.cv2.imread = imread
+        TEMPLATE_REGISTRY.clear()
+        TEMPLATE_REGISTRY.update(registry)
+    assert len(reads) == 1
+    assert len([record for record in caplog.records if "sin_referencia" in record.getMessage()]) == 1
+
+if __name__ == "__main__":
+    test_align_and_crop_field()
+    test_alignment_rejects_other_documents()
+    test_registered_template_layouts_are_consistent()
@@ -0,0 +1,107 @@
+import sys
+import os
+import threading
+from types import SimpleNamespace
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+project_root = os.getenv("PROJECT_ROOT")
+if project_root and project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services import ocr_executor, tesseract_pool
+
+class _FakeTessBaseAPI:
+    """Handle falso: devuelve la whitelist activa al reconocer, para ver qué configuración usó cada llamada."""
+    created = []
+
+    def __init__(self, lang, oem, path=None):
+        self.lang = lang
+        self.thread = threading.current_thread().name
+        self.variables = {}
+        _FakeTessBaseAPI.created.append(self)
+
+    def SetPageSegMode(self, psm):
+        pass
+
+    def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+        pass
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+        return True
+
+    def GetUTF8Text(self):
+        return self.variables.get("tessedit_char_whitelist", "")
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        pass
+
+def _with_fake_tesserocr(func):
+    # Cada prueba arranca con handles nuevos y sin tesserocr real
+    tesserocr, thread_local = tesseract_pool.tesserocr, tesseract_pool._thread_local
+    tesseract_pool.tesserocr = SimpleNamespace(OEM=SimpleNamespace(DEFAULT=3), PyTessBaseAPI=_FakeTessBaseAPI)
+    tesseract_pool._thread_local = threading.local()
+    _FakeTessBaseAPI.created = []
+    try:
+        return func()
+    finally:
+        tesseract_pool.tesserocr, tesseract_pool._thread_local = tesserocr, thread_local
+
+_CROP = np.zeros((20, 60), dtype=np.uint8)
+
+def test_whitelist_is_reset_between_calls():
+    def run():
+        assert tesseract_pool.recognize_array(_CROP, whitelist="0123456789") == "0123456789"
+        # El mismo handle sin whitelist reconoce con todos los caracteres
+        assert tesseract_pool.recognize_array(_CROP) == ""
+        assert tesseract_pool.recognize_array(_CROP, whitelist="MFX") == "MFX"
+        assert len(_FakeTessBaseAPI.created) == 1
+        assert _FakeTessBaseAPI.created[0].variables["tessedit_char_whitelist"] == ""
+    _with_fake_tesserocr(run)
+
+def test_one_handle_per_thread():
+    barrier = threading.Barrier(4)
+    handles = {}
+
+    def recognize(i):
+        barrier.wait(timeout=5)  # los cuatro hilos vivos a la vez
+        for _ in range(3):
+            tesseract_pool.recognize_array(_CROP, whitelist=str(i))
+        handles[i] = tesseract_pool.get_tesseract_api('spa')
+
+    def run():
+        threads = [threading.Thread(target=recognize, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(_FakeTessBaseAPI.created) == 4
+        assert len({id(api) for api in handles.values()}) == 4
+        assert len({api.thread for api in _FakeTessBaseAPI.created}) == 4
+    _with_fake_tesserocr(run)
+
+def test_warmup_creates_a_handle_in_every_executor_thread():
+    settings = (ocr_executor.OCR_EXECUTOR, ocr_executor.OCR_MAX_WORKERS)
+    ocr_executor.OCR_EXECUTOR, ocr_executor.OCR_MAX_WORKERS = "thread", 3
+    ocr_executor.shutdown_ocr_executor()
+
+    def run():
+        ocr_executor.warmup_ocr_executor(timeout=5)
+        assert sorted(api.thread for api in _FakeTessBaseAPI.created) == [f"ocr_{i}" for i in range(3)]
+        # Las tareas posteriores reutilizan esos handles
+        ocr_executor.map_ocr(lambda i: tesseract_pool.recognize_array(_CROP), range(10))
+        assert len(_FakeTessBaseAPI.created) == 3
+    try:
+        _with_fake_tesserocr(run)
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+        ocr_executor.OCR_EXECUTOR, ocr_executor.OCR_MAX_WORKERS = settings
+
+if __name__ == "__main__":
+    test_whitelist_is_reset_between_calls()
+    test_one_handle_per_thread()
+    test_warmup_creates_a_handle_in_every_executor_thread()
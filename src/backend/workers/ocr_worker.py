@@ -2,8 +2,6 @@
 
 import logging
 import uuid
-import numpy as np
-import cv2
 from datetime import datetime
 
 # Configurar logging
@@ -13,8 +11,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-from services.preprocessing_service import preprocess_image_for_ocr
+from services.preprocessing_service import get_preprocessing_context
+from services.preprocessing_cache import get_preprocessed_page
 from services.ocr_service import perform_yolo_ocr
+from services.document_pipeline import is_multipage_document, process_multipage_document, build_ocr_result
+from services.quality_service import format_quality_issues
 from services.document_service import update_document_status, get_document_by_id_and_data_for_ocr
 from services.storage.local_storage import download_file_local
 from database import SessionLocal
@@ -45,36 +46,63 @@ def process_document_for_ocr(document_id: str):
         # 1. Descargar la imagen
         logger.info(f"Descargando archivo: {db_document_entry.storage_path}")
         image_bytes = download_file_local(db_document_entry.storage_path)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        original_image_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if original_image_cv is None:
-            raise ValueError("No se pudo decodificar la imagen")
 
-        # 2. Preprocesar la imagen
-        logger.info("Preprocesando imagen para OCR")
-        preprocessed_image = preprocess_image_for_ocr(original_image_cv)
+        # Información del pipeline para processing_metadata, como en el worker de Celery
+        pipeline_metadata = {}
+
+        page_results = None
+        if is_multipage_document(image_bytes):
+            # 2-3. PDF o TIFF multipágina: páginas procesadas en paralelo; se guardan los campos
+            # unidos y el resultado por página
+            logger.info("Procesando documento página por página")
+            document_result = process_multipage_document(image_bytes, db_document_entry.document_type,
+                                                         metadata=pipeline_metadata)
+            extracted_data = document_result['fields']
+            page_results = document_result['pages']
+        else:
+            # 2. Decodificar y preprocesar la imagen (o recuperarla del cache de preprocesamiento)
+            logger.info("Preprocesando imagen para OCR")
+            prepared_page = get_preprocessed_page(image_bytes, db_document_entry.document_type,
+                                                  metadata=pipeline_metadata, context=get_preprocessing_context())
 
-        # 3. Realizar YOLO + Tesseract OCR
-        logger.info(f"Ejecutando YOLO + OCR para tipo: {db_document_entry.document_type}")
-        extracted_data = perform_yolo_ocr(preprocessed_image, db_document_entry.document_type)
+            # 3. Realizar YOLO + Tesseract OCR
+            logger.info(f"Ejecutando YOLO + OCR para tipo: {db_document_entry.document_type}")
+            extracted_data = perform_yolo_ocr(prepared_page.ocr_image, db_document_entry.document_type,
+                                              metadata=pipeline_metadata,
+                                              detection_image=prepared_page.detection_image,
+                                              binarize_crops=prepared_page.binarize,
+                                              barcode_fields=prepared_page.barcode_fields)
         
         # 4. Guardar resultados y actualizar estado
         logger.info("Guardando resultados del OCR")
+        # Mismo formato que el worker de Celery para una página o varias (la API lee 'structured_data')
+        save_data = build_ocr_result(doc_uuid, db_document_entry.document_type, extracted_data,
+                                     page_results=page_results, processing_metadata=pipeline_metadata)
+
+        # Problemas de calidad que no impidieron el OCR quedan en processing_error
+        quality = pipeline_metadata.get('quality')
+        quality_warning = None
+        if quality and quality['issues']:
+            quality_warning = f"Advertencia de calidad de imagen: {format_quality_issues(quality)}"
+
         update_document_status(
             db,
             doc_uuid,
             'COMPLETED',
             processed_at=datetime.now(),
-            raw_ocr_output=extracted_data
+            error_message=quality_warning,
+            raw_ocr_output=save_data
         )
         
         logger.info(f"Documento {document_id} procesado con éxito.")
-        return {
+        result = {
             "status": "success",
             "document_id": document_id,
             "extracted_data": extracted_data
         }
+        if page_results is not None:
+            result["pages"] = page_results
+        return result
 
     except Exception as e:
         logger.error(f"Error procesando documento {document_id}: {e}", exc_info=True)